@@ -0,0 +1,46 @@
+"""
+Compares two result files of run_benchmarks.py.
+
+Example:
+    python benchmarks/compare_benchmarks.py old.json new.json
+"""
+import argparse
+import json
+
+
+def load(path):
+    with open(path) as f:
+        results = json.load(f)['results']
+    return {(r['name'], json.dumps(r['params'], sort_keys=True)): r for r in results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('old')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='relative throughput change reported as regression')
+    args = parser.parse_args()
+
+    old = load(args.old)
+    new = load(args.new)
+    regressions = 0
+    print('%-28s %-16s %12s %12s %8s' % ('benchmark', 'params', 'old ops/s',
+                                          'new ops/s', 'change'))
+    for key in sorted(set(old) & set(new)):
+        before = old[key]['ops_per_sec']
+        after = new[key]['ops_per_sec']
+        change = after / before - 1.0
+        mark = ''
+        if change < -args.threshold:
+            mark = ' <-- regression'
+            regressions += 1
+        print('%-28s %-16s %12.1f %12.1f %+7.1f%%%s' % (
+            key[0], key[1], before, after, 100 * change, mark))
+    for key in sorted(set(old) ^ set(new)):
+        print('%-28s %-16s only in one of the files' % key)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -0,0 +1,297 @@
+"""
+Benchmarks for EQSN.
+
+Measures throughput, latency percentiles and the peak memory of the worker
+processes for gates, measurements and merges at different qubit group sizes.
+The results are printed and can be written to a JSON file, which can be
+compared with another run using compare_benchmarks.py.
+
+Example:
+    python benchmarks/run_benchmarks.py --sizes 1 4 8 12 --output results.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from eqsn import EQSN, WorkerPool  # noqa: E402
+
+MIN_QUBITS = {
+    'single_gate': 1,
+    'controlled_gate': 2,
+    'two_qubit_gate': 2,
+    'controlled_two_qubit_gate': 3,
+}
+SWAP = np.array([[1, 0, 0, 0], [0, 0, 1, 0], [0, 1, 0, 0], [0, 0, 0, 1]],
+                dtype=np.csingle)
+
+
+def sync(q_sim, q_id):
+    """
+    Waits until all gates sent to the group of q_id have been applied.
+    """
+    q_sim.barrier([q_id])
+
+
+def worker_peak_rss_kb(pool):
+    """
+    Peak resident memory of the largest worker of a pool in kB. The workers
+    are started per benchmark, so their peak belongs to this benchmark.
+    """
+    workers = 0
+    for p, _ in pool.process_queue_list:
+        try:
+            with open('/proc/%d/status' % p.pid) as f:
+                for line in f:
+                    if line.startswith('VmHWM:'):
+                        workers = max(workers, int(line.split()[1]))
+        except OSError:
+            pass
+    return workers
+
+
+def main_peak_rss_kb():
+    """
+    Peak resident memory of the main process in kB, over its whole lifetime.
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def create_group(q_sim, size):
+    """
+    Creates size qubits in superposition, merged into one group.
+    """
+    ids = [str(i) for i in range(size)]
+    for q_id in ids:
+        q_sim.new_qubit(q_id)
+        q_sim.H_gate(q_id)
+    for q_id in ids[1:]:
+        q_sim.merge_qubits(q_id, ids[0])
+    sync(q_sim, ids[0])
+    return ids
+
+
+def summarize(name, params, ops, seconds, latencies, rss):
+    result = {
+        'name': name,
+        'params': params,
+        'ops': ops,
+        'seconds': seconds,
+        'ops_per_sec': ops / seconds if seconds > 0 else float('inf'),
+        'worker_peak_rss_kb': rss,
+    }
+    if latencies:
+        latencies = np.asarray(latencies) * 1e6
+        result['latency_us'] = {
+            'p50': float(np.percentile(latencies, 50)),
+            'p90': float(np.percentile(latencies, 90)),
+            'p99': float(np.percentile(latencies, 99)),
+            'max': float(np.max(latencies)),
+        }
+    return result
+
+
+def bench_gate(name, size, repeat, processes):
+    """
+    Applies a gate repeat times to a group of size qubits. The throughput is
+    measured for a stream of gates, the latency for single gates including
+    the wait until they have been applied.
+    """
+    pool = WorkerPool(processes)
+    q_sim = EQSN(pool=pool)
+    ids = create_group(q_sim, size)
+    gate = np.array([[0, 1], [1, 0]], dtype=np.csingle)
+
+    def apply():
+        if name == 'single_gate':
+            q_sim.custom_gate(ids[-1], gate)
+        elif name == 'controlled_gate':
+            q_sim.custom_controlled_gate(ids[-1], ids[0], gate)
+        elif name == 'two_qubit_gate':
+            q_sim.custom_two_qubit_gate(ids[0], ids[-1], SWAP)
+        elif name == 'controlled_two_qubit_gate':
+            q_sim.custom_two_qubit_control_gate(ids[0], ids[1], ids[-1], SWAP)
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        apply()
+    sync(q_sim, ids[0])
+    seconds = time.perf_counter() - start
+
+    latencies = []
+    for _ in range(max(1, repeat // 10)):
+        start = time.perf_counter()
+        apply()
+        sync(q_sim, ids[0])
+        latencies.append(time.perf_counter() - start)
+    rss = worker_peak_rss_kb(pool)
+    q_sim.stop_all()
+    return summarize(name, {'qubits': len(ids)}, repeat, seconds, latencies, rss)
+
+
+def bench_measure(size, repeat, processes):
+    """
+    Creates a group of size qubits and measures one qubit of it, repeat times.
+    """
+    pool = WorkerPool(processes)
+    q_sim = EQSN(pool=pool)
+    latencies = []
+    total = 0
+    for _ in range(repeat):
+        ids = create_group(q_sim, size)
+        start = time.perf_counter()
+        q_sim.measure(ids[-1])
+        latencies.append(time.perf_counter() - start)
+        total += latencies[-1]
+        for q_id in ids[:-1]:
+            q_sim.measure(q_id)
+    rss = worker_peak_rss_kb(pool)
+    q_sim.stop_all()
+    return summarize('measure', {'qubits': size}, repeat, total, latencies, rss)
+
+
+def bench_merge(size, repeat):
+    """
+    Merges a qubit of one worker process into a group of size qubits on
+    another worker process.
+    """
+    pool = WorkerPool(2)
+    q_sim = EQSN(pool=pool)
+    latencies = []
+    for i in range(repeat):
+        pool.process_picker.pointer = 0
+        ids = create_group(q_sim, size)
+        pool.process_picker.pointer = 1
+        other = 'other%d' % i
+        q_sim.new_qubit(other)
+        start = time.perf_counter()
+        q_sim.merge_qubits(other, ids[0])
+        sync(q_sim, ids[0])
+        latencies.append(time.perf_counter() - start)
+        for q_id in ids + [other]:
+            q_sim.measure(q_id)
+    rss = worker_peak_rss_kb(pool)
+    q_sim.stop_all()
+    return summarize('cross_worker_merge', {'qubits': size}, repeat,
+                     sum(latencies), latencies, rss)
+
+
+def bench_epr(repeat, processes):
+    """
+    Creates, entangles and measures repeat EPR pairs.
+    """
+    pool = WorkerPool(processes)
+    q_sim = EQSN(pool=pool)
+    latencies = []
+    start = time.perf_counter()
+    for i in range(repeat):
+        pair_start = time.perf_counter()
+        a, b = 'a%d' % i, 'b%d' % i
+        q_sim.new_qubit(a)
+        q_sim.new_qubit(b)
+        q_sim.H_gate(a)
+        q_sim.cnot_gate(b, a)
+        q_sim.measure(a)
+        q_sim.measure(b)
+        latencies.append(time.perf_counter() - pair_start)
+    seconds = time.perf_counter() - start
+    rss = worker_peak_rss_kb(pool)
+    q_sim.stop_all()
+    return summarize('epr_pairs', {}, repeat, seconds, latencies, rss)
+
+
+def bench_threads(nr_threads, repeat, processes):
+    """
+    Applies gates to one qubit from several threads at the same time.
+    """
+    pool = WorkerPool(processes)
+    q_sim = EQSN(pool=pool)
+    q_sim.new_qubit('1')
+
+    def call_gates():
+        for _ in range(repeat):
+            q_sim.X_gate('1')
+
+    thread_list = [threading.Thread(target=call_gates) for _ in range(nr_threads)]
+    start = time.perf_counter()
+    for t in thread_list:
+        t.start()
+    for t in thread_list:
+        t.join()
+    sync(q_sim, '1')
+    seconds = time.perf_counter() - start
+    rss = worker_peak_rss_kb(pool)
+    q_sim.stop_all()
+    return summarize('threaded_gates', {'threads': nr_threads},
+                     nr_threads * repeat, seconds, [], rss)
+
+
+def print_result(result):
+    line = '%-28s %-16s %10d ops %12.1f ops/s' % (
+        result['name'], json.dumps(result['params']), result['ops'],
+        result['ops_per_sec'])
+    if 'latency_us' in result:
+        line += '  p50 %9.1fus  p99 %9.1fus' % (
+            result['latency_us']['p50'], result['latency_us']['p99'])
+    line += '  worker rss %d kB' % result['worker_peak_rss_kb']
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 4, 8, 10],
+                        help='qubit group sizes to sweep')
+    parser.add_argument('--repeat', type=int, default=200,
+                        help='operations per benchmark')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='worker processes, default one per CPU')
+    parser.add_argument('--threads', type=int, default=5,
+                        help='threads for the threaded gate benchmark')
+    parser.add_argument('--output', default=None,
+                        help='JSON file to write the results to')
+    args = parser.parse_args()
+
+    results = []
+
+    def run(result):
+        print_result(result)
+        results.append(result)
+
+    for size in args.sizes:
+        for name, min_qubits in MIN_QUBITS.items():
+            # Gates on more qubits than the group has are skipped
+            if size >= min_qubits:
+                run(bench_gate(name, size, args.repeat, args.processes))
+        run(bench_measure(size, max(1, args.repeat // 10), args.processes))
+        run(bench_merge(size, max(1, args.repeat // 10)))
+    run(bench_epr(args.repeat, args.processes))
+    run(bench_threads(args.threads, args.repeat, args.processes))
+    print('main peak rss %d kB' % main_peak_rss_kb())
+
+    if args.output is not None:
+        report = {
+            'meta': {
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'numpy': np.__version__,
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+                'args': vars(args),
+                'main_peak_rss_kb': main_peak_rss_kb(),
+            },
+            'results': results,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
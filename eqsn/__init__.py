@@ -1 +1,3 @@
 from eqsn.gates import EQSN
+from eqsn.worker_pool import WorkerPool
+from eqsn.backpressure import QueueFullError
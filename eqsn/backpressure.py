@@ -0,0 +1,68 @@
+import multiprocessing
+
+# What happens to a gate if the window of its worker process is full
+BLOCK = 'block'
+DROP = 'drop'
+RAISE = 'raise'
+BACKPRESSURE_MODES = (BLOCK, DROP, RAISE)
+
+
+class QueueFullError(Exception):
+    """
+    Raised when a gate is submitted to a worker process whose window of
+    pending gates is full and the pool uses the RAISE mode.
+    """
+    pass
+
+
+class InFlightWindow(object):
+    """
+    Counts the gates which have been submitted to a Worker Process but not
+    yet applied by one of its Qubit Threads. If a maximum is given, no more
+    gates than the maximum can be pending at the same time. The window is
+    created before the Worker Process is started, so that the main process
+    and the Qubit Threads share it.
+    """
+
+    def __init__(self, max_pending=None):
+        """
+        Args:
+            max_pending (int): Maximum amount of pending gates, None for no
+                limit.
+        """
+        self.max_pending = max_pending
+        self.pending = multiprocessing.Value('l', 0)
+        self.slots = None
+        if max_pending is not None:
+            self.slots = multiprocessing.Semaphore(max_pending)
+
+    def acquire(self, block=True):
+        """
+        Takes a slot for a new gate.
+
+        Args:
+            block (bool): Wait until a slot is free if the window is full.
+
+        Returns:
+            bool. False if the window is full and block is False.
+        """
+        if self.slots is not None and not self.slots.acquire(block):
+            return False
+        with self.pending.get_lock():
+            self.pending.value += 1
+        return True
+
+    def release(self):
+        """
+        Frees the slot of a gate which has been applied.
+        """
+        with self.pending.get_lock():
+            self.pending.value -= 1
+        if self.slots is not None:
+            self.slots.release()
+
+    def depth(self):
+        """
+        Gives the amount of pending gates.
+        """
+        return self.pending.value
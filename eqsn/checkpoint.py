@@ -0,0 +1,78 @@
+import json
+import os
+
+import numpy as np
+
+AMPLITUDES_FILE = "amplitudes.npy"
+INDEX_FILE = "index.json"
+
+
+def write_checkpoint(path, groups):
+    """
+    Writes the state vectors of a list of qubit groups to a checkpoint
+    directory. All amplitudes are stored one after another in a single
+    .npy file, which can be memory mapped, and the qubit ids of every group
+    together with the position and the dtype of its amplitudes are stored
+    in an index. The file has the dtype of the state vectors, e.g. csingle,
+    so a checkpoint takes no more space than the state in memory.
+
+    Args:
+        path (String): Directory of the checkpoint, created if it does not exist.
+        groups (List): List of tuples of a qubit id list and its state vector.
+    """
+    os.makedirs(path, exist_ok=True)
+    total = sum(len(vector) for _, vector in groups)
+    dtype = np.result_type(np.csingle, *[vector.dtype for _, vector in groups])
+    amplitudes = np.lib.format.open_memmap(
+        os.path.join(path, AMPLITUDES_FILE), mode='w+',
+        dtype=dtype, shape=(total,))
+    index = []
+    offset = 0
+    for qubits, vector in groups:
+        size = len(vector)
+        amplitudes[offset:offset + size] = vector
+        index.append({'qubits': list(qubits), 'offset': offset, 'size': size,
+                      'dtype': vector.dtype.str})
+        offset += size
+    amplitudes.flush()
+    del amplitudes
+    with open(os.path.join(path, INDEX_FILE), 'w') as f:
+        json.dump({'groups': index}, f)
+
+
+def read_checkpoint_index(path):
+    """
+    Reads the index of a checkpoint directory.
+
+    Args:
+        path (String): Directory of the checkpoint.
+
+    Returns:
+        List. List of dictionaries with the qubit ids, the offset, the size
+        and the dtype of the state vector of every group.
+    """
+    with open(os.path.join(path, INDEX_FILE), 'r') as f:
+        return json.load(f)['groups']
+
+
+def load_amplitudes(path, offset, size, dtype=None):
+    """
+    Maps the amplitudes of one group of a checkpoint into memory. The data is
+    only read from disk when it is accessed, unless it has to be converted
+    to the dtype of the group.
+
+    Args:
+        path (String): Directory of the checkpoint.
+        offset (int): Position of the first amplitude of the group.
+        size (int): Amount of amplitudes of the group.
+        dtype (String): Dtype of the state vector of the group. If None,
+            the dtype of the file is used.
+
+    Returns:
+        np.ndarray. Read only view of the amplitudes.
+    """
+    amplitudes = np.load(os.path.join(path, AMPLITUDES_FILE), mmap_mode='r')
+    amplitudes = amplitudes[offset:offset + size]
+    if dtype is not None and amplitudes.dtype != np.dtype(dtype):
+        return amplitudes.astype(dtype)
+    return amplitudes
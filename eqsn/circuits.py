@@ -0,0 +1,207 @@
+import numpy as np
+
+from eqsn.qubit_thread import SINGLE_GATE, DOUBLE_GATE, CONTROLLED_TWO_GATE, \
+    MEASURE
+from eqsn.sparse_state import controlled_matrix
+
+GATES = {
+    'X': np.array([[0, 1], [1, 0]], dtype=np.csingle),
+    'Y': np.array([[0, -1j], [1j, 0]], dtype=np.csingle),
+    'Z': np.array([[1, 0], [0, -1]], dtype=np.csingle),
+    'H': (1 / 2.0) ** 0.5 * np.array([[1, 1], [1, -1]], dtype=np.csingle),
+    'T': np.array([[1, 0], [0, np.exp(1j * np.pi / 4)]], dtype=np.csingle),
+    'S': np.array([[1, 0], [0, 1j]], dtype=np.csingle),
+    'K': 0.5 * np.array([[1 + 1j, 1 - 1j], [-1 + 1j, -1 - 1j]], dtype=np.csingle),
+}
+
+SWAP = np.array([[1, 0, 0, 0], [0, 0, 1, 0], [0, 1, 0, 0], [0, 0, 0, 1]],
+                dtype=np.csingle)
+
+# Maps the Bell states Phi+, Psi+, Phi- and Psi- to |00>, |01>, |10> and |11>
+BELL = np.kron(GATES['H'], np.eye(2)).dot(
+    controlled_matrix(GATES['X'])).astype(np.csingle)
+
+
+def rotation(axis, rad):
+    """
+    Gives the matrix of a rotation around the X, Y or Z axis. For an array
+    of angles, a stack with one matrix per angle is given.
+    """
+    rad = np.asarray(rad, dtype=np.float64)
+    c = np.cos(rad / 2)
+    s = np.sin(rad / 2)
+    zero = np.zeros_like(c)
+    if axis == 'X':
+        mat = [[c, -1j * s], [-1j * s, c]]
+    elif axis == 'Y':
+        mat = [[c, -s], [s, c]]
+    else:
+        mat = [[np.exp(-1j * rad / 2), zero], [zero, np.exp(1j * rad / 2)]]
+    return np.moveaxis(np.array(mat, dtype=np.csingle), (0, 1), (-2, -1))
+
+
+def basis_change(basis):
+    """
+    Gives the unitary which maps the states of a measurement basis of a
+    qubit to |0> and |1>, None for the computational basis.
+
+    Args:
+        basis (String or np.ndarray): 'X', 'Y', 'Z' or a unitary 2x2 matrix
+            whose columns are the states of the basis.
+    """
+    if isinstance(basis, str):
+        basis = basis.upper()
+        if basis == 'Z':
+            return None
+        if basis == 'X':
+            return GATES['H']
+        if basis == 'Y':
+            return GATES['H'].dot(GATES['S'].conj().T)
+        raise ValueError("Unknown basis %s." % basis)
+    basis = np.asarray(basis)
+    if basis.shape != (2, 2) or \
+            not np.allclose(basis.conj().T.dot(basis), np.eye(2), atol=1e-5):
+        raise ValueError("The basis has to be a unitary 2x2 matrix.")
+    return basis.conj().T.astype(np.csingle)
+
+
+def conditional_gate(gate, result, value=1):
+    """
+    Gives the gate which is applied if a measurement result has a value,
+    None if the gate is not applied. For the results of an ensemble, a stack
+    is given, which applies the identity to the copies with another result.
+
+    Args:
+        gate (np.ndarray): 2x2 unitary matrix, or a stack of them.
+        result (int): The measurement result, or an array of results.
+        value (int): The result for which the gate is applied.
+    """
+    if np.ndim(result) == 0:
+        return gate if result == value else None
+    condition = (np.asarray(result) == value)[:, None, None]
+    return np.where(condition, gate, np.eye(2, dtype=gate.dtype))
+
+
+def operation_matrix(op):
+    """
+    Gives the qubits and the unitary matrix of an operation of a circuit,
+    where the first qubit is the most significant one of the matrix.
+
+    Args:
+        op (Tuple): The operation, e.g. ('H', 'a') or ('cnot', 'b', 'a').
+
+    Returns:
+        Tuple. List of qubits and the matrix, or None for a measurement.
+    """
+    name = op[0]
+    if name in GATES:
+        return [op[1]], GATES[name]
+    if name in ('RX', 'RY', 'RZ'):
+        return [op[1]], rotation(name[1], op[2])
+    if name == 'custom':
+        return [op[1]], np.asarray(op[2])
+    if name == 'cnot':
+        return [op[2], op[1]], controlled_matrix(GATES['X'])
+    if name == 'cphase':
+        return [op[2], op[1]], controlled_matrix(GATES['Z'])
+    if name == 'custom_controlled':
+        return [op[2], op[1]], controlled_matrix(np.asarray(op[3]))
+    if name == 'custom_two_qubit':
+        return [op[1], op[2]], np.asarray(op[3])
+    if name == 'custom_two_qubit_control':
+        return [op[1], op[2], op[3]], controlled_matrix(np.asarray(op[4]))
+    if name == 'measure':
+        return [op[1]], None
+    raise ValueError("Unknown operation %s." % name)
+
+
+def circuit_qubits(ops):
+    """
+    Gives the formal qubits of a circuit, in the order of their first use,
+    and the qubits which are measured.
+    """
+    qubits = []
+    measured = []
+    for op in ops:
+        op_qubits, mat = operation_matrix(op)
+        if len(set(op_qubits)) != len(op_qubits):
+            raise ValueError("Operation %s uses a qubit twice." % op[0])
+        for q in op_qubits:
+            if q in measured:
+                raise ValueError("Qubit %s is used after its measurement." % q)
+            if q not in qubits:
+                qubits.append(q)
+        if mat is None:
+            measured.append(op_qubits[0])
+    return qubits, measured
+
+
+def _in_order(mat, qubits, order):
+    """
+    Gives a two qubit matrix on qubits in the qubit order of order.
+    """
+    if list(qubits) == list(order):
+        return mat
+    return SWAP.dot(mat).dot(SWAP)
+
+
+def compile_circuit(ops):
+    """
+    Compiles a circuit into a list of Qubit Thread commands on formal qubits.
+    Consecutive single qubit gates on a qubit are multiplied into one gate,
+    single qubit gates before or after a two qubit gate are multiplied into
+    it, and consecutive two qubit gates on the same pair of qubits are
+    multiplied into one gate.
+
+    Args:
+        ops (List): The operations of the circuit, see EQSN.define_circuit.
+
+    Returns:
+        List. Steps of the command, the matrix (None for measurements) and
+        the formal qubits of the command.
+    """
+    steps = []
+    pending = {}
+
+    def flush(q):
+        if q in pending:
+            steps.append([SINGLE_GATE, pending.pop(q), [q]])
+
+    for op in ops:
+        qubits, mat = operation_matrix(op)
+        if mat is None:
+            flush(qubits[0])
+            steps.append([MEASURE, None, qubits])
+        elif len(qubits) == 1:
+            q = qubits[0]
+            last = steps[-1] if steps else None
+            if q in pending:
+                pending[q] = mat.dot(pending[q])
+            elif last is not None and last[0] == DOUBLE_GATE and q in last[2]:
+                if last[2].index(q) == 0:
+                    full = np.kron(mat, np.eye(2))
+                else:
+                    full = np.kron(np.eye(2), mat)
+                last[1] = full.dot(last[1])
+            else:
+                pending[q] = mat
+        elif len(qubits) == 2:
+            before = [pending.pop(q, np.eye(2)) for q in qubits]
+            mat = mat.dot(np.kron(before[0], before[1]))
+            last = steps[-1] if steps else None
+            if last is not None and last[0] == DOUBLE_GATE and \
+                    set(last[2]) == set(qubits):
+                last[1] = _in_order(mat, qubits, last[2]).dot(last[1])
+            else:
+                steps.append([DOUBLE_GATE, mat, qubits])
+        else:
+            for q in qubits:
+                flush(q)
+            # Controlled two qubit gates take the 4x4 target matrix
+            steps.append([CONTROLLED_TWO_GATE, mat[4:, 4:], qubits])
+    for q in list(pending):
+        flush(q)
+    for step in steps:
+        if step[1] is not None:
+            step[1] = step[1].astype(np.csingle)
+    return steps
@@ -0,0 +1,140 @@
+import numpy as np
+
+
+class EnsembleState(object):
+    """
+    State vectors of n qubits for a batch of independent members, e.g. the
+    runs of a parameter sweep, stored as one (batch, 2^n) array. Gates are
+    either one matrix for all members or a stack with one matrix per member,
+    and every member is measured with its own outcome, so that a whole sweep
+    is a single vectorized computation. Like in the dense state vector, the
+    first qubit is the most significant bit of an index.
+    """
+
+    def __init__(self, vectors):
+        """
+        Args:
+            vectors (np.ndarray): One state vector per member.
+        """
+        self.vectors = vectors
+
+    @staticmethod
+    def zero(batch):
+        """
+        Gives a single qubit in the state |0> for every member.
+
+        Args:
+            batch (int): Amount of members.
+        """
+        vectors = np.zeros((batch, 2), dtype=np.csingle)
+        vectors[:, 0] = 1
+        return EnsembleState(vectors)
+
+    @property
+    def n(self):
+        return self.vectors.shape[1].bit_length() - 1
+
+    @property
+    def batch(self):
+        return self.vectors.shape[0]
+
+    def to_dense(self):
+        """
+        Gives the state vectors of all members as a (batch, 2^n) array.
+        """
+        return self.vectors.copy()
+
+    def get(self, indices):
+        """
+        Gives the amplitudes with the given indices of all members.
+
+        Args:
+            indices (List): Indices of the amplitudes.
+        """
+        return self.vectors[:, np.asarray(indices)]
+
+    def _tensor(self, position):
+        """
+        Gives the state vectors as a (batch, 2, rest) tensor, where the
+        middle axis is the qubit at the position.
+        """
+        tensor = np.reshape(self.vectors, (self.batch,) + (2,) * self.n)
+        return np.moveaxis(tensor, position + 1, 1).reshape((self.batch, 2, -1))
+
+    def apply_gate(self, gate, positions):
+        """
+        Applies a gate on k qubits of every member.
+
+        Args:
+            gate (np.ndarray): 2^k x 2^k unitary matrix, or a stack of them
+                with one matrix per member.
+            positions (List): Positions of the k qubits, the first one is the
+                most significant qubit of the gate.
+        """
+        k = len(positions)
+        axes = [p + 1 for p in positions]
+        tensor = np.reshape(self.vectors, (self.batch,) + (2,) * self.n)
+        tensor = np.moveaxis(tensor, axes, range(1, k + 1))
+        shape = tensor.shape
+        tensor = tensor.reshape((self.batch, 2 ** k, -1))
+        if gate.ndim == 2:
+            tensor = np.einsum('ij,bjr->bir', gate, tensor)
+        else:
+            tensor = np.einsum('bij,bjr->bir', gate, tensor)
+        tensor = np.moveaxis(tensor.reshape(shape), range(1, k + 1), axes)
+        dtype = np.result_type(self.vectors, gate)
+        self.vectors = tensor.reshape((self.batch, -1)).astype(dtype, copy=False)
+
+    def probability_one(self, position):
+        """
+        Gives the probability of every member to measure a qubit in |1>.
+
+        Args:
+            position (int): Position of the qubit.
+        """
+        tensor = self._tensor(position)
+        return np.sum(np.abs(tensor[:, 1]) ** 2, axis=1)
+
+    def reduced_density_matrix(self, position):
+        """
+        Gives the reduced 2x2 density matrix of a qubit for every member.
+
+        Args:
+            position (int): Position of the qubit.
+        """
+        tensor = self._tensor(position)
+        return np.einsum('bir,bjr->bij', tensor, tensor.conj())
+
+    def collapse(self, position, result, remove=False):
+        """
+        Projects a qubit of every member on its measurement result and
+        renormalizes.
+
+        Args:
+            position (int): Position of the qubit.
+            result (np.ndarray): The measurement result of every member.
+            remove (bool): Remove the qubit from the state afterwards.
+        """
+        result = np.broadcast_to(result, (self.batch,))
+        tensor = self._tensor(position)
+        kept = tensor[np.arange(self.batch), result]
+        kept = kept / np.linalg.norm(kept, axis=1)[:, None]
+        if remove:
+            self.vectors = kept
+            return
+        projected = np.zeros_like(tensor)
+        projected[np.arange(self.batch), result] = kept
+        shape = (self.batch, 2) + (2,) * (self.n - 1)
+        projected = np.moveaxis(projected.reshape(shape), 1, position + 1)
+        self.vectors = projected.reshape((self.batch, -1))
+
+    def kron(self, other):
+        """
+        Gives the tensor product with another ensemble of the same size,
+        whose qubits come after the qubits of this one.
+
+        Args:
+            other (EnsembleState): The other ensemble.
+        """
+        vectors = np.einsum('bi,bj->bij', self.vectors, other.vectors)
+        return EnsembleState(vectors.reshape((self.batch, -1)))
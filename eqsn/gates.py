@@ -1,68 +1,452 @@
-import multiprocessing
+import itertools
 import logging
+import json
+import os
+import time
 import numpy as np
 from eqsn.qubit_thread import SINGLE_GATE, MERGE_SEND, MERGE_ACCEPT, MEASURE, \
     MEASURE_NON_DESTRUCTIVE, GIVE_STATEVECTOR, DOUBLE_GATE, \
-    CONTROLLED_GATE, NEW_QUBIT, ADD_MERGED_QUBITS_TO_DICT, CONTROLLED_TWO_GATE
+    CONTROLLED_GATE, NEW_QUBIT, ADD_MERGED_QUBITS_TO_DICT, CONTROLLED_TWO_GATE, \
+    STOP_NAMESPACE, CHECKPOINT, RESTORE_QUBITS, GIVE_PROBABILITIES, \
+    GIVE_DENSITY_MATRIX, GIVE_EXPECTATION, TRACE, GIVE_TRACE, GATE_COMMANDS, \
+    BARRIER, DEFINE_CIRCUIT, RUN_CIRCUIT, APPLY_CHANNEL, MEASURE_REF, APPLY_IF, \
+    GIVE_RESULT, MULTI_CONTROLLED_GATE, K_QUBIT_GATE, MEASURE_BASIS, \
+    RESET_QUBIT, RELEASE_RESULT
+from eqsn.circuits import circuit_qubits, rotation, conditional_gate, \
+    basis_change, GATES, BELL
+from eqsn.noise import kraus_operators, depolarizing, dephasing, \
+    amplitude_damping
+from eqsn.profiling import merge_stats, chrome_trace_events
+from eqsn.checkpoint import write_checkpoint, read_checkpoint_index
+from eqsn.mps_state import STATEVECTOR, MPS, ENSEMBLE
 from eqsn.shared_dict import SharedDict
-from eqsn.worker_process import WorkerProcess
-from eqsn.process_picker import ProcessPicker
+from eqsn.worker_pool import WorkerPool
+
+
+class MeasurementRef(object):
+    """
+    Handle of a measurement whose result is kept by the worker process of
+    the measured qubit, to control later gates without waiting for it. The
+    worker process keeps the result until EQSN.result fetches it or
+    EQSN.release discards it.
+    """
+
+    def __init__(self, key, queue):
+        """
+        Args:
+            key (Tuple): Namespace and number of the measurement.
+            queue (Queue): Queue of the worker process with the result.
+        """
+        self.key = key
+        self.queue = queue
+        # The result once it has been fetched from the worker process
+        self.value = None
+        self.fetched = False
+        self.released = False
 
 
 class EQSN(object):
     """
     Main object of EQSN, with this object, all of the Qubits can be controlled.
-    All functions are threadsafe, but at the moment, only one instance should be
-    used.
+    All functions are threadsafe. Several EQSN objects can be used at the same
+    time, they share the worker processes but simulate independent systems.
     """
     __instance = None
+    __namespaces = itertools.count()
 
     @staticmethod
     def get_instance():
+        """
+        Gets the default EQSN object. If none exists, a new one is created.
+        """
         if EQSN.__instance is None:
-            return EQSN()
+            EQSN.__instance = EQSN()
         return EQSN.__instance
 
-    def __init__(self):
-        if EQSN.__instance is not None:
-            raise ValueError("Use get instance to get this class")
-        EQSN.__instance = self
-        self.manager = multiprocessing.Manager()
-        cpu_count = multiprocessing.cpu_count()
-        self.process_queue_list = []
-        for _ in range(cpu_count):
-            q = multiprocessing.Queue()
-            new_worker = WorkerProcess(q)
-            p = multiprocessing.Process(target=new_worker.run, args=())
-            p.start()
-            self.process_queue_list.append((p, q))
-        self.process_picker = ProcessPicker.get_instance(
-            cpu_count, self.process_queue_list)
-        # create the shared dict after all the processes have been created.
-        self.shared_dict = SharedDict.get_instance()
-
-    def new_qubit(self, q_id):
-        """
-        Creates a new qubit with an id.
+    def __init__(self, pool=None, backend=STATEVECTOR, truncation=1e-8,
+                 max_bond=None, batch=None, qubit_pool=0):
+        """
+        Args:
+            pool (WorkerPool): Pool of processes to run the qubits on. If None,
+                the pool shared by all EQSN objects of this process is used.
+            backend (String): How the states of the qubits are stored, either
+                'statevector', 'mps' for matrix product states, which scale
+                to long chains of weakly entangled qubits, or 'ensemble' for
+                a batch of independent copies of every qubit, e.g. for
+                parameter sweeps. Gates of an ensemble take one matrix, or a
+                stack with one matrix per copy, and measurements give one
+                result per copy.
+            truncation (float): For the MPS backend, Schmidt coefficients
+                below, relative to the norm of the state, are discarded
+                after every gate.
+            max_bond (int): For the MPS backend, the maximum bond dimension,
+                None for no limit.
+            batch (int): For the ensemble backend, the amount of copies.
+            qubit_pool (int): Amount of idle qubits in the state |0> which
+                are created in advance and handed out by new_qubit. Qubits
+                which are measured are reset and returned to the pool, as
+                long as it has less idle qubits.
+        """
+        if backend == STATEVECTOR:
+            self.backend = None
+        elif backend == MPS:
+            self.backend = (MPS, truncation, max_bond)
+        elif backend == ENSEMBLE:
+            if batch is None or batch < 1:
+                raise ValueError("The ensemble backend needs a batch size.")
+            self.backend = (ENSEMBLE, batch)
+        else:
+            raise ValueError("Unknown backend %s." % backend)
+        if pool is None:
+            pool = WorkerPool.get_shared_pool()
+        elif not pool.acquire():
+            raise ValueError("The worker pool has already been stopped.")
+        self.pool = pool
+        self.manager = pool.manager
+        self.process_queue_list = pool.process_queue_list
+        self.process_picker = pool.process_picker
+        # Qubits of this object are known as (namespace, q_id) by the workers.
+        self.namespace = next(EQSN.__namespaces)
+        self.shared_dict = SharedDict()
+        self.stopped = False
+        self.tracing = False
+        # Formal and measured qubits of the defined circuits
+        self.circuits = {}
+        self.measurement_numbers = itertools.count()
+        # Qubit ids are interned to small integers for the workers
+        self.id_numbers = itertools.count()
+        self.interned = {}
+        self.names = {}
+        # Interned number, process and queue of the idle qubits of the pool
+        self.qubit_pool = qubit_pool
+        self.free_qubits = []
+        for _ in range(qubit_pool):
+            p, q = self.process_picker.get_next_process_queue()
+            number = next(self.id_numbers)
+            self._put(q, [NEW_QUBIT, (self.namespace, number), self.backend])
+            self.free_qubits.append((number, p, q))
+        # Process and queue of every placement group of new_qubit
+        self.placements = {}
+
+    def _worker_id(self, q_id):
+        """
+        Gives the id under which a qubit is known to the worker processes,
+        the namespace and the integer the id has been interned to.
+
+        Args:
+            q_id (String): Id of the qubit.
+        """
+        return self.namespace, self.interned[q_id]
+
+    def _check_not_ensemble(self):
+        """
+        Raises a ValueError for functions which are not available for the
+        ensemble backend.
+        """
+        if self.backend is not None and self.backend[0] == ENSEMBLE:
+            raise ValueError("Not available for the ensemble backend.")
+
+    def _intern(self, q_id):
+        """
+        Interns the id of a new qubit to a small integer, so that the workers
+        only hash and pickle integers.
+
+        Args:
+            q_id (String): Id of the qubit.
+        """
+        number = self.interned.setdefault(q_id, next(self.id_numbers))
+        self.names[number] = q_id
+
+    def _release(self, q_id):
+        """
+        Forgets the interned integer of a qubit which has been removed.
+
+        Args:
+            q_id (String): Id of the qubit.
+        """
+        number = self.interned.pop(q_id, None)
+        self.names.pop(number, None)
+
+    def _user_ids(self, worker_ids):
+        """
+        Gives the ids of qubits from their ids in the worker processes.
+
+        Args:
+            worker_ids (List): Ids of the qubits in the worker processes.
+        """
+        return [self.names[number] for _, number in worker_ids]
+
+    def new_qubit(self, q_id, near=None, group=None):
+        """
+        Creates a new qubit with an id. Qubits which will be entangled can be
+        placed on the same worker process, so that merging them later does
+        not move a state between processes.
 
         Args:
             q_id (String): Id of the new qubit.
+            near (String): Id of a qubit, the new qubit is placed on the
+                worker process of this qubit.
+            group (Hashable): Key of a placement group, all qubits created
+                with the same key are placed on the same worker process.
         """
-        p, q = self.process_picker.get_next_process_queue()
-        q.put([NEW_QUBIT, q_id])
+        placement = self._placement(near, group)
+        free = self._free_qubit(None if placement is None else placement[1])
+        if free is not None:
+            number, p, q = free
+            self.interned[q_id] = number
+            self.names[number] = q_id
+        else:
+            if placement is None:
+                placement = self.process_picker.get_next_process_queue()
+            p, q = placement
+            self._intern(q_id)
+            self._put(q, [NEW_QUBIT, self._worker_id(q_id), self.backend])
         self.shared_dict.set_thread_with_id(q_id, p, q)
         logging.debug("Created new qubit with id %s.", q_id)
 
-    def stop_all(self):
+    def _placement(self, near, group):
+        """
+        Gives the process and queue a new qubit is placed on, None if the
+        process picker decides.
+
+        Args:
+            near (String): Id of a qubit to place the new qubit next to.
+            group (Hashable): Key of a placement group.
+        """
+        if near is not None:
+            q, p = self.shared_dict.get_queues_and_threads_for_ids([near])[0]
+            return p, q
+        if group is None:
+            return None
+        if group not in self.placements:
+            self.placements[group] = \
+                self.process_picker.get_next_process_queue()
+        return self.placements[group]
+
+    def _free_qubit(self, queue=None):
         """
-        Stops the simulator from running.
+        Takes an idle qubit from the pool, None if there is none.
+
+        Args:
+            queue (Queue): Only take a qubit of the worker process with this
+                queue, any qubit if None.
+        """
+        try:
+            if queue is None:
+                return self.free_qubits.pop()
+            for i in reversed(range(len(self.free_qubits))):
+                if self.free_qubits[i][2] is queue:
+                    return self.free_qubits.pop(i)
+        except IndexError:
+            pass
+        return None
+
+    def _put(self, q, item):
         """
-        for p, q in self.process_queue_list:
-            q.put(None)
-            p.join()
-        self.shared_dict.stop_shared_dict()
-        self.process_picker.stop_process_picker()
-        EQSN.__instance = None
+        Sends a command to a worker process. If tracing is enabled, the
+        command is sent together with the time it was submitted. Gates take
+        a slot in the window of pending gates of the worker process and are
+        not sent if the pool drops them.
+
+        Args:
+            q (Queue): Queue of the worker process.
+            item (List): The command and its arguments.
+        """
+        if item[0] in GATE_COMMANDS and np.ndim(item[1]) == 3 and \
+                item[0] != APPLY_CHANNEL:
+            # A stack of gates, one for every copy of an ensemble
+            if self.backend is None or self.backend[0] != ENSEMBLE or \
+                    len(item[1]) != self.backend[1]:
+                raise ValueError("Stacks of gates need an ensemble of the "
+                                 "same size.")
+        if item[0] in GATE_COMMANDS and not self.pool.admit(q):
+            logging.debug("Dropped gate, the worker process is full.")
+            return
+        if self.tracing:
+            item = [TRACE, self.namespace, [time.time()], item]
+        q.put(item)
+
+    def stop_all(self, keep_workers=False):
+        """
+        Stops the simulator from running. All qubits of this object are
+        removed, the worker processes are stopped once no other EQSN object
+        uses them.
+
+        Args:
+            keep_workers (bool): Keep the worker processes running, even if
+                no other EQSN object uses them, so that the next EQSN object
+                can reuse them without starting new processes.
+        """
+        if self.stopped:
+            return
+        self.stopped = True
+        channels = []
+        for _, q in self.process_queue_list:
+            ret = self.manager.Queue()
+            q.put([STOP_NAMESPACE, self.namespace, ret])
+            channels.append(ret)
+        for ret in channels:
+            ret.get()
+        self.pool.release(keep_workers)
+        if EQSN.__instance is self:
+            EQSN.__instance = None
+
+    def barrier(self, q_ids=None):
+        """
+        Waits until all commands which have been sent to the given qubits
+        before have been executed, without transferring any state. The
+        worker processes are asked at the same time.
+
+        Args:
+            q_ids(List): Qubit ids to wait for. If None, all qubits of this
+                object are waited for.
+        """
+        if q_ids is None:
+            self.flush()
+            return
+        workers = {}
+        for q_id in q_ids:
+            q = self.shared_dict.get_queues_for_ids([q_id])[0]
+            workers.setdefault(q, []).append(self._worker_id(q_id))
+        channels = []
+        for q, ids in workers.items():
+            ret = self.manager.Queue()
+            self._put(q, [BARRIER, self.namespace, ids, ret])
+            channels.append(ret)
+        for ret in channels:
+            ret.get()
+
+    def flush(self):
+        """
+        Waits until all commands which have been sent by this object to any
+        worker process have been executed.
+        """
+        channels = []
+        for _, q in self.process_queue_list:
+            ret = self.manager.Queue()
+            self._put(q, [BARRIER, self.namespace, None, ret])
+            channels.append(ret)
+        for ret in channels:
+            ret.get()
+
+    def define_circuit(self, name, ops):
+        """
+        Defines a circuit which can be run on different qubits afterwards.
+        The circuit is sent to all worker processes once, which compile it,
+        e.g. by multiplying consecutive gates into one, and cache it.
+
+        The operations act on formal qubits, which are mapped to qubit ids
+        when the circuit is run. Possible operations are ('X', q), ('Y', q),
+        ('Z', q), ('H', q), ('T', q), ('S', q), ('K', q), ('RX', q, rad),
+        ('RY', q, rad), ('RZ', q, rad), ('custom', q, gate),
+        ('cnot', target, control), ('cphase', target, control),
+        ('custom_controlled', target, control, gate),
+        ('custom_two_qubit', q1, q2, gate),
+        ('custom_two_qubit_control', control, q1, q2, gate) and
+        ('measure', q), which is destructive.
+
+        Args:
+            name(String): Name of the circuit.
+            ops(List): List of operations.
+        """
+        qubits, measured = circuit_qubits(ops)
+        for _, q in self.process_queue_list:
+            self._put(q, [DEFINE_CIRCUIT, self.namespace, name, list(ops)])
+        self.circuits[name] = (qubits, measured)
+
+    def run(self, name, qubit_map):
+        """
+        Runs a circuit which has been defined before with a single command to
+        a worker process. If the circuit measures qubits, the call waits for
+        the results, otherwise it returns immediately.
+
+        Args:
+            name(String): Name of the circuit.
+            qubit_map(Dict): Qubit id for every formal qubit of the circuit.
+
+        Returns:
+            Dict. Measurement result for every measured formal qubit, None if
+            the circuit does not measure.
+        """
+        if name not in self.circuits:
+            raise ValueError("Circuit %s is not defined." % name)
+        qubits, measured = self.circuits[name]
+        if any(q not in qubit_map for q in qubits):
+            raise ValueError("Every qubit of the circuit has to be mapped.")
+        q_ids = [qubit_map[q] for q in qubits]
+        if len(set(q_ids)) != len(q_ids):
+            raise ValueError("Qubit ids have to be unique.")
+        for q_id in q_ids[1:]:
+            self.merge_qubits(q_id, q_ids[0])
+        q = self.shared_dict.get_queues_for_ids([q_ids[0]])[0]
+        worker_map = {f: self._worker_id(qubit_map[f]) for f in qubits}
+        if not measured:
+            self._put(q, [RUN_CIRCUIT, self.namespace, name, worker_map, None])
+            return None
+        ret = self.manager.Queue()
+        self._put(q, [RUN_CIRCUIT, self.namespace, name, worker_map, ret])
+        results = ret.get()
+        for f in measured:
+            self.shared_dict.delete_id_and_check_to_join_thread(qubit_map[f])
+            self._release(qubit_map[f])
+        return {f: results[worker_map[f]] for f in measured}
+
+    def start_tracing(self):
+        """
+        Starts tracing all commands sent by this object. For every command,
+        the time of submission, when the worker process and the qubit thread
+        took it from their queues and when it was completed are recorded.
+        """
+        self.tracing = True
+
+    def stop_tracing(self):
+        """
+        Stops tracing commands. The recorded data is kept until it is reset.
+        """
+        self.tracing = False
+
+    def _give_traces(self, reset):
+        """
+        Collects the recorded trace data of all worker processes.
+        """
+        channels = []
+        for _, q in self.process_queue_list:
+            ret = self.manager.Queue()
+            q.put([GIVE_TRACE, self.namespace, reset, ret])
+            channels.append(ret)
+        return [ret.get() for ret in channels]
+
+    def stats(self, reset=False):
+        """
+        Gives statistics of the traced commands which have been completed.
+        Durations are split into the stages queue (until the worker process
+        took the command), dispatch (until the qubit thread took it) and
+        execute (until it was completed).
+
+        Args:
+            reset(bool): Delete the recorded data afterwards.
+
+        Returns:
+            Dict. For every command, the count and for every stage the mean and
+            maximum duration and a histogram with power of two microsecond
+            buckets.
+        """
+        return merge_stats([stats for _, stats, _ in self._give_traces(reset)])
+
+    def write_chrome_trace(self, path, reset=False):
+        """
+        Writes the traced commands to a file in the Chrome trace event format,
+        which can be opened with chrome://tracing or Perfetto.
+
+        Args:
+            path(String): File to write the trace to.
+            reset(bool): Delete the recorded data afterwards.
+        """
+        events = []
+        for pid, _, worker_events in self._give_traces(reset):
+            events += chrome_trace_events(pid, worker_events)
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
 
     def X_gate(self, q_id):
         """
@@ -73,7 +457,7 @@ class EQSN(object):
         """
         x = np.array([[0, 1], [1, 0]], dtype=np.csingle)
         q = self.shared_dict.get_queues_for_ids([q_id])[0]
-        q.put([SINGLE_GATE, x, q_id])
+        self._put(q, [SINGLE_GATE, x, self._worker_id(q_id)])
 
     def Y_gate(self, q_id):
         """
@@ -84,7 +468,7 @@ class EQSN(object):
         """
         x = np.array([[0, 0 - 1j], [0 + 1j, 0]], dtype=np.csingle)
         q = self.shared_dict.get_queues_for_ids([q_id])[0]
-        q.put([SINGLE_GATE, x, q_id])
+        self._put(q, [SINGLE_GATE, x, self._worker_id(q_id)])
 
     def Z_gate(self, q_id):
         """
@@ -95,7 +479,7 @@ class EQSN(object):
         """
         x = np.array([[1, 0], [0, -1]], dtype=np.csingle)
         q = self.shared_dict.get_queues_for_ids([q_id])[0]
-        q.put([SINGLE_GATE, x, q_id])
+        self._put(q, [SINGLE_GATE, x, self._worker_id(q_id)])
 
     def H_gate(self, q_id):
         """
@@ -106,7 +490,7 @@ class EQSN(object):
         """
         x = (1 / 2.0) ** 0.5 * np.array([[1, 1], [1, -1]], dtype=np.csingle)
         q = self.shared_dict.get_queues_for_ids([q_id])[0]
-        q.put([SINGLE_GATE, x, q_id])
+        self._put(q, [SINGLE_GATE, x, self._worker_id(q_id)])
 
     def T_gate(self, q_id):
         """
@@ -119,7 +503,7 @@ class EQSN(object):
             [[1, 0], [0, (0.7071067811865476 + 0.7071067811865475j)]],
             dtype=np.csingle)
         q = self.shared_dict.get_queues_for_ids([q_id])[0]
-        q.put([SINGLE_GATE, x, q_id])
+        self._put(q, [SINGLE_GATE, x, self._worker_id(q_id)])
 
     def S_gate(self, q_id):
         """
@@ -130,7 +514,7 @@ class EQSN(object):
         """
         x = np.array([[1, 0], [0, 1j]], dtype=np.csingle)
         q = self.shared_dict.get_queues_for_ids([q_id])[0]
-        q.put([SINGLE_GATE, x, q_id])
+        self._put(q, [SINGLE_GATE, x, self._worker_id(q_id)])
 
     def K_gate(self, q_id):
         """
@@ -141,7 +525,7 @@ class EQSN(object):
         """
         x = 0.5 * np.array([[1 + 1j, 1 - 1j], [-1 + 1j, -1 - 1j]], dtype=np.csingle)
         q = self.shared_dict.get_queues_for_ids([q_id])[0]
-        q.put([SINGLE_GATE, x, q_id])
+        self._put(q, [SINGLE_GATE, x, self._worker_id(q_id)])
 
     def RX_gate(self, q_id, rad):
         """
@@ -149,13 +533,12 @@ class EQSN(object):
 
         Args:
             q_id(String): ID of the Qubit to apply the gate to.
-            rad(int): Rotational degrees in rad.
+            rad(int): Rotational degrees in rad, or an array with one angle
+                for every copy of an ensemble.
         """
-        mid = np.cos(rad / 2)
-        other = -1j * np.sin(rad / 2)
-        x = np.array([[mid, other], [other, mid]], dtype=np.csingle)
+        x = rotation('X', rad)
         q = self.shared_dict.get_queues_for_ids([q_id])[0]
-        q.put([SINGLE_GATE, x, q_id])
+        self._put(q, [SINGLE_GATE, x, self._worker_id(q_id)])
 
     def RY_gate(self, q_id, rad):
         """
@@ -163,13 +546,12 @@ class EQSN(object):
 
         Args:
             q_id(String): ID of the Qubit to apply the gate to.
-            rad(int): Rotational degrees in rad.
+            rad(int): Rotational degrees in rad, or an array with one angle
+                for every copy of an ensemble.
         """
-        mid = np.cos(rad / 2)
-        other = np.sin(rad / 2)
-        x = np.array([[mid, -1.0 * other], [other, mid]], dtype=np.csingle)
+        x = rotation('Y', rad)
         q = self.shared_dict.get_queues_for_ids([q_id])[0]
-        q.put([SINGLE_GATE, x, q_id])
+        self._put(q, [SINGLE_GATE, x, self._worker_id(q_id)])
 
     def RZ_gate(self, q_id, rad):
         """
@@ -177,13 +559,12 @@ class EQSN(object):
 
         Args:
             q_id(String): ID of the Qubit to apply the gate to.
-            rad(int): Rotational degrees in rad.
+            rad(int): Rotational degrees in rad, or an array with one angle
+                for every copy of an ensemble.
         """
-        top = np.exp(-1j * (rad / 2))
-        bot = np.exp(1j * (rad / 2))
-        x = np.array([[top, 0], [0, bot]], dtype=np.csingle)
+        x = rotation('Z', rad)
         q = self.shared_dict.get_queues_for_ids([q_id])[0]
-        q.put([SINGLE_GATE, x, q_id])
+        self._put(q, [SINGLE_GATE, x, self._worker_id(q_id)])
 
     def custom_gate(self, q_id, gate):
         """
@@ -194,7 +575,53 @@ class EQSN(object):
             gate(np.ndarray): unitary 2x2 matrix, of the gate.
         """
         q = self.shared_dict.get_queues_for_ids([q_id])[0]
-        q.put([SINGLE_GATE, gate, q_id])
+        self._put(q, [SINGLE_GATE, gate, self._worker_id(q_id)])
+
+    def custom_channel(self, q_id, kraus):
+        """
+        Applies a noise channel, given by its Kraus operators, to a qubit.
+        The channel is sampled: one Kraus operator is drawn with its
+        probability for the current state and applied, so that repeated runs
+        average to the noisy state without a density matrix.
+
+        Args:
+            q_id(String): Id of the Qubit to apply the channel on.
+            kraus(List): 2x2 Kraus operators of the channel.
+        """
+        kraus = kraus_operators(kraus)
+        q = self.shared_dict.get_queues_for_ids([q_id])[0]
+        self._put(q, [APPLY_CHANNEL, kraus, self._worker_id(q_id)])
+
+    def depolarize(self, q_id, p):
+        """
+        Replaces the state of a qubit with the maximally mixed state with
+        probability p.
+
+        Args:
+            q_id(String): Id of the Qubit.
+            p(float): Probability of depolarization.
+        """
+        self.custom_channel(q_id, depolarizing(p))
+
+    def dephase(self, q_id, p):
+        """
+        Flips the phase of a qubit with probability p.
+
+        Args:
+            q_id(String): Id of the Qubit.
+            p(float): Probability of a phase flip.
+        """
+        self.custom_channel(q_id, dephasing(p))
+
+    def amplitude_damp(self, q_id, gamma):
+        """
+        Lets a qubit decay from |1> to |0> with probability gamma.
+
+        Args:
+            q_id(String): Id of the Qubit.
+            gamma(float): Probability of a decay.
+        """
+        self.custom_channel(q_id, amplitude_damping(gamma))
 
     def merge_qubits(self, q_id1, q_id2):
         """
@@ -216,12 +643,12 @@ class EQSN(object):
             q2 = queues[1]
             merge_q = self.manager.Queue()
             qubits_q = self.manager.Queue()
-            q1.put([MERGE_SEND, q_id1, merge_q, qubits_q])
-            q2.put([MERGE_ACCEPT, q_id2, merge_q])
+            self._put(q1, [MERGE_SEND, self._worker_id(q_id1), merge_q, qubits_q])
+            self._put(q2, [MERGE_ACCEPT, self._worker_id(q_id2), merge_q])
             qubits = qubits_q.get()
-            q2.put([ADD_MERGED_QUBITS_TO_DICT, q_id2, qubits])
+            self._put(q2, [ADD_MERGED_QUBITS_TO_DICT, self._worker_id(q_id2), qubits])
             self.shared_dict.change_thread_and_queue_of_ids_nonblocking(
-                qubits, q_id2)
+                self._user_ids(qubits), q_id2)
             self.shared_dict.release_shared_dict()
 
     def cnot_gate(self, applied_to_id, controlled_by_id):
@@ -236,7 +663,8 @@ class EQSN(object):
         x = np.array([[0, 1], [1, 0]], dtype=np.csingle)
         self.merge_qubits(applied_to_id, controlled_by_id)
         q = self.shared_dict.get_queues_for_ids([applied_to_id])[0]
-        q.put([CONTROLLED_GATE, x, applied_to_id, controlled_by_id])
+        self._put(q, [CONTROLLED_GATE, x, self._worker_id(applied_to_id),
+                      self._worker_id(controlled_by_id)])
 
     def cphase_gate(self, applied_to_id, controlled_by_id):
         """
@@ -250,26 +678,218 @@ class EQSN(object):
         x = np.array([[1, 0], [0, -1]], dtype=np.csingle)
         self.merge_qubits(applied_to_id, controlled_by_id)
         q = self.shared_dict.get_queues_for_ids([applied_to_id])[0]
-        q.put([CONTROLLED_GATE, x, applied_to_id, controlled_by_id])
+        self._put(q, [CONTROLLED_GATE, x, self._worker_id(applied_to_id),
+                      self._worker_id(controlled_by_id)])
 
-    def give_statevector_for(self, q_id):
+    def give_statevector_for(self, q_id, out=None, indices=None):
         """
         Gives the statevector and Qubits of a Qubit and all other Qubits with
         which the qubit is entangled.
 
         Args:
             q_id(String): Qubit id of the Qubit to get the statevector from.
+            out(SharedMemory or np.ndarray): Optional buffer for the amplitudes.
+                A multiprocessing.shared_memory.SharedMemory block is written
+                directly by the worker process, so that the amplitudes are
+                not sent between processes. A numpy array is filled with the
+                received amplitudes.
+            indices(List): Indices of the amplitudes to return. If None, the
+                whole statevector is returned.
 
         Returns:
             Tuple. Tuple of a lists and vector, where the first list are the qubits of
-            the statevector and the second list is the statevector.
+            the statevector and the second list is the statevector. If out is
+            given, the vector is a view of out. Ensembles give one row per
+            copy.
         """
+        shm_name = None
+        if out is not None and not isinstance(out, np.ndarray):
+            shm_name = out.name
         ret = self.manager.Queue()
         q = self.shared_dict.get_queues_for_ids([q_id])[0]
-        q.put([GIVE_STATEVECTOR, q_id, ret])
+        self._put(q, [GIVE_STATEVECTOR, self._worker_id(q_id), ret, indices, shm_name])
         qubits, vector = ret.get()
+        qubits = self._user_ids(qubits)
+        if shm_name is not None:
+            size = vector
+            if size * np.dtype(np.complex128).itemsize > out.size:
+                raise ValueError(
+                    "Shared memory block is too small for %d amplitudes." % size)
+            return qubits, np.ndarray((size,), dtype=np.complex128, buffer=out.buf)
+        if out is not None:
+            out[:len(vector)] = vector
+            return qubits, out[:len(vector)]
         return qubits, vector
 
+    def _give_reduced_states(self, command, q_ids, args=None):
+        """
+        Asks the worker processes for a reduced state of the given qubits. The
+        qubits do not have to be merged, every thread answers for its qubits.
+
+        Args:
+            command(int): Which reduced state is requested.
+            q_ids(List): List of Qubit ids.
+            args(List): Optional argument for every qubit.
+
+        Returns:
+            List. List of tuples of the qubit ids and the reduced state of
+            every thread, with worker ids.
+        """
+        if len(set(q_ids)) != len(q_ids):
+            raise ValueError("Qubit ids have to be unique.")
+        workers = {}
+        for i, q_id in enumerate(q_ids):
+            q = self.shared_dict.get_queues_for_ids([q_id])[0]
+            ids, worker_args = workers.setdefault(q, ([], []))
+            ids.append(self._worker_id(q_id))
+            if args is not None:
+                worker_args.append(args[i])
+        channels = []
+        for q, (ids, worker_args) in workers.items():
+            ret = self.manager.Queue()
+            if args is None:
+                self._put(q, [command, ids, ret])
+            else:
+                self._put(q, [command, ids, ret, worker_args])
+            channels.append(ret)
+        states = []
+        for ret in channels:
+            states += ret.get()
+        return states
+
+    def expectation(self, pauli_string, q_ids):
+        """
+        Gives the expectation value of a product of Pauli operators, e.g.
+        expectation('ZZ', [q_id1, q_id2]) for <Z⊗Z>, or the components of the
+        Bloch vector of a qubit with 'X', 'Y' and 'Z'. It is computed by the
+        worker processes, only the value is transferred.
+
+        Args:
+            pauli_string(String): One of 'I', 'X', 'Y' or 'Z' for every qubit.
+            q_ids(List): Qubit ids the operators act on.
+
+        Returns:
+            float. The expectation value, or an array with the value of every
+            copy of an ensemble.
+        """
+        pauli_string = pauli_string.upper()
+        if len(pauli_string) != len(q_ids):
+            raise ValueError("Need one Pauli operator for every qubit.")
+        if any(p not in 'IXYZ' for p in pauli_string):
+            raise ValueError("Unknown Pauli operator in %s." % pauli_string)
+        paulis = [p for p in pauli_string if p != 'I']
+        q_ids = [q_id for p, q_id in zip(pauli_string, q_ids) if p != 'I']
+        value = 1.0
+        if len(q_ids) == 0:
+            return value
+        for _, group_value in self._give_reduced_states(
+                GIVE_EXPECTATION, q_ids, paulis):
+            value *= group_value
+        return value
+
+    def probabilities(self, q_ids):
+        """
+        Gives the marginal probabilities of the computational basis states of
+        a list of qubits. They are computed by the worker processes, only the
+        probabilities are transferred.
+
+        Args:
+            q_ids(List): Qubit ids.
+
+        Returns:
+            np.ndarray. Probabilities of the 2 ** len(q_ids) basis states,
+            where the first qubit is the most significant bit.
+        """
+        self._check_not_ensemble()
+        tensor = np.ones(())
+        order = []
+        for ids, probabilities in self._give_reduced_states(
+                GIVE_PROBABILITIES, q_ids):
+            tensor = np.multiply.outer(tensor, probabilities)
+            order += ids
+        axes = [order.index(self._worker_id(q_id)) for q_id in q_ids]
+        return np.transpose(tensor, axes).reshape(2 ** len(q_ids))
+
+    def reduced_density_matrix(self, q_ids):
+        """
+        Gives the reduced density matrix of a list of qubits. It is computed
+        by the worker processes, only the density matrix is transferred.
+
+        Args:
+            q_ids(List): Qubit ids.
+
+        Returns:
+            np.ndarray. The 2 ** len(q_ids) x 2 ** len(q_ids) density matrix,
+            where the first qubit is the most significant one.
+        """
+        self._check_not_ensemble()
+        tensor = np.ones(())
+        order = []
+        rows = []
+        cols = []
+        for ids, density_matrix in self._give_reduced_states(
+                GIVE_DENSITY_MATRIX, q_ids):
+            k = len(ids)
+            rows += range(tensor.ndim, tensor.ndim + k)
+            cols += range(tensor.ndim + k, tensor.ndim + 2 * k)
+            tensor = np.multiply.outer(tensor, density_matrix)
+            order += ids
+        positions = [order.index(self._worker_id(q_id)) for q_id in q_ids]
+        axes = [rows[i] for i in positions] + [cols[i] for i in positions]
+        size = 2 ** len(q_ids)
+        return np.transpose(tensor, axes).reshape((size, size))
+
+    def checkpoint(self, path):
+        """
+        Saves the state of all qubits to a checkpoint directory. The state
+        vectors are collected from all worker processes at the same time.
+        Qubit ids have to be serializable to JSON.
+
+        Args:
+            path(String): Directory to write the checkpoint to.
+        """
+        self._check_not_ensemble()
+        channels = []
+        for _, q in self.process_queue_list:
+            ret = self.manager.Queue()
+            self._put(q, [CHECKPOINT, self.namespace, ret])
+            channels.append(ret)
+        groups = []
+        for ret in channels:
+            for qubits, vector in ret.get():
+                if qubits[0][1] not in self.names:
+                    continue  # An idle qubit of the pool
+                groups.append((self._user_ids(qubits), vector))
+        write_checkpoint(path, groups)
+        logging.debug("Saved %d qubit groups to %s.", len(groups), path)
+
+    def restore(self, path):
+        """
+        Restores all qubits of a checkpoint. The state vectors are memory
+        mapped and only read from disk when they are used, therefore the
+        checkpoint must not be removed while the qubits exist.
+
+        Args:
+            path(String): Directory of the checkpoint.
+        """
+        groups = read_checkpoint_index(path)
+        existing = set(self.shared_dict.get_ids())
+        for group in groups:
+            for q_id in group['qubits']:
+                if q_id in existing:
+                    raise ValueError("Qubit with id %s already exists." % q_id)
+        path = os.path.abspath(path)
+        for group in groups:
+            p, q = self.process_picker.get_next_process_queue()
+            for q_id in group['qubits']:
+                self._intern(q_id)
+            q_ids = [self._worker_id(q_id) for q_id in group['qubits']]
+            self._put(q, [RESTORE_QUBITS, q_ids, path, group['offset'],
+                          group['size'], group.get('dtype')])
+            for q_id in group['qubits']:
+                self.shared_dict.set_thread_with_id(q_id, p, q)
+        logging.debug("Restored %d qubit groups from %s.", len(groups), path)
+
     def custom_two_qubit_gate(self, q_id1, q_id2, gate):
         """
         Applies a two Qubit gate to two Qubits.
@@ -281,7 +901,8 @@ class EQSN(object):
         """
         self.merge_qubits(q_id1, q_id2)
         q = self.shared_dict.get_queues_for_ids([q_id1])[0]
-        q.put([DOUBLE_GATE, gate, q_id1, q_id2])
+        self._put(q, [DOUBLE_GATE, gate, self._worker_id(q_id1),
+                      self._worker_id(q_id2)])
 
     def custom_two_qubit_control_gate(self, q_id1, q_id2, q_id3, gate):
         """
@@ -297,7 +918,64 @@ class EQSN(object):
         self.merge_qubits(q_id1, q_id3)
 
         q = self.shared_dict.get_queues_for_ids([q_id1])[0]
-        q.put([CONTROLLED_TWO_GATE, gate, q_id1, q_id2, q_id3])
+        self._put(q, [CONTROLLED_TWO_GATE, gate, self._worker_id(q_id1),
+                      self._worker_id(q_id2), self._worker_id(q_id3)])
+
+    def custom_k_qubit_gate(self, q_ids, gate):
+        """
+        Applies a gate on any amount of qubits, e.g. an encoder of an error
+        correcting code. The qubits do not have to be neighbours, the gate is
+        contracted with their axes of the state tensor.
+
+        Args:
+            q_ids(List): IDs of the k qubits, the first one is the most
+                significant qubit of the gate.
+            gate(np.ndarray): 2^k x 2^k unitary matrix.
+        """
+        q_ids = list(q_ids)
+        if len(set(q_ids)) != len(q_ids):
+            raise ValueError("Qubit ids have to be unique.")
+        if np.shape(gate)[-2:] != (2 ** len(q_ids), 2 ** len(q_ids)):
+            raise ValueError("The gate does not match the amount of qubits.")
+        for q_id in q_ids[1:]:
+            self.merge_qubits(q_id, q_ids[0])
+        q = self.shared_dict.get_queues_for_ids([q_ids[0]])[0]
+        self._put(q, [K_QUBIT_GATE, gate,
+                      [self._worker_id(q_id) for q_id in q_ids]])
+
+    def multi_controlled_gate(self, controls, targets, gate):
+        """
+        Applies a gate to some qubits if all control qubits are 1, e.g. a
+        Toffoli gate with two controls, one target and the X gate. Only the
+        amplitudes in which all controls are 1 are updated.
+
+        Args:
+            controls(List): IDs of the control qubits.
+            targets(List): IDs of the target qubits, the first one is the
+                most significant qubit of the gate.
+            gate(np.ndarray): 2^k x 2^k unitary matrix for k targets.
+        """
+        q_ids = list(controls) + list(targets)
+        if len(set(q_ids)) != len(q_ids):
+            raise ValueError("Qubit ids have to be unique.")
+        if np.shape(gate)[-1] != 2 ** len(targets):
+            raise ValueError("The gate does not match the amount of targets.")
+        for q_id in q_ids[1:]:
+            self.merge_qubits(q_id, q_ids[0])
+        q = self.shared_dict.get_queues_for_ids([q_ids[0]])[0]
+        self._put(q, [MULTI_CONTROLLED_GATE, gate,
+                      [self._worker_id(q_id) for q_id in controls],
+                      [self._worker_id(q_id) for q_id in targets]])
+
+    def mcx(self, controls, target):
+        """
+        Applies an X gate to a qubit if all control qubits are 1.
+
+        Args:
+            controls(List): IDs of the control qubits.
+            target(String): ID of the target qubit.
+        """
+        self.multi_controlled_gate(controls, [target], GATES['X'])
 
     def custom_controlled_gate(self, applied_to_id, controlled_by_id, gate):
         """
@@ -310,9 +988,10 @@ class EQSN(object):
         """
         self.merge_qubits(applied_to_id, controlled_by_id)
         q = self.shared_dict.get_queues_for_ids([applied_to_id])[0]
-        q.put([CONTROLLED_GATE, gate, applied_to_id, controlled_by_id])
+        self._put(q, [CONTROLLED_GATE, gate, self._worker_id(applied_to_id),
+                      self._worker_id(controlled_by_id)])
 
-    def measure(self, q_id, non_destructive=False):
+    def measure(self, q_id, non_destructive=False, basis=None):
         """
         Measures a qubit with an id. If non_destructive is False, the qubit
         is removed from the system, otherwise, the qubit stays in the system
@@ -322,16 +1001,189 @@ class EQSN(object):
             id (String): Id of the Qubit which should be measured.
             non_destructive(bool): If a qubit should not be removed from the
                                     system after measurement.
+            basis (String or np.ndarray): 'X', 'Y' or 'Z' or a unitary 2x2
+                matrix whose columns are the states of the measurement
+                basis. The computational basis is used if None. Outcome 0
+                is the first state of the basis.
+
+        Returns:
+            int. The outcome, or an array with the outcome of every copy of
+            an ensemble.
         """
+        gate = None if basis is None else basis_change(basis)
+        if gate is not None:
+            return self._measure_basis([q_id], gate, non_destructive)[0]
+        if not non_destructive and len(self.free_qubits) < self.qubit_pool:
+            return self._measure_to_pool(q_id)
         ret = self.manager.Queue()
         q = self.shared_dict.get_queues_for_ids([q_id])[0]
         if non_destructive:
-            q.put([MEASURE_NON_DESTRUCTIVE, q_id, ret])
+            self._put(q, [MEASURE_NON_DESTRUCTIVE, self._worker_id(q_id), ret])
         else:
-            q.put([MEASURE, q_id, ret])
+            self._put(q, [MEASURE, self._worker_id(q_id), ret])
         res = ret.get()
         if not non_destructive:
             self.shared_dict.delete_id_and_check_to_join_thread(q_id)
+            self._release(q_id)
+        logging.debug(
+            "Qubit with id %s has been measured with outcome %s.", q_id, res)
+        return res
+
+    def _measure_to_pool(self, q_id):
+        """
+        Measures a qubit, which is reset to |0> by its worker process and
+        returned to the pool of idle qubits.
+        """
+        q, p = self.shared_dict.get_queues_and_threads_for_ids([q_id])[0]
+        ret = self.manager.Queue()
+        number = self.interned[q_id]
+        self._put(q, [RESET_QUBIT, self._worker_id(q_id), ret, self.backend])
+        res = ret.get()
+        self.shared_dict.delete_id_and_check_to_join_thread(q_id)
+        self._release(q_id)
+        self.free_qubits.append((number, p, q))
+        logging.debug(
+            "Qubit with id %s has been measured with outcome %s.", q_id, res)
+        return res
+
+    def reset(self, q_id):
+        """
+        Measures a qubit and reinitializes it to |0>. The qubit keeps its id
+        and the worker process it runs on, so that it can be used again
+        without being removed and created.
+
+        Args:
+            q_id (String): Id of the Qubit which should be reset.
+
+        Returns:
+            int. The outcome of the measurement, or an array with the
+            outcome of every copy of an ensemble.
+        """
+        ret = self.manager.Queue()
+        q = self.shared_dict.get_queues_for_ids([q_id])[0]
+        self._put(q, [RESET_QUBIT, self._worker_id(q_id), ret, self.backend])
+        return ret.get()
+
+    def bell_measure(self, q_id1, q_id2, non_destructive=False):
+        """
+        Measures two qubits in the Bell basis. The outcome probabilities are
+        computed from the state in one pass of the worker process, instead
+        of a CNOT gate, a H gate and two measurements.
+
+        Args:
+            q_id1 (String): Id of the first qubit.
+            q_id2 (String): Id of the second qubit.
+            non_destructive(bool): If the qubits stay in the system, in the
+                measured Bell state.
+
+        Returns:
+            Tuple. The two bits of the outcome, (0, 0) for Phi+, (0, 1) for
+            Psi+, (1, 0) for Phi- and (1, 1) for Psi-.
+        """
+        if q_id1 == q_id2:
+            raise ValueError("Qubit ids have to be unique.")
+        return tuple(self._measure_basis([q_id1, q_id2], BELL, non_destructive))
+
+    def _measure_basis(self, q_ids, gate, non_destructive):
+        """
+        Measures qubits after a change of basis and gives all outcomes in
+        one reply of the worker process.
+        """
+        for q_id in q_ids[1:]:
+            self.merge_qubits(q_id, q_ids[0])
+        ret = self.manager.Queue()
+        q = self.shared_dict.get_queues_for_ids([q_ids[0]])[0]
+        self._put(q, [MEASURE_BASIS, gate,
+                      [self._worker_id(q_id) for q_id in q_ids], ret,
+                      non_destructive])
+        res = ret.get()
+        if not non_destructive:
+            for q_id in q_ids:
+                self.shared_dict.delete_id_and_check_to_join_thread(q_id)
+                self._release(q_id)
         logging.debug(
-            "Qubit with id %s has been measured with outcome %d.", q_id, res)
+            "Qubits with ids %s have been measured with outcome %s.", q_ids, res)
         return res
+
+    def measure_ref(self, q_id, non_destructive=False):
+        """
+        Measures a qubit without waiting for the outcome. The outcome is kept
+        by the worker process and can control later gates with apply_if,
+        e.g. the corrections of a teleportation, without a round trip.
+
+        Args:
+            q_id (String): Id of the Qubit which should be measured.
+            non_destructive(bool): If a qubit should not be removed from the
+                                    system after measurement.
+
+        Returns:
+            MeasurementRef. Handle of the measurement.
+        """
+        q = self.shared_dict.get_queues_for_ids([q_id])[0]
+        ref = MeasurementRef((self.namespace, next(self.measurement_numbers)), q)
+        self._put(q, [MEASURE_REF, self._worker_id(q_id), ref.key,
+                      non_destructive])
+        if not non_destructive:
+            self.shared_dict.delete_id_and_check_to_join_thread(q_id)
+            self._release(q_id)
+        return ref
+
+    def result(self, ref):
+        """
+        Waits for the outcome of a measurement of measure_ref.
+
+        Args:
+            ref (MeasurementRef): Handle of the measurement.
+
+        Returns:
+            int. The outcome, or an array with the outcome of every copy of
+            an ensemble.
+        """
+        if not ref.fetched:
+            if ref.released:
+                raise ValueError("The measurement has been released.")
+            ret = self.manager.Queue()
+            self._put(ref.queue, [GIVE_RESULT, ref.key, ret])
+            ref.value = ret.get()
+            ref.fetched = True
+        return ref.value
+
+    def release(self, ref):
+        """
+        Discards the outcome of a measurement of measure_ref, which is not
+        needed any more, in its worker process. Outcomes which have been
+        fetched with result are already discarded there.
+
+        Args:
+            ref (MeasurementRef): Handle of the measurement.
+        """
+        if not ref.fetched and not ref.released:
+            self._put(ref.queue, [RELEASE_RESULT, ref.key])
+        ref.released = True
+
+    def apply_if(self, ref, gate, q_id, value=1):
+        """
+        Applies a gate to a qubit if the outcome of a measurement of
+        measure_ref has a value. If the qubit is on the worker process which
+        keeps the outcome, e.g. because it was entangled with the measured
+        qubit, the condition is resolved there without a round trip.
+        Otherwise EQSN waits for the outcome.
+
+        Args:
+            ref (MeasurementRef): Handle of the measurement.
+            gate (String or np.ndarray): Name of a gate, like 'X' or 'Z', or
+                a unitary 2x2 matrix.
+            q_id (String): Id of the Qubit to apply the gate on.
+            value (int): Outcome for which the gate is applied.
+        """
+        if isinstance(gate, str):
+            gate = GATES[gate.upper()]
+        if ref.released:
+            raise ValueError("The measurement has been released.")
+        q = self.shared_dict.get_queues_for_ids([q_id])[0]
+        if q is ref.queue and not ref.fetched:
+            self._put(q, [APPLY_IF, gate, self._worker_id(q_id), ref.key, value])
+            return
+        gate = conditional_gate(gate, self.result(ref), value)
+        if gate is not None:
+            self._put(q, [SINGLE_GATE, gate, self._worker_id(q_id)])
@@ -0,0 +1,148 @@
+import numpy as np
+
+
+def is_diagonal(gate):
+    """
+    Checks if a gate only changes the phases of the basis states, like Z, S,
+    T, RZ or a controlled phase.
+    """
+    return not np.any(gate - np.diag(np.diagonal(gate)))
+
+
+def is_permutation(gate):
+    """
+    Checks if a gate maps every basis state to one basis state, up to a
+    phase, like X, Y, CNOT or SWAP.
+    """
+    nonzero = gate != 0
+    return bool(np.all(np.sum(nonzero, axis=0) == 1) and
+                np.all(np.sum(nonzero, axis=1) == 1))
+
+
+def _gate_axes(positions, n):
+    """
+    Gives the shape of a tensor with one axis per qubit, in which the axes
+    of the gate qubits have the size 2 and all other axes the size 1.
+    """
+    shape = [1] * n
+    for position in positions:
+        shape[position] = 2
+    return shape
+
+
+def apply_diagonal(vector, diagonal, positions):
+    """
+    Multiplies the amplitudes of a state vector with the phases of a
+    diagonal gate, selected by the bits of the gate qubits in their index.
+    The phase pattern is broadcast over all other qubits, so that the state
+    vector is passed only once.
+
+    Args:
+        vector (np.ndarray): Dense state vector.
+        diagonal (np.ndarray): Diagonal of the gate.
+        positions (List): Positions of the gate qubits in the state vector,
+            the first one is the most significant qubit of the gate.
+
+    Returns:
+        np.ndarray. The new state vector.
+    """
+    n = vector.size.bit_length() - 1
+    k = len(positions)
+    # Bring the axes of the gate in the order of the state vector
+    order = np.argsort(positions)
+    pattern = np.transpose(np.reshape(diagonal, (2,) * k), order)
+    pattern = pattern.reshape(_gate_axes(positions, n))
+    tensor = np.reshape(vector, (2,) * n)
+    dtype = np.result_type(vector, diagonal)
+    return np.multiply(tensor, pattern, dtype=dtype).reshape(-1)
+
+
+def apply_permutation(vector, gate, positions):
+    """
+    Applies a gate which maps every basis state to one basis state, by
+    reordering the amplitudes along the gate qubits and multiplying them
+    with the phases of the gate.
+
+    Args:
+        vector (np.ndarray): Dense state vector.
+        gate (np.ndarray): The permutation matrix, with phases.
+        positions (List): Positions of the gate qubits in the state vector,
+            the first one is the most significant qubit of the gate.
+
+    Returns:
+        np.ndarray. The new state vector.
+    """
+    n = vector.size.bit_length() - 1
+    k = len(positions)
+    sources = np.argmax(gate != 0, axis=1)
+    phases = gate[np.arange(2 ** k), sources]
+    tensor = np.moveaxis(np.reshape(vector, (2,) * n), positions, range(k))
+    shape = tensor.shape
+    tensor = tensor.reshape((2 ** k, -1))[sources]
+    dtype = np.result_type(vector, gate)
+    tensor = np.multiply(tensor, phases[:, None], dtype=dtype).reshape(shape)
+    return np.moveaxis(tensor, range(k), positions).reshape(-1)
+
+
+def _contract(tensor, gate, axes):
+    """
+    Contracts a gate on k qubits with the axes of these qubits of a state
+    tensor, all other axes are untouched.
+    """
+    k = len(axes)
+    gate = np.reshape(gate, (2,) * (2 * k))
+    result = np.tensordot(gate, tensor, axes=(list(range(k, 2 * k)), list(axes)))
+    return np.moveaxis(result, range(k), axes)
+
+
+def apply_gate(vector, gate, positions):
+    """
+    Applies a gate on any k qubits by reshaping the state vector into a
+    tensor with one axis per qubit and contracting the gate with the axes
+    of its qubits, without building a matrix of the size of the state.
+
+    Args:
+        vector (np.ndarray): Dense state vector.
+        gate (np.ndarray): 2^k x 2^k unitary matrix.
+        positions (List): Positions of the gate qubits in the state vector,
+            the first one is the most significant qubit of the gate.
+
+    Returns:
+        np.ndarray. The new state vector.
+    """
+    n = vector.size.bit_length() - 1
+    tensor = _contract(np.reshape(vector, (2,) * n), gate, positions)
+    return tensor.reshape(-1)
+
+
+def apply_controlled(vector, gate, controls, targets):
+    """
+    Applies a gate to the target qubits of the amplitudes in which all
+    control qubits are 1. Only this slice of the state vector, with
+    2^(n - c) amplitudes for c controls, is read and written. The state
+    vector is updated in place if its dtype allows it.
+
+    Args:
+        vector (np.ndarray): Dense state vector.
+        gate (np.ndarray): 2^k x 2^k unitary matrix for k targets.
+        controls (List): Positions of the control qubits.
+        targets (List): Positions of the target qubits, the first one is
+            the most significant qubit of the gate.
+
+    Returns:
+        np.ndarray. The new state vector.
+    """
+    n = vector.size.bit_length() - 1
+    dtype = np.result_type(vector, gate)
+    if vector.dtype != dtype or not vector.flags.writeable:
+        vector = vector.astype(dtype)
+    tensor = np.reshape(vector, (2,) * n)
+    index = [slice(None)] * n
+    for position in controls:
+        index[position] = 1
+    index = tuple(index)
+    # Axes of the targets in the slice, without the control axes
+    remaining = [p for p in range(n) if p not in controls]
+    axes = [remaining.index(p) for p in targets]
+    tensor[index] = _contract(tensor[index], gate, axes)
+    return vector
@@ -0,0 +1,251 @@
+import numpy as np
+
+# Backends of the qubit groups of an EQSN object
+STATEVECTOR = 'statevector'
+MPS = 'mps'
+ENSEMBLE = 'ensemble'
+
+SWAP = np.array([[1, 0, 0, 0], [0, 0, 1, 0], [0, 1, 0, 0], [0, 0, 0, 1]],
+                dtype=np.csingle)
+
+
+class MPSState(object):
+    """
+    State of n qubits as a matrix product state, a chain of one tensor per
+    qubit with the shape (left bond, 2, right bond). Weakly entangled states
+    have small bonds, so that the memory grows linearly with the amount of
+    qubits. The state is kept in mixed canonical form around an
+    orthogonality center, so that the singular values of a split are the
+    Schmidt coefficients of the whole state. After every gate on several
+    qubits, singular values below the truncation threshold relative to the
+    norm of the state are discarded.
+    """
+
+    def __init__(self, tensors, threshold=1e-8, max_bond=None, center=None):
+        """
+        Args:
+            tensors (List): One tensor per qubit, the first one is the most
+                significant qubit.
+            threshold (float): Singular values below, relative to the norm
+                of the state, are discarded.
+            max_bond (int): Maximum bond dimension, None for no limit.
+            center (int): Orthogonality center, all tensors before it are
+                left and all after it right orthonormal. None if the
+                tensors are not in canonical form.
+        """
+        self.tensors = tensors
+        self.threshold = threshold
+        self.max_bond = max_bond
+        self.center = center
+
+    @staticmethod
+    def zero(threshold=1e-8, max_bond=None):
+        """
+        Gives a single qubit in the state |0>.
+        """
+        tensor = np.zeros((1, 2, 1), dtype=np.csingle)
+        tensor[0, 0, 0] = 1
+        return MPSState([tensor], threshold, max_bond, 0)
+
+    @property
+    def n(self):
+        return len(self.tensors)
+
+    @property
+    def dtype(self):
+        return np.result_type(*self.tensors)
+
+    def bond_dimensions(self):
+        """
+        Gives the dimensions of the bonds between neighbouring qubits.
+        """
+        return [t.shape[2] for t in self.tensors[:-1]]
+
+    def to_dense(self):
+        """
+        Gives the dense state vector.
+        """
+        vector = np.ones((1, 1), dtype=self.dtype)
+        for tensor in self.tensors:
+            vector = np.tensordot(vector, tensor, axes=([1], [0]))
+            vector = vector.reshape((-1, tensor.shape[2]))
+        return vector.reshape(-1)
+
+    def get(self, indices):
+        """
+        Gives the amplitudes with the given indices, without creating the
+        dense state vector.
+
+        Args:
+            indices (List): Indices of the amplitudes.
+        """
+        ret = np.zeros(len(indices), dtype=self.dtype)
+        for i, index in enumerate(indices):
+            amplitude = np.ones((1,), dtype=self.dtype)
+            for site, tensor in enumerate(self.tensors):
+                bit = (int(index) >> (self.n - 1 - site)) & 1
+                amplitude = amplitude.dot(tensor[:, bit, :])
+            ret[i] = amplitude[0]
+        return ret
+
+    def _left_orthonormalize(self, site):
+        """
+        Makes the tensor of a site left orthonormal with a QR decomposition
+        and multiplies the rest into the next site.
+        """
+        tensor = self.tensors[site]
+        left, _, right = tensor.shape
+        q, r = np.linalg.qr(tensor.reshape((left * 2, right)))
+        self.tensors[site] = q.reshape((left, 2, -1))
+        self.tensors[site + 1] = np.tensordot(r, self.tensors[site + 1],
+                                              axes=([1], [0]))
+
+    def _right_orthonormalize(self, site):
+        """
+        Makes the tensor of a site right orthonormal with a QR decomposition
+        and multiplies the rest into the previous site.
+        """
+        tensor = self.tensors[site]
+        left, _, right = tensor.shape
+        q, r = np.linalg.qr(tensor.reshape((left, 2 * right)).T)
+        self.tensors[site] = q.T.reshape((-1, 2, right))
+        self.tensors[site - 1] = np.tensordot(self.tensors[site - 1], r.T,
+                                              axes=([2], [0]))
+
+    def _move_center(self, site):
+        """
+        Moves the orthogonality center to a site, the whole chain is brought
+        into canonical form if it is not.
+        """
+        if self.center is None:
+            for i in range(site):
+                self._left_orthonormalize(i)
+            for i in range(self.n - 1, site, -1):
+                self._right_orthonormalize(i)
+        else:
+            for i in range(self.center, site):
+                self._left_orthonormalize(i)
+            for i in range(self.center, site, -1):
+                self._right_orthonormalize(i)
+        self.center = site
+
+    def _apply_adjacent(self, gate, start, k):
+        """
+        Applies a gate to k neighbouring qubits. The orthogonality center is
+        moved to the first of them, their tensors are contracted, the gate
+        is applied and the result is split again with truncated singular
+        value decompositions. The center ends on the last qubit.
+        """
+        self._move_center(start)
+        left = self.tensors[start].shape[0]
+        theta = self.tensors[start]
+        for tensor in self.tensors[start + 1:start + k]:
+            theta = np.tensordot(theta, tensor, axes=([-1], [0]))
+        right = theta.shape[-1]
+        theta = theta.reshape((left, 2 ** k, right))
+        theta = np.tensordot(gate, theta, axes=([1], [1]))
+        theta = np.transpose(theta, (1, 0, 2))
+        for site in range(start, start + k - 1):
+            rest = theta.shape[1] // 2
+            matrix = theta.reshape((left * 2, rest * right))
+            u, s, vh = np.linalg.svd(matrix, full_matrices=False)
+            norm = np.linalg.norm(s)
+            keep = max(1, int(np.sum(s > self.threshold * norm)))
+            if self.max_bond is not None:
+                keep = min(keep, self.max_bond)
+            # Keep the norm of the contracted tensors
+            s = s[:keep] * (norm / np.linalg.norm(s[:keep]))
+            self.tensors[site] = u[:, :keep].reshape((left, 2, keep))
+            theta = (s[:, None] * vh[:keep]).reshape((keep, rest, right))
+            left = keep
+        self.tensors[start + k - 1] = theta.reshape((left, 2, right))
+        self.center = start + k - 1
+
+    def apply_gate(self, gate, positions):
+        """
+        Applies a gate on k qubits. Qubits which are not neighbours are
+        moved next to each other with swaps and moved back afterwards.
+
+        Args:
+            gate (np.ndarray): 2^k x 2^k unitary matrix.
+            positions (List): Positions of the k qubits, the first one is the
+                most significant qubit of the gate.
+        """
+        start = min(positions)
+        order = list(range(self.n))
+        swaps = []
+        for j, position in enumerate(positions):
+            current = order.index(position)
+            while current > start + j:
+                self._apply_adjacent(SWAP, current - 1, 2)
+                order[current - 1], order[current] = order[current], order[current - 1]
+                swaps.append(current - 1)
+                current -= 1
+        self._apply_adjacent(gate, start, len(positions))
+        for site in reversed(swaps):
+            self._apply_adjacent(SWAP, site, 2)
+
+    def _projected_norm(self, position, result):
+        """
+        Gives the squared norm of the state projected on a result of a qubit.
+        """
+        environment = np.ones((1, 1), dtype=self.dtype)
+        for site, tensor in enumerate(self.tensors):
+            if site == position:
+                tensor = tensor[:, result:result + 1, :]
+            environment = np.einsum('ab,aic,bid->cd', environment, tensor,
+                                    tensor.conj())
+        return float(np.real(environment[0, 0]))
+
+    def probability_one(self, position):
+        """
+        Gives the probability to measure a qubit in the state |1>.
+
+        Args:
+            position (int): Position of the qubit.
+        """
+        return self._projected_norm(position, 1)
+
+    def collapse(self, position, result, remove=False):
+        """
+        Projects a qubit on a measurement result and renormalizes.
+
+        Args:
+            position (int): Position of the qubit.
+            result (int): The measurement result, 0 or 1.
+            remove (bool): Remove the qubit from the state afterwards.
+        """
+        norm = np.sqrt(self._projected_norm(position, result))
+        tensor = self.tensors[position]
+        if not remove:
+            projected = np.zeros_like(tensor)
+            projected[:, result, :] = tensor[:, result, :] / norm
+            self.tensors[position] = projected
+            if self.center != position:
+                self.center = None
+            return
+        matrix = tensor[:, result, :] / norm
+        if self.center == position or \
+                (self.center == position + 1 and position < self.n - 1):
+            # The neighbour which absorbs the projected tensor is the center
+            self.center = min(position, max(self.n - 2, 0))
+        else:
+            self.center = None
+        del self.tensors[position]
+        if position < self.n:
+            self.tensors[position] = np.tensordot(
+                matrix, self.tensors[position], axes=([1], [0]))
+        elif position > 0:
+            self.tensors[position - 1] = np.tensordot(
+                self.tensors[position - 1], matrix, axes=([2], [0]))
+
+    def kron(self, other):
+        """
+        Gives the tensor product with another matrix product state, whose
+        qubits come after the qubits of this one.
+
+        Args:
+            other (MPSState): The other state.
+        """
+        return MPSState(self.tensors + other.tensors, self.threshold,
+                        self.max_bond)
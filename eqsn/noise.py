@@ -0,0 +1,95 @@
+import numpy as np
+
+IDENTITY = np.eye(2, dtype=np.csingle)
+PAULI_X = np.array([[0, 1], [1, 0]], dtype=np.csingle)
+PAULI_Y = np.array([[0, -1j], [1j, 0]], dtype=np.csingle)
+PAULI_Z = np.array([[1, 0], [0, -1]], dtype=np.csingle)
+
+
+def kraus_operators(kraus):
+    """
+    Checks that matrices are the Kraus operators of a single qubit channel,
+    i.e. that the sum of K^dagger K is the identity.
+
+    Args:
+        kraus (List): 2x2 matrices of the channel.
+
+    Returns:
+        np.ndarray. The Kraus operators stacked along the first axis.
+    """
+    kraus = np.asarray(kraus, dtype=np.csingle)
+    if kraus.ndim != 3 or kraus.shape[1:] != (2, 2):
+        raise ValueError("Kraus operators have to be 2x2 matrices.")
+    completeness = np.einsum('kji,kjl->il', kraus.conj(), kraus)
+    if not np.allclose(completeness, IDENTITY, atol=1e-5):
+        raise ValueError("Kraus operators do not preserve the trace.")
+    return kraus
+
+
+def depolarizing(p):
+    """
+    Gives the Kraus operators of a channel which replaces the state of a
+    qubit with the maximally mixed state with probability p.
+    """
+    return kraus_operators([np.sqrt(1 - 0.75 * p) * IDENTITY,
+                            np.sqrt(p / 4) * PAULI_X,
+                            np.sqrt(p / 4) * PAULI_Y,
+                            np.sqrt(p / 4) * PAULI_Z])
+
+
+def dephasing(p):
+    """
+    Gives the Kraus operators of a channel which flips the phase of a qubit
+    with probability p.
+    """
+    return kraus_operators([np.sqrt(1 - p) * IDENTITY,
+                            np.sqrt(p) * PAULI_Z])
+
+
+def amplitude_damping(gamma):
+    """
+    Gives the Kraus operators of a channel in which a qubit decays from |1>
+    to |0> with probability gamma.
+    """
+    return kraus_operators([[[1, 0], [0, np.sqrt(1 - gamma)]],
+                            [[0, np.sqrt(gamma)], [0, 0]]])
+
+
+def is_unitary_mixture(products):
+    """
+    Checks if every K^dagger K of a channel is a multiple of the identity,
+    so that the Kraus operators are unitaries applied with fixed
+    probabilities, which do not depend on the state.
+
+    Args:
+        products (np.ndarray): The products K^dagger K of all operators.
+    """
+    scaled = products[:, 0, 0][:, None, None] * IDENTITY
+    return bool(np.allclose(products, scaled, atol=1e-6))
+
+
+def sample_operator(probabilities):
+    """
+    Draws the index of the Kraus operator of a trajectory.
+
+    Args:
+        probabilities (np.ndarray): Probability of every operator.
+    """
+    probabilities = np.maximum(np.real(probabilities), 0.0)
+    return int(np.random.choice(len(probabilities),
+                                p=probabilities / np.sum(probabilities)))
+
+
+def sample_operators(probabilities):
+    """
+    Draws the index of the Kraus operator for every member of an ensemble.
+
+    Args:
+        probabilities (np.ndarray): Probability of every operator, one row
+            per member.
+    """
+    probabilities = np.maximum(np.real(probabilities), 0.0)
+    cumulative = np.cumsum(probabilities, axis=1)
+    draws = np.random.random(len(cumulative)) * cumulative[:, -1]
+    choices = np.sum(cumulative <= draws[:, None], axis=1)
+    return np.minimum(choices, probabilities.shape[1] - 1)
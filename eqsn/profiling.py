@@ -0,0 +1,198 @@
+import os
+import threading
+
+from eqsn import qubit_thread
+
+COMMANDS = ('NONE', 'SINGLE_GATE', 'CONTROLLED_GATE', 'MEASURE', 'MERGE_ACCEPT',
+            'MERGE_SEND', 'MEASURE_NON_DESTRUCTIVE', 'NEW_QUBIT',
+            'ADD_MERGED_QUBITS_TO_DICT', 'GIVE_STATEVECTOR', 'DOUBLE_GATE',
+            'CONTROLLED_TWO_GATE', 'STOP_NAMESPACE', 'RESET_WORKER',
+            'CHECKPOINT', 'RESTORE_QUBITS', 'GIVE_PROBABILITIES',
+            'GIVE_DENSITY_MATRIX', 'GIVE_EXPECTATION', 'TRACE', 'GIVE_TRACE',
+            'BARRIER', 'DEFINE_CIRCUIT', 'RUN_CIRCUIT', 'APPLY_CHANNEL',
+            'MEASURE_REF', 'APPLY_IF', 'GIVE_RESULT', 'MULTI_CONTROLLED_GATE',
+            'K_QUBIT_GATE', 'MEASURE_BASIS', 'RESET_QUBIT', 'RELEASE_RESULT')
+
+COMMAND_NAMES = {getattr(qubit_thread, name): name for name in COMMANDS}
+
+# Stages of a command, between two of its timestamps
+STAGES = ['queue', 'dispatch', 'execute']
+
+
+def command_name(command):
+    """
+    Gives the name of a command, e.g. SINGLE_GATE.
+    """
+    return COMMAND_NAMES.get(command, str(command))
+
+
+class Tracer(object):
+    """
+    Collects the timestamps of traced commands in a Worker Process. Every
+    command has four timestamps: when it was submitted by EQSN, taken from
+    the queue of the Worker Process, dispatched to its qubit group and when
+    it was completed. Commands which are executed by the Worker Process
+    itself have no dispatch timestamp.
+
+    Counters and latency histograms are kept per namespace and command, the
+    single events only up to a maximum amount.
+    """
+
+    def __init__(self, max_events=100000):
+        """
+        Args:
+            max_events (int): Maximum amount of events to keep for a trace.
+        """
+        self.lock = threading.Lock()
+        self.max_events = max_events
+        self.pid = os.getpid()
+        self.stats = {}
+        self.events = {}
+
+    def record(self, namespace, command, stamps):
+        """
+        Records a completed command.
+
+        Args:
+            namespace (int): Namespace of the EQSN object of the command.
+            command (int): The command.
+            stamps (List): Submit, worker, dispatch and completion time in
+                seconds, the dispatch time can be None.
+        """
+        submit, worker, thread, done = stamps
+        if thread is None:
+            thread = done
+        durations = [worker - submit, thread - worker, done - thread]
+        with self.lock:
+            stats = self.stats.setdefault(namespace, {}).setdefault(
+                command, new_command_stats())
+            add_durations(stats, durations)
+            events = self.events.setdefault(namespace, [])
+            if len(events) < self.max_events:
+                events.append((command, threading.get_ident(), stamps))
+
+    def reset(self, namespace):
+        """
+        Deletes the recorded data of one namespace.
+
+        Args:
+            namespace (int): Namespace of the EQSN object.
+        """
+        with self.lock:
+            self.stats.pop(namespace, None)
+            self.events.pop(namespace, None)
+
+    def give_trace(self, namespace, reset=False):
+        """
+        Gives the counters, histograms and events of one namespace.
+
+        Args:
+            namespace (int): Namespace of the EQSN object.
+            reset (bool): If the collected data should be deleted.
+
+        Returns:
+            Tuple. The process id, the statistics and the list of events.
+        """
+        with self.lock:
+            stats = {c: dict(s, histograms=[dict(h) for h in s['histograms']])
+                     for c, s in self.stats.get(namespace, {}).items()}
+            events = list(self.events.get(namespace, []))
+        if reset:
+            self.reset(namespace)
+        return self.pid, stats, events
+
+
+def new_command_stats():
+    """
+    Empty statistics of a command.
+    """
+    return {
+        'count': 0,
+        'total': [0.0] * len(STAGES),
+        'max': [0.0] * len(STAGES),
+        'histograms': [{} for _ in STAGES],
+    }
+
+
+def add_durations(stats, durations):
+    """
+    Adds the stage durations in seconds of one command to its statistics. The
+    histograms count durations in power of two microsecond buckets.
+    """
+    stats['count'] += 1
+    for i, duration in enumerate(durations):
+        stats['total'][i] += duration
+        stats['max'][i] = max(stats['max'][i], duration)
+        bucket = 1
+        while bucket < duration * 1e6:
+            bucket *= 2
+        histogram = stats['histograms'][i]
+        histogram[bucket] = histogram.get(bucket, 0) + 1
+
+
+def merge_stats(all_stats):
+    """
+    Merges the statistics of several Worker Processes into one dictionary,
+    with readable command and stage names and durations in microseconds.
+
+    Args:
+        all_stats (List): Statistics of every Worker Process.
+
+    Returns:
+        Dict. Count, mean and maximum duration and histogram of every stage
+        for every command.
+    """
+    merged = {}
+    for stats in all_stats:
+        for command, s in stats.items():
+            m = merged.setdefault(command, new_command_stats())
+            m['count'] += s['count']
+            for i in range(len(STAGES)):
+                m['total'][i] += s['total'][i]
+                m['max'][i] = max(m['max'][i], s['max'][i])
+                for bucket, count in s['histograms'][i].items():
+                    m['histograms'][i][bucket] = \
+                        m['histograms'][i].get(bucket, 0) + count
+    ret = {}
+    for command, m in merged.items():
+        stages = {}
+        for i, stage in enumerate(STAGES):
+            stages[stage] = {
+                'mean_us': 1e6 * m['total'][i] / m['count'],
+                'max_us': 1e6 * m['max'][i],
+                'histogram_us': dict(sorted(m['histograms'][i].items())),
+            }
+        ret[command_name(command)] = {'count': m['count'], 'stages': stages}
+    return ret
+
+
+def chrome_trace_events(pid, events):
+    """
+    Converts the events of a Worker Process to the Chrome trace event format,
+    with one complete event per stage of every command.
+
+    Args:
+        pid (int): Process id of the Worker Process.
+        events (List): Events as recorded by the Tracer.
+
+    Returns:
+        List. List of trace event dictionaries.
+    """
+    trace = []
+    for command, tid, stamps in events:
+        submit, worker, thread, done = stamps
+        name = command_name(command)
+        spans = [('queue', submit, worker), ('dispatch', worker, thread or done)]
+        if thread is not None:
+            spans.append(('execute', thread, done))
+        for stage, start, end in spans:
+            trace.append({
+                'name': name,
+                'cat': stage,
+                'ph': 'X',
+                'ts': start * 1e6,
+                'dur': (end - start) * 1e6,
+                'pid': pid,
+                'tid': tid,
+            })
+    return trace
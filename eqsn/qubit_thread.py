@@ -2,6 +2,15 @@ import numpy as np
 import logging
 from copy import deepcopy as dp
 import random
+from queue import Queue
+
+from eqsn.sparse_state import SparseState, controlled_matrix, \
+    SPARSE_MIN_QUBITS, SPARSE_MAX_FILL
+from eqsn.mps_state import MPSState
+from eqsn.ensemble_state import EnsembleState
+from eqsn.kernels import is_diagonal, is_permutation, apply_diagonal, \
+    apply_permutation, apply_controlled, apply_gate
+from eqsn.noise import is_unitary_mixture, sample_operator, sample_operators
 
 NONE = 0
 SINGLE_GATE = 1
@@ -15,31 +24,75 @@ ADD_MERGED_QUBITS_TO_DICT = 9
 GIVE_STATEVECTOR = 10
 DOUBLE_GATE = 11
 CONTROLLED_TWO_GATE = 12
+STOP_NAMESPACE = 13
+RESET_WORKER = 14
+CHECKPOINT = 15
+RESTORE_QUBITS = 16
+GIVE_PROBABILITIES = 17
+GIVE_DENSITY_MATRIX = 18
+GIVE_EXPECTATION = 19
+TRACE = 20
+GIVE_TRACE = 21
+BARRIER = 22
+DEFINE_CIRCUIT = 23
+RUN_CIRCUIT = 24
+APPLY_CHANNEL = 25
+MEASURE_REF = 26
+APPLY_IF = 27
+GIVE_RESULT = 28
+MULTI_CONTROLLED_GATE = 29
+K_QUBIT_GATE = 30
+MEASURE_BASIS = 31
+RESET_QUBIT = 32
+RELEASE_RESULT = 33
+
+# Commands which take a slot in the window of pending gates of a worker
+GATE_COMMANDS = (SINGLE_GATE, CONTROLLED_GATE, DOUBLE_GATE, CONTROLLED_TWO_GATE,
+                 APPLY_CHANNEL, APPLY_IF, MULTI_CONTROLLED_GATE, K_QUBIT_GATE)
+
+PAULI_MATRICES = {
+    'I': np.array([[1, 0], [0, 1]], dtype=np.csingle),
+    'X': np.array([[0, 1], [1, 0]], dtype=np.csingle),
+    'Y': np.array([[0, -1j], [1j, 0]], dtype=np.csingle),
+    'Z': np.array([[1, 0], [0, -1]], dtype=np.csingle),
+}
 
 
 class QubitThread(object):
     """
     The Qubit thread is the smallest object in EQSN.
     It consists of a statevector and the Qubit IDs of the state vector.
-    Most operations here can be applid asynchronously.
+    Despite its name, it is not run as a thread. It is a qubit group object,
+    whose commands are executed directly by its Worker Process.
+
+    Large state vectors with few nonzero amplitudes, e.g. after CNOT fan outs
+    of basis states, are stored as a SparseState. The representation is
+    chosen after merges, measurements and gates on sparse states. Qubits of
+    EQSN objects with the MPS backend are stored as an MPSState instead, and
+    qubits of EQSN objects with the ensemble backend as an EnsembleState.
+
+    Merged dense state vectors are kept as separate factors of a tensor
+    product until a command needs qubits of several factors. Only then the
+    needed factors are multiplied into the state vector, all of them at once.
     """
 
-    def __init__(self, q_id, queue):
+    def __init__(self, q_id):
         """
         Args:
             q_id (String): Name of the qubit
-            queue (Queue): Queue for receiving commands from main thread.
         """
         # set new seed for random number generator
         local_random = random.Random()
         new_seed = local_random.randrange(1, 100000)
         np.random.seed(new_seed)
 
-        # List of qubits in this thread
-        self.qubits = [q_id]
-
-        # receive queue for operations to perform
-        self.queue = queue
+        # List of qubits in this thread and the position of every qubit
+        self.qubits = None
+        self.positions = None
+        self._set_qubits([q_id])
+        # Merged factors (qubit ids, state vector), which are not yet part
+        # of the state vector of self.qubits
+        self.deferred = []
 
         # init qubit in state |0>
         self.qubit = np.zeros(2, dtype=np.csingle)
@@ -47,6 +100,203 @@ class QubitThread(object):
 
         logging.debug("Qubit thread with qubit %s has been created.", q_id)
 
+    def set_state(self, qubits, vector):
+        """
+        Replaces the qubits and the state vector of this thread, e.g. with a
+        state restored from a checkpoint.
+
+        Args:
+            qubits (List): Qubit ids of the state vector.
+            vector (np.ndarray): The state vector.
+        """
+        self._set_qubits(list(qubits))
+        self.qubit = vector
+        self.deferred = []
+
+    def _set_qubits(self, qubits):
+        """
+        Replaces the ordered list of qubit ids and rebuilds the index from
+        qubit id to position.
+
+        Args:
+            qubits (List): Qubit ids of the state vector.
+        """
+        self.qubits = qubits
+        self.positions = {q_id: i for i, q_id in enumerate(qubits)}
+
+    def _remove_qubit(self, q_id):
+        """
+        Removes a qubit id, the qubits after it move one position forward.
+        """
+        nr = self.positions.pop(q_id)
+        del self.qubits[nr]
+        for other in self.qubits[nr:]:
+            self.positions[other] -= 1
+
+    def all_qubits(self):
+        """
+        Gives the ids of all qubits of this thread, including the qubits of
+        deferred factors.
+        """
+        ret = list(self.qubits)
+        for ids, _ in self.deferred:
+            ret += ids
+        return ret
+
+    def _activate(self, q_ids=None):
+        """
+        Multiplies the deferred factors which contain some of the given
+        qubits into the state vector. The factors are multiplied with each
+        other first, so that the full state vector is only created once.
+
+        Args:
+            q_ids (List): Qubit ids which are needed, None for all qubits.
+        """
+        if not self.deferred:
+            return
+        needed = []
+        rest = []
+        for factor in self.deferred:
+            if q_ids is None or any(q_id in factor[0] for q_id in q_ids):
+                needed.append(factor)
+            else:
+                rest.append(factor)
+        if not needed:
+            return
+        vector = needed[0][1]
+        for ids, other in needed[1:]:
+            vector = np.kron(vector, other)
+        for ids, _ in needed:
+            self._set_qubits(self.qubits + ids)
+        self.deferred = rest
+        if isinstance(self.qubit, SparseState):
+            # The state became sparse while the factors were deferred
+            self.qubit = self.qubit.kron(SparseState.from_dense(vector))
+        else:
+            self.qubit = np.kron(self.qubit, vector)
+        self._update_representation()
+
+    def _add_factor(self, ids, vector):
+        """
+        Adds the qubits and the state of another thread. Dense state vectors
+        are deferred, other representations are merged directly.
+
+        Args:
+            ids (List): Qubit ids of the factor.
+            vector (np.ndarray): State of the factor.
+        """
+        if isinstance(self.qubit, np.ndarray) and \
+                isinstance(vector, np.ndarray):
+            self.deferred.append((ids, vector))
+            return
+        self._activate()
+        self._set_qubits(self.qubits + ids)
+        if isinstance(self.qubit, SparseState) and \
+                isinstance(vector, np.ndarray):
+            vector = SparseState.from_dense(vector)
+        if not isinstance(self.qubit, np.ndarray) and \
+                type(vector) is type(self.qubit):
+            self.qubit = self.qubit.kron(vector)
+        else:
+            if not isinstance(vector, np.ndarray):
+                vector = vector.to_dense()
+            self.qubit = np.kron(self._vector(), vector)
+        self._update_representation()
+
+    def _next_factor(self):
+        """
+        Makes the first deferred factor the state vector, after the last
+        qubit of the state vector has been measured.
+        """
+        if self.deferred:
+            ids, self.qubit = self.deferred.pop(0)
+            self._set_qubits(ids)
+
+    def _apply_to_factor(self, gate, q_id):
+        """
+        Applies a single qubit gate to a deferred factor, if the qubit is
+        part of one.
+
+        Returns:
+            bool. False if the qubit is not part of a deferred factor.
+        """
+        for i, (ids, vector) in enumerate(self.deferred):
+            if q_id in ids:
+                axis = ids.index(q_id)
+                tensor = np.reshape(vector, (2,) * len(ids))
+                tensor = np.tensordot(gate, tensor, axes=([1], [axis]))
+                tensor = np.moveaxis(tensor, 0, axis)
+                self.deferred[i] = (ids, tensor.reshape(-1))
+                return True
+        return False
+
+    def _vector(self):
+        """
+        Gives the dense state vector, without changing the representation.
+        """
+        if not isinstance(self.qubit, np.ndarray):
+            return self.qubit.to_dense()
+        return self.qubit
+
+    def _update_representation(self):
+        """
+        Stores the state vector sparse if it has enough qubits and few
+        enough nonzero amplitudes, otherwise dense. Matrix product states
+        keep their representation.
+        """
+        if isinstance(self.qubit, (MPSState, EnsembleState)):
+            return
+        if isinstance(self.qubit, SparseState):
+            if len(self.qubits) < SPARSE_MIN_QUBITS or \
+                    self.qubit.fill() > SPARSE_MAX_FILL:
+                self.qubit = self.qubit.to_dense()
+        elif len(self.qubits) >= SPARSE_MIN_QUBITS:
+            sparse = SparseState.from_dense(self.qubit)
+            if sparse.fill() <= SPARSE_MAX_FILL:
+                self.qubit = sparse
+
+    def _apply_compact(self, gate, q_ids):
+        """
+        Applies a gate to some qubits, if the state is stored sparse or as a
+        matrix product state.
+
+        Args:
+            gate (np.ndarray): Unitary matrix, the first qubit is the most
+                significant one.
+            q_ids (List): Qubit ids the gate acts on.
+
+        Returns:
+            bool. False if the state vector is dense and nothing was done.
+        """
+        if isinstance(self.qubit, np.ndarray):
+            return False
+        self.qubit.apply_gate(gate, [self.positions[q_id] for q_id in q_ids])
+        self._update_representation()
+        return True
+
+    def _apply_structured(self, gate, q_ids):
+        """
+        Applies diagonal gates, like phase gates, and permutation gates, like
+        X or CNOT, to the dense state vector in one vectorized pass, without
+        building the matrix of the whole state.
+
+        Args:
+            gate (np.ndarray): Unitary matrix, the first qubit is the most
+                significant one.
+            q_ids (List): Qubit ids the gate acts on.
+
+        Returns:
+            bool. False if the gate has no such structure and nothing was done.
+        """
+        positions = [self.positions[q_id] for q_id in q_ids]
+        if is_diagonal(gate):
+            self.qubit = apply_diagonal(self.qubit, np.diagonal(gate), positions)
+        elif is_permutation(gate):
+            self.qubit = apply_permutation(self.qubit, gate, positions)
+        else:
+            return False
+        return True
+
     def apply_single_gate(self, gate, q_id):
         """
         Applys a single gate to a qubit.
@@ -55,78 +305,214 @@ class QubitThread(object):
             gate (np.array): 2x2 unitary array.
             id (String): Qubit on which the gate should be applied to.
         """
-        apply_mat = gate
-        nr = self.qubits.index(q_id)
-        total_amount = len(self.qubits)
-        before = nr
-        after = total_amount - nr - 1
-        if before > 0:
-            apply_mat = np.kron(np.eye(2 ** before), apply_mat)
-        if after > 0:
-            apply_mat = np.kron(apply_mat, np.eye(2 ** after))
-        self.qubit = np.dot(apply_mat, self.qubit)
+        if self._apply_to_factor(gate, q_id):
+            return
+        if self._apply_compact(gate, [q_id]) or \
+                self._apply_structured(gate, [q_id]):
+            return
+        self.qubit = apply_gate(self.qubit, gate, [self.positions[q_id]])
 
-    def give_statevector(self, channel):
+    def apply_k_qubit_gate(self, gate, q_ids):
+        """
+        Applies a gate on any amount of qubits, which do not have to be
+        neighbours in the state vector.
+
+        Args:
+            gate (np.ndarray): 2^k x 2^k unitary matrix.
+            q_ids (List): Ids of the k qubits, the first one is the most
+                significant qubit of the gate.
+        """
+        self._activate(q_ids)
+        if self._apply_compact(gate, q_ids) or \
+                self._apply_structured(gate, q_ids):
+            return
+        self.qubit = apply_gate(self.qubit, gate,
+                                [self.positions[q_id] for q_id in q_ids])
+
+    def _qubit_density_matrix(self, q_id):
+        """
+        Gives the reduced 2x2 density matrix of a qubit. Qubits of deferred
+        factors only need their factor.
+        """
+        for ids, vector in self.deferred:
+            if q_id in ids:
+                tensor = np.reshape(vector, (2,) * len(ids))
+                tensor = np.moveaxis(tensor, ids.index(q_id), 0)
+                break
+        else:
+            tensor = self._state_tensor([q_id])
+        tensor = tensor.reshape((2, -1))
+        return np.dot(tensor, tensor.conj().T)
+
+    def apply_channel(self, kraus, q_id):
+        """
+        Applies a noise channel to a qubit on a single trajectory. One Kraus
+        operator K is drawn with its probability <psi|K^dagger K|psi> and
+        applied like a gate, divided by the square root of the probability.
+        The probabilities of all operators are evaluated at once from the
+        reduced density matrix of the qubit. For unitary mixtures, like
+        depolarizing or dephasing noise, they do not depend on the state, so
+        the channel costs as much as a single gate.
+
+        Args:
+            kraus (np.ndarray): Kraus operators stacked along the first axis.
+            q_id (String): Qubit on which the channel is applied.
+        """
+        products = np.einsum('kji,kjl->kil', kraus.conj(), kraus)
+        if isinstance(self.qubit, EnsembleState):
+            self._apply_channel_ensemble(kraus, products, q_id)
+            return
+        if is_unitary_mixture(products):
+            probabilities = products[:, 0, 0]
+        elif not isinstance(self.qubit, np.ndarray) and \
+                all(is_diagonal(product) for product in products):
+            # e.g. amplitude damping, only the populations are needed
+            pr_1 = self.qubit.probability_one(self.positions[q_id])
+            probabilities = products[:, 0, 0] * (1 - pr_1) + \
+                products[:, 1, 1] * pr_1
+        else:
+            rho = self._qubit_density_matrix(q_id)
+            probabilities = np.einsum('kij,ji->k', products, rho)
+        i = sample_operator(probabilities)
+        gate = kraus[i] / np.sqrt(np.real(probabilities[i]))
+        self.apply_single_gate(gate.astype(kraus.dtype), q_id)
+
+    def _apply_channel_ensemble(self, kraus, products, q_id):
+        """
+        Applies a noise channel to a qubit of every member of an ensemble,
+        each member draws its own Kraus operator.
+
+        Args:
+            kraus (np.ndarray): Kraus operators stacked along the first axis.
+            products (np.ndarray): The products K^dagger K of the operators.
+            q_id (String): Qubit on which the channel is applied.
+        """
+        rho = self.qubit.reduced_density_matrix(self.positions[q_id])
+        probabilities = np.real(np.einsum('kij,bji->bk', products, rho))
+        choices = sample_operators(probabilities)
+        scale = np.sqrt(probabilities[np.arange(len(choices)), choices])
+        gates = kraus[choices] / scale[:, None, None]
+        self.apply_single_gate(gates.astype(kraus.dtype), q_id)
+
+    def give_statevector(self, channel, indices=None, shm_name=None):
         """
         Sends the Qubit IDs and their state vectors over a channel.
 
         Args:
             channel (Queue): Channel to return the requested data to.
+            indices (List): If given, only the amplitudes with these indices
+                are sent.
+            shm_name (String): If given, the amplitudes are written into the
+                shared memory block with this name as complex128 and only
+                their amount is sent. Nothing is written if the block is too
+                small.
         """
-        channel.put((dp(self.qubits), dp(self.qubit)))
-
-    def apply_controlled_gate(self, mat, q_id1, q_id2):
+        self._activate()
+        if indices is None:
+            vector = self._vector()
+        elif not isinstance(self.qubit, np.ndarray):
+            vector = self.qubit.get(indices)
+        else:
+            vector = self.qubit[np.asarray(indices)]
+        if shm_name is None:
+            if vector is self.qubit:
+                vector = dp(vector)
+            channel.put((dp(self.qubits), vector))
+            return
+        from multiprocessing import resource_tracker, shared_memory
+        shm = shared_memory.SharedMemory(name=shm_name)
+        # The block belongs to the caller, it must not be cleaned up here
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        if shm.size >= vector.size * np.dtype(np.complex128).itemsize:
+            out = np.ndarray(vector.shape, dtype=np.complex128, buffer=shm.buf)
+            out[:] = vector
+            del out
+        shm.close()
+        channel.put((dp(self.qubits), vector.size))
+
+    def _state_tensor(self, q_ids):
         """
-        Applies a controlled gate to q_id1
+        Gives the state vector as a tensor with one axis per qubit, where the
+        axes of the qubits in q_ids are moved to the front in their order.
 
         Args:
-            mat (np.ndarray): The matrix to apply
-            q_id1 (str): The target qubit id
-            q_id2 (str): The control qubit id
+            q_ids (List): Qubit ids of the leading axes.
         """
-        first_mat = 1
-        second_mat = 1
-        nr1 = self.qubits.index(q_id1)
-        nr2 = self.qubits.index(q_id2)
+        self._activate(q_ids)
+        tensor = np.reshape(self._vector(), (2,) * len(self.qubits))
+        axes = [self.positions[q_id] for q_id in q_ids]
+        return np.moveaxis(tensor, axes, range(len(axes)))
 
-        min_nr = min(nr1, nr2)
-        max_nr = max(nr1, nr2)
+    def give_probabilities(self, q_ids, channel):
+        """
+        Sends the marginal probabilities of the computational basis states of
+        some qubits over a channel, as a tensor with one axis per qubit.
 
-        total_amount = len(self.qubits)
-        before = min_nr
-        after = total_amount - max_nr - 1
-        mid = total_amount - before - after - 2
+        Args:
+            q_ids (List): Qubit ids, all of them are part of this thread.
+            channel (Queue): Channel to return the requested data to.
+        """
+        k = len(q_ids)
+        tensor = self._state_tensor(q_ids).reshape((2 ** k, -1))
+        probabilities = np.sum(np.abs(tensor) ** 2, axis=1)
+        channel.put((q_ids, probabilities.reshape((2,) * k)))
 
-        if before > 0:
-            first_mat = np.eye(2 ** before)
-            second_mat = np.eye(2 ** before)
+    def give_density_matrix(self, q_ids, channel):
+        """
+        Sends the reduced density matrix of some qubits over a channel, as a
+        tensor with one axis for every row and column qubit.
 
-        # Apply first part of Matrix
-        if min_nr == nr1:
-            first_mat = np.kron(first_mat, np.eye(2))
-            second_mat = np.kron(second_mat, mat)
-        else:
-            first_mat = np.kron(first_mat, np.array([[1, 0], [0, 0]]))
-            second_mat = np.kron(second_mat, np.array([[0, 0], [0, 1]]))
+        Args:
+            q_ids (List): Qubit ids, all of them are part of this thread.
+            channel (Queue): Channel to return the requested data to.
+        """
+        k = len(q_ids)
+        tensor = self._state_tensor(q_ids).reshape((2 ** k, -1))
+        density_matrix = np.dot(tensor, tensor.conj().T)
+        channel.put((q_ids, density_matrix.reshape((2,) * (2 * k))))
 
-        if mid > 0:
-            first_mat = np.kron(first_mat, np.eye(2 ** mid))
-            second_mat = np.kron(second_mat, np.eye(2 ** mid))
+    def apply_controlled_gate(self, mat, q_id1, q_id2):
+        """
+        Applies a controlled gate to q_id1
 
-        # Apply second part of Matrix
-        if min_nr == nr1:
-            first_mat = np.kron(first_mat, np.array([[1, 0], [0, 0]]))
-            second_mat = np.kron(second_mat, np.array([[0, 0], [0, 1]]))
-        else:
-            first_mat = np.kron(first_mat, np.eye(2))
-            second_mat = np.kron(second_mat, mat)
+        Args:
+            mat (np.ndarray): The matrix to apply
+            q_id1 (str): The target qubit id
+            q_id2 (str): The control qubit id
+        """
+        self._activate([q_id1, q_id2])
+        controlled = controlled_matrix(mat)
+        if self._apply_compact(controlled, [q_id2, q_id1]) or \
+                self._apply_structured(controlled, [q_id2, q_id1]):
+            return
+        self.qubit = apply_controlled(self.qubit, mat, [self.positions[q_id2]],
+                                      [self.positions[q_id1]])
 
-        if after > 0:
-            first_mat = np.kron(first_mat, np.eye(2 ** after))
-            second_mat = np.kron(second_mat, np.eye(2 ** after))
+    def give_expectation(self, q_ids, channel, paulis):
+        """
+        Sends the expectation value of a product of Pauli operators on some
+        qubits over a channel. Every Pauli matrix is contracted with the axis
+        of its qubit of the state tensor. Ensembles send one value for every
+        member.
 
-        apply_mat = first_mat + second_mat
-        self.qubit = np.dot(apply_mat, self.qubit)
+        Args:
+            q_ids (List): Qubit ids, all of them are part of this thread.
+            channel (Queue): Channel to return the requested data to.
+            paulis (String): One of 'I', 'X', 'Y' or 'Z' for every qubit.
+        """
+        self._activate(q_ids)
+        vector = self._vector()
+        # Ensembles have one value for every member
+        batch = vector.shape[:-1]
+        tensor = np.reshape(vector, batch + (2,) * len(self.qubits))
+        applied = tensor
+        for q_id, pauli in zip(q_ids, paulis):
+            axis = len(batch) + self.positions[q_id]
+            applied = np.tensordot(PAULI_MATRICES[pauli], applied, axes=([1], [axis]))
+            applied = np.moveaxis(applied, 0, axis)
+        axes = tuple(range(len(batch), tensor.ndim))
+        value = np.real(np.sum(tensor.conj() * applied, axis=axes))
+        channel.put((q_ids, value if batch else float(value)))
 
     def merge_accept(self, channel):
         """
@@ -137,10 +523,15 @@ class QubitThread(object):
             channel(Queue): channel to receive qubit ids and statevectors from.
         """
         ids = channel.get()
-        vector = channel.get()
-        self.qubits = self.qubits + ids
-        self.qubit = np.kron(self.qubit, vector)
-        logging.debug("Qubit Thread merged, new qubits are %r", self.qubits)
+        state = channel.get()
+        if isinstance(state, list):
+            # Factors of a thread which had deferred merges itself
+            for factor_ids, vector in state:
+                self._add_factor(factor_ids, vector)
+        else:
+            self._add_factor(ids, state)
+        logging.debug("Qubit Thread merged, new qubits are %r",
+                      self.all_qubits())
 
     def merge_send(self, channel, channel2):
         """
@@ -151,9 +542,10 @@ class QubitThread(object):
             channel2(Queue): Channel to send qubit ids to parent, to update
                              the qubit ids in its dictionary.
         """
-        channel.put(dp(self.qubits))
-        channel.put(dp(self.qubit))
-        channel2.put(dp(self.qubits))
+        qubits = self.all_qubits()
+        channel.put(dp(qubits))
+        channel.put(dp([(self.qubits, self.qubit)] + self.deferred))
+        channel2.put(dp(qubits))
         return
 
     def swap_qubits(self, q_id1, q_id2):
@@ -178,9 +570,10 @@ class QubitThread(object):
         cnot(q_id2, q_id1)
         cnot(q_id1, q_id2)
         # Change ordering in the list
-        i1 = self.qubits.index(q_id1)
-        i2 = self.qubits.index(q_id2)
+        i1 = self.positions[q_id1]
+        i2 = self.positions[q_id2]
         self.qubits[i1], self.qubits[i2] = self.qubits[i2], self.qubits[i1]
+        self.positions[q_id1], self.positions[q_id2] = i2, i1
 
     def apply_controlled_two_qubit_gate(self, mat, q_id1, q_id2, q_id3):
         """
@@ -191,15 +584,33 @@ class QubitThread(object):
             q_id2 (str): A target qubit
             q_id3 (str): A target qubit
         """
-        # Move the qubits to the correct position
-        self.swap_qubits(q_id1, self.qubits[0])
-        self.swap_qubits(q_id2, self.qubits[1])
-        self.swap_qubits(q_id3, self.qubits[2])
+        self._activate([q_id1, q_id2, q_id3])
+        controlled = controlled_matrix(mat)
+        if self._apply_compact(controlled, [q_id1, q_id2, q_id3]) or \
+                self._apply_structured(controlled, [q_id1, q_id2, q_id3]):
+            return
+        self.qubit = apply_controlled(
+            self.qubit, mat, [self.positions[q_id1]],
+            [self.positions[q_id2], self.positions[q_id3]])
 
-        first_mat = np.block([[np.eye(4), np.zeros((4, 4))], [np.zeros((4, 4)), mat]])
-        total_mat = np.kron(first_mat, np.eye(2 ** (len(self.qubits) - 3)))
+    def apply_multi_controlled_gate(self, mat, controls, targets):
+        """
+        Applies a gate to some qubits, controlled by several qubits. Dense
+        state vectors are only updated where all controls are 1.
 
-        self.qubit = np.dot(total_mat, self.qubit)
+        Args:
+            mat (np.ndarray): The 2^k x 2^k unitary gate for k targets.
+            controls (List): Ids of the control qubits.
+            targets (List): Ids of the target qubits, the first one is the
+                most significant qubit of the gate.
+        """
+        self._activate(controls + targets)
+        controlled = controlled_matrix(mat, len(controls))
+        if self._apply_compact(controlled, controls + targets):
+            return
+        self.qubit = apply_controlled(
+            self.qubit, mat, [self.positions[q_id] for q_id in controls],
+            [self.positions[q_id] for q_id in targets])
 
     def apply_two_qubit_gate(self, gate, q_id1, q_id2):
         """
@@ -210,25 +621,12 @@ class QubitThread(object):
             q_id1(String): First qubit id.
             q_id2(String): Second qubit id.
         """
-        # Bring the qubits in the right order
-        i2 = self.qubits.index(q_id2)
-        if i2 > 0:
-            new_i1 = i2 - 1
-            self.swap_qubits(q_id1, self.qubits[new_i1])
-        else:
-            self.swap_qubits(q_id1, self.qubits[0])
-            self.swap_qubits(q_id2, self.qubits[1])
-
-        apply_mat = gate
-        nr1 = self.qubits.index(q_id1)
-        total_amount = len(self.qubits)
-        before = nr1
-        after = total_amount - nr1 - 2
-        if before > 0:
-            apply_mat = np.kron(np.eye(2 ** before), apply_mat)
-        if after > 0:
-            apply_mat = np.kron(apply_mat, np.eye(2 ** after))
-        self.qubit = np.dot(apply_mat, self.qubit)
+        self._activate([q_id1, q_id2])
+        if self._apply_compact(gate, [q_id1, q_id2]) or \
+                self._apply_structured(gate, [q_id1, q_id2]):
+            return
+        self.qubit = apply_gate(self.qubit, gate, [self.positions[q_id1],
+                                                   self.positions[q_id2]])
 
     def measure_non_destructive(self, q_id, channel):
         """
@@ -238,9 +636,13 @@ class QubitThread(object):
             q_id(String): ID of the Qubit to measure.
             channel(Queue): Channel to transmit measurement result to.
         """
+        self._activate([q_id])
+        if not isinstance(self.qubit, np.ndarray):
+            self._measure_compact(q_id, channel, remove=False)
+            return
         # determine probability for |1>
         measure_vec = np.array([1, 0], dtype=np.csingle)
-        nr = self.qubits.index(q_id)
+        nr = self.positions[q_id]
         total_amount = len(self.qubits)
         before = nr
         after = total_amount - nr - 1
@@ -275,6 +677,29 @@ class QubitThread(object):
         # renormalize the qubit vector
         norm = np.linalg.norm(self.qubit)
         self.qubit = self.qubit / norm
+        self._update_representation()
+
+    def _measure_compact(self, q_id, channel, remove):
+        """
+        Measures a qubit of a sparse state vector, matrix product state or
+        ensemble. Every member of an ensemble has its own result.
+
+        Args:
+            q_id(String): ID of the Qubit to measure.
+            channel(Queue): Channel to transmit measurement result to.
+            remove(bool): If the qubit is removed from the state afterwards.
+        """
+        nr = self.positions[q_id]
+        pr_1 = np.clip(self.qubit.probability_one(nr), 0.0, 1.0)
+        meas_res = np.random.binomial(1, pr_1)
+        channel.put(meas_res)
+        self.qubit.collapse(nr, meas_res, remove)
+        if remove:
+            self._remove_qubit(q_id)
+            if len(self.qubits) == 0:
+                self._next_factor()
+                return
+        self._update_representation()
 
     def measure(self, q_id, channel):
         """
@@ -284,9 +709,13 @@ class QubitThread(object):
             q_id(String): ID of the Qubit to measure.
             channel(Queue): Channel to transmit measurement result to.
         """
+        self._activate([q_id])
+        if not isinstance(self.qubit, np.ndarray):
+            self._measure_compact(q_id, channel, remove=True)
+            return
         # determine probability for |1>
         measure_vec = np.array([1, 0], dtype=np.csingle)
-        nr = self.qubits.index(q_id)
+        nr = self.positions[q_id]
         total_amount = len(self.qubits)
         before = nr
         after = total_amount - nr - 1
@@ -316,46 +745,166 @@ class QubitThread(object):
         if after > 0:
             reduction_mat = np.kron(
                 reduction_mat, np.eye(2 ** after, dtype=np.csingle))
-        self.qubits.remove(q_id)
+        self._remove_qubit(q_id)
         if total_amount == 1:
-            # it was the last qubit, just terminate this process
+            # it was the last qubit, continue with a deferred factor or
+            # terminate this process
+            self._next_factor()
             return
         # remove measured qubit from qubit state vector
         self.qubit = np.dot(reduction_mat, self.qubit)
         # renormalize the qubit vector
         norm = np.linalg.norm(self.qubit)
         self.qubit = self.qubit / norm
+        self._update_representation()
 
-    def run(self):
+    def measure_basis(self, gate, q_ids, channel, non_destructive=False):
         """
-        Run in loop and wait to receive tasks to perform.
+        Measures some qubits in another basis, e.g. the Bell basis. The basis
+        change is applied in one pass, the probabilities of all outcomes are
+        evaluated at once and the state collapses once. Sparse states,
+        matrix product states and ensembles measure the qubits one after
+        another in the changed basis.
+
+        Args:
+            gate (np.ndarray): Unitary which maps the states of the basis to
+                the computational basis states.
+            q_ids (List): Ids of the measured qubits.
+            channel (Queue): Channel to transmit the list of results to.
+            non_destructive (bool): If the qubits stay in the state, in the
+                measured state of the basis.
         """
-        while True:
-            item = self.queue.get()
-            if item is None:
-                return
-            elif item[0] == SINGLE_GATE:
-                self.apply_single_gate(item[1], item[2])
-            elif item[0] == CONTROLLED_GATE:
-                self.apply_controlled_gate(item[1], item[2], item[3])
-            elif item[0] == CONTROLLED_TWO_GATE:
-                self.apply_controlled_two_qubit_gate(item[1], item[2], item[3], item[4])
-            elif item[0] == MEASURE:
-                self.measure(item[1], item[2])
-                # no qubit left, terminate
-                if len(self.qubits) == 0:
-                    return
-            elif item[0] == MERGE_ACCEPT:
-                self.merge_accept(item[1])
-            elif item[0] == MERGE_SEND:
-                # After merge, this thread is not needed anymore
-                self.merge_send(item[1], item[2])
-                return
-            elif item[0] == MEASURE_NON_DESTRUCTIVE:
-                self.measure_non_destructive(item[1], item[2])
-            elif item[0] == GIVE_STATEVECTOR:
-                self.give_statevector(item[1])
-            elif item[0] == DOUBLE_GATE:
-                self.apply_two_qubit_gate(item[1], item[2], item[3])
+        self._activate(q_ids)
+        if not isinstance(self.qubit, np.ndarray):
+            self._measure_basis_compact(gate, q_ids, channel, non_destructive)
+            return
+        k = len(q_ids)
+        n = len(self.qubits)
+        positions = [self.positions[q_id] for q_id in q_ids]
+        vector = apply_gate(self.qubit, gate, positions)
+        tensor = np.moveaxis(np.reshape(vector, (2,) * n), positions, range(k))
+        shape = tensor.shape
+        tensor = tensor.reshape((2 ** k, -1))
+        outcome = sample_operator(np.sum(np.abs(tensor) ** 2, axis=1))
+        kept = tensor[outcome] / np.linalg.norm(tensor[outcome])
+        channel.put([(outcome >> (k - 1 - j)) & 1 for j in range(k)])
+        if non_destructive:
+            tensor = np.zeros_like(tensor)
+            tensor[outcome] = kept
+            tensor = np.moveaxis(tensor.reshape(shape), range(k), positions)
+            self.qubit = apply_gate(tensor.reshape(-1), gate.conj().T, positions)
+            self._update_representation()
+            return
+        for q_id in q_ids:
+            self._remove_qubit(q_id)
+        if len(self.qubits) == 0:
+            # all qubits were measured, continue with a deferred factor
+            self._next_factor()
+            return
+        self.qubit = kept
+        self._update_representation()
+
+    def _measure_basis_compact(self, gate, q_ids, channel, non_destructive):
+        """
+        Measures some qubits of a sparse state vector, matrix product state
+        or ensemble in another basis. All qubits are collapsed before any of
+        them is removed, so that the representation does not change in
+        between.
+        """
+        positions = [self.positions[q_id] for q_id in q_ids]
+        self.qubit.apply_gate(gate, positions)
+        results = []
+        for nr in positions:
+            pr_1 = np.clip(self.qubit.probability_one(nr), 0.0, 1.0)
+            results.append(np.random.binomial(1, pr_1))
+            self.qubit.collapse(nr, results[-1])
+        channel.put(results)
+        if non_destructive:
+            self.qubit.apply_gate(gate.conj().T, positions)
+            self._update_representation()
+            return
+        for q_id, result in zip(q_ids, results):
+            self.qubit.collapse(self.positions[q_id], result, remove=True)
+            self._remove_qubit(q_id)
+        if len(self.qubits) == 0:
+            self._next_factor()
+            return
+        self._update_representation()
+
+    def run_circuit(self, steps, channel):
+        """
+        Executes the steps of a compiled circuit one after another and sends
+        the results of its measurements over a channel.
+
+        Args:
+            steps (List): Qubit Thread commands with the matrix and the ids
+                of their qubits.
+            channel (Queue): Channel to transmit the measurement results to,
+                as a dictionary from qubit id to result, or None.
+        """
+        results = {}
+        temp_queue = Queue()
+        for step in steps:
+            if step[0] == MEASURE:
+                self.measure(step[2], temp_queue)
+                results[step[2]] = temp_queue.get()
             else:
-                raise ValueError("Command does not exist!")
+                self.execute(step)
+        if channel is not None:
+            channel.put(results)
+
+    def execute(self, item):
+        """
+        Executes a command.
+
+        Args:
+            item (List): The command and its arguments.
+
+        Returns:
+            bool. True if the group is not needed anymore.
+        """
+        if item[0] == SINGLE_GATE:
+            self.apply_single_gate(item[1], item[2])
+        elif item[0] == CONTROLLED_GATE:
+            self.apply_controlled_gate(item[1], item[2], item[3])
+        elif item[0] == CONTROLLED_TWO_GATE:
+            self.apply_controlled_two_qubit_gate(item[1], item[2], item[3], item[4])
+        elif item[0] == MEASURE:
+            self.measure(item[1], item[2])
+            # no qubit left, terminate
+            return len(self.qubits) == 0
+        elif item[0] == MERGE_ACCEPT:
+            self.merge_accept(item[1])
+        elif item[0] == MERGE_SEND:
+            # After merge, this thread is not needed anymore
+            self.merge_send(item[1], item[2])
+            return True
+        elif item[0] == MEASURE_NON_DESTRUCTIVE:
+            self.measure_non_destructive(item[1], item[2])
+        elif item[0] == GIVE_STATEVECTOR:
+            self.give_statevector(*item[1:])
+        elif item[0] == GIVE_PROBABILITIES:
+            self.give_probabilities(item[1], item[2])
+        elif item[0] == GIVE_DENSITY_MATRIX:
+            self.give_density_matrix(item[1], item[2])
+        elif item[0] == GIVE_EXPECTATION:
+            self.give_expectation(item[1], item[2], item[3])
+        elif item[0] == DOUBLE_GATE:
+            self.apply_two_qubit_gate(item[1], item[2], item[3])
+        elif item[0] == APPLY_CHANNEL:
+            self.apply_channel(item[1], item[2])
+        elif item[0] == MULTI_CONTROLLED_GATE:
+            self.apply_multi_controlled_gate(item[1], item[2], item[3])
+        elif item[0] == K_QUBIT_GATE:
+            self.apply_k_qubit_gate(item[1], item[2])
+        elif item[0] == MEASURE_BASIS:
+            self.measure_basis(item[1], item[2], item[3], item[4])
+            # no qubit left, terminate
+            return len(self.qubits) == 0
+        elif item[0] == RUN_CIRCUIT:
+            self.run_circuit(item[1], item[2])
+            # all qubits of the thread may have been measured
+            return len(self.qubits) == 0
+        else:
+            raise ValueError("Command does not exist!")
+        return False
@@ -4,7 +4,9 @@ import threading
 class SharedDict(object):
     """
     A Dictionary to save a mapping of Qubits IDs to Queues and Threads/Processes.
-    This dictionary is thread safe.
+    This dictionary is thread safe. The amount of qubit ids of every
+    Thread/Process and Queue is counted, so that adding and removing a qubit
+    takes constant time.
     """
 
     # From O'Reilly Python Cookbook by David Ascher, Alex Martelli
@@ -75,36 +77,58 @@ class SharedDict(object):
             self._read_ready.notifyAll()
             self._read_ready.release()
 
-    __instance = None
+    def __init__(self):
+        self.lock = SharedDict.ReadWriteLock()
+        self.id_to_queue = {}
+
+        self.id_to_thread = {}
+        # Amount of qubit ids using every thread and queue
+        self.thread_list = {}
+        self.queue_list = {}
 
     @staticmethod
-    def get_instance():
+    def _count(registry, item, change):
         """
-        Get the existing instance of the dictionary.
-        If none exists, one is created.
-        """
-        if SharedDict.__instance is None:
-            return SharedDict()
-        return SharedDict.__instance
+        Changes the amount of qubit ids using a thread or queue.
 
-    @staticmethod
-    def get_new_instance():
+        Returns:
+            bool. True if no qubit id uses it any more.
+        """
+        count = registry.get(item, 0) + change
+        if count > 0:
+            registry[item] = count
+            return False
+        registry.pop(item, None)
+        return True
+
+    def _assign(self, q_id, thread, queue):
         """
-        Create a new instance of this dictionary, even if one exists.
+        Assigns a thread and a queue to a qubit id, the write lock has to be
+        held.
         """
-        SharedDict.__instance = None
-        return SharedDict()
+        self._unassign(q_id)
+        self.id_to_thread[q_id] = thread
+        self.id_to_queue[q_id] = queue
+        self._count(self.thread_list, thread, 1)
+        self._count(self.queue_list, queue, 1)
 
-    def __init__(self):
-        if SharedDict.__instance is not None:
-            raise Exception("Call get instance to get this class!")
-        SharedDict.__instance = self
-        self.lock = SharedDict.ReadWriteLock()
-        self.id_to_queue = {}
+    def _unassign(self, q_id):
+        """
+        Removes the thread and queue of a qubit id, the write lock has to be
+        held.
 
-        self.id_to_thread = {}
-        self.thread_list = []
-        self.queue_list = []
+        Returns:
+            Thread. The thread of the qubit if no qubit id uses it any more,
+            otherwise None.
+        """
+        if q_id not in self.id_to_thread:
+            return None
+        thread = self.id_to_thread.pop(q_id)
+        queue = self.id_to_queue.pop(q_id)
+        self._count(self.queue_list, queue, -1)
+        if self._count(self.thread_list, thread, -1):
+            return thread
+        return None
 
     def block_shared_dict(self):
         self.lock.acquire_write()
@@ -163,12 +187,21 @@ class SharedDict(object):
             queue(Queue): Queue of the Qubit.
         """
         self.lock.acquire_write()
-        self.id_to_queue[q_id] = queue
-        self.id_to_thread[q_id] = thread
-        self.queue_list.append(queue)
-        self.thread_list.append(thread)
+        self._assign(q_id, thread, queue)
         self.lock.release_write()
 
+    def get_ids(self):
+        """
+        Request all Qubit ids which are saved in the dictionary.
+
+        Returns:
+            List. List of Qubit ids.
+        """
+        self.lock.acquire_read()
+        ret = list(self.id_to_queue.keys())
+        self.lock.release_read()
+        return ret
+
     def delete_id(self, q_id):
         """
         Deletes contact information of a Qubit from the dictionary.
@@ -177,101 +210,77 @@ class SharedDict(object):
             q_id(String): Qubit id to forget.
         """
         self.lock.acquire_write()
-        del self.id_to_queue[q_id]
-        del self.id_to_thread[q_id]
+        if q_id not in self.id_to_thread:
+            self.lock.release_write()
+            raise KeyError(q_id)
+        self._unassign(q_id)
         self.lock.release_write()
 
     def delete_id_and_check_to_join_thread(self, q_id):
         """
         Deletes contact information of a Qubit from the dictionary and checks
-        if the thread can be stopped.
+        if the thread can be stopped. A thread which has stopped and is not
+        used by another qubit is joined after the dictionary has been
+        released.
 
         Args:
             q_id(String): Qubit id to forget.
         """
         self.lock.acquire_write()
-        thread = None
-        if q_id in self.id_to_thread.keys():
-            thread = self.id_to_thread[q_id]
-            if not thread.is_alive():
-                thread.join()
-                if thread in self.thread_list:
-                    self.thread_list.remove(thread)
-            del self.id_to_thread[q_id]
-            del self.id_to_queue[q_id]
+        thread = self._unassign(q_id)
         self.lock.release_write()
+        if thread is not None and not thread.is_alive():
+            thread.join()
 
-    def join_thread_with_id(self, q_id):
-        """
-        Removes a Thread of a Qubit and removes the contact infomation from the
-        dictionary.
-
-        Args:
-            q_id(String): ID of the Qubit.
-        """
-        self.lock.acquire_read()
-        thread = self.id_to_thread[q_id]
-        self.lock.release_read()
-        thread.join()
-        self.lock.acquire_write()
-        self.thread_list.remove(thread)
-        del self.id_to_thread[q_id]
-        self.lock.release_write()
-
-    def change_thread_and_queue_of_ids_and_join(self, q_ids, q_id_new_thread):
+    def change_thread_and_queue_of_ids(self, q_ids, q_id_new_thread):
         """
         Takes a list of Qubit IDs and assigns new a new thread and new queue to
-        it. The new thread/queue is given by another qubit id. Afterwards, the
-        old threads of the qubits are joined.
+        it. The new thread/queue is given by another qubit id.
 
         Args:
             q_ids(List): List of Qubit ids.
             q_id_new_thread(String): ID of the qubit with the new Threads.
         """
         self.lock.acquire_write()
-        new_thread = self.id_to_thread[q_id_new_thread]
-        new_queue = self.id_to_queue[q_id_new_thread]
-        for q_id in q_ids:
-            thread = self.id_to_thread[q_id]
-            if thread in self.thread_list:
-                self.thread_list.remove(thread)
-                thread.join()
-            self.id_to_thread[q_id] = new_thread
-            self.id_to_queue[q_id] = new_queue
+        self.change_thread_and_queue_of_ids_nonblocking(q_ids, q_id_new_thread)
         self.lock.release_write()
 
-    def change_thread_and_queue_of_ids(self, q_ids, q_id_new_thread):
+    def change_thread_and_queue_of_ids_nonblocking(self, q_ids, q_id_new_thread):
         """
         Takes a list of Qubit IDs and assigns new a new thread and new queue to
-        it. The new thread/queue is given by another qubit id.
+        it. The new thread/queue is given by another qubit id. The Dictionary
+        is not blocked during these operations.
 
         Args:
             q_ids(List): List of Qubit ids.
             q_id_new_thread(String): ID of the qubit with the new Threads.
         """
-        self.lock.acquire_write()
         new_thread = self.id_to_thread[q_id_new_thread]
         new_queue = self.id_to_queue[q_id_new_thread]
         for q_id in q_ids:
-            self.id_to_thread[q_id] = new_thread
-            self.id_to_queue[q_id] = new_queue
-        self.lock.release_write()
+            self._assign(q_id, new_thread, new_queue)
 
-    def change_thread_and_queue_of_ids_nonblocking(self, q_ids, q_id_new_thread):
+    def delete_ids_and_stop_threads(self, q_ids):
         """
-        Takes a list of Qubit IDs and assigns new a new thread and new queue to
-        it. The new thread/queue is given by another qubit id. The Dictionary
-        is not blocked during these operations.
+        Deletes contact information of all given Qubits from the dictionary
+        and stops their Threads, which are not used by other Qubits. The
+        Threads are joined after the dictionary has been released.
 
         Args:
             q_ids(List): List of Qubit ids.
-            q_id_new_thread(String): ID of the qubit with the new Threads.
         """
-        new_thread = self.id_to_thread[q_id_new_thread]
-        new_queue = self.id_to_queue[q_id_new_thread]
+        self.lock.acquire_write()
+        stopped = []
         for q_id in q_ids:
-            self.id_to_thread[q_id] = new_thread
-            self.id_to_queue[q_id] = new_queue
+            queue = self.id_to_queue[q_id]
+            thread = self._unassign(q_id)
+            if thread is not None:
+                stopped.append((thread, queue))
+        self.lock.release_write()
+        for _, queue in stopped:
+            queue.put(None)
+        for thread, _ in stopped:
+            thread.join()
 
     def send_all_threads(self, msg):
         """
@@ -289,13 +298,8 @@ class SharedDict(object):
         """
         Stops all Threads in the Dictionary.
         """
-        self.lock.acquire_write()
-        for p in self.thread_list:
+        self.lock.acquire_read()
+        threads = list(self.thread_list)
+        self.lock.release_read()
+        for p in threads:
             p.join()
-        self.lock.release_write()
-
-    def stop_shared_dict(self):
-        """
-        Releases the dictionary object.
-        """
-        SharedDict.__instance = None
@@ -0,0 +1,189 @@
+import numpy as np
+
+from eqsn.kernels import is_diagonal
+
+# Groups with less qubits are always stored as dense state vectors
+SPARSE_MIN_QUBITS = 12
+# Maximum ratio of nonzero amplitudes of a sparse state vector
+SPARSE_MAX_FILL = 1.0 / 16
+
+
+def tolerance(dtype):
+    """
+    Amplitudes with a smaller absolute value are treated as zero.
+    """
+    return np.finfo(dtype).eps
+
+
+def controlled_matrix(mat, controls=1):
+    """
+    Gives the matrix of a gate controlled by some qubits, which act as the
+    most significant qubits of the matrix. For a stack of matrices, a stack
+    of controlled matrices is given.
+
+    Args:
+        mat (np.ndarray): The unitary matrix which is controlled.
+        controls (int): Amount of controlling qubits.
+    """
+    dim = mat.shape[-1]
+    size = dim * 2 ** controls
+    ret = np.zeros(mat.shape[:-2] + (size, size),
+                   dtype=np.result_type(mat, np.csingle))
+    ret[...] = np.eye(size)
+    ret[..., size - dim:, size - dim:] = mat
+    return ret
+
+
+class SparseState(object):
+    """
+    State vector of n qubits, which only stores its nonzero amplitudes as
+    sorted arrays of indices and values. Like in the dense state vector, the
+    first qubit is the most significant bit of an index. Gates and
+    measurements only touch the nonzero amplitudes.
+    """
+
+    def __init__(self, n, indices, values):
+        """
+        Args:
+            n (int): Amount of qubits.
+            indices (np.ndarray): Sorted indices of the nonzero amplitudes.
+            values (np.ndarray): The nonzero amplitudes.
+        """
+        self.n = n
+        self.indices = indices
+        self.values = values
+
+    @staticmethod
+    def from_dense(vector):
+        """
+        Creates a sparse state vector from a dense one. Amplitudes below the
+        tolerance are dropped and the state is renormalized.
+
+        Args:
+            vector (np.ndarray): Dense state vector.
+        """
+        indices = np.flatnonzero(np.abs(vector) > tolerance(vector.dtype))
+        n = vector.size.bit_length() - 1
+        values = vector[indices]
+        if len(indices) < vector.size:
+            values = values / np.linalg.norm(values)
+        return SparseState(n, indices.astype(np.int64), values)
+
+    def to_dense(self):
+        """
+        Gives the dense state vector.
+        """
+        vector = np.zeros(2 ** self.n, dtype=self.values.dtype)
+        vector[self.indices] = self.values
+        return vector
+
+    def get(self, indices):
+        """
+        Gives the amplitudes with the given indices.
+
+        Args:
+            indices (List): Indices of the amplitudes.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        positions = np.searchsorted(self.indices, indices)
+        positions = np.minimum(positions, max(len(self.indices) - 1, 0))
+        found = self.indices[positions] == indices
+        ret = np.zeros(len(indices), dtype=self.values.dtype)
+        ret[found] = self.values[positions[found]]
+        return ret
+
+    def fill(self):
+        """
+        Gives the ratio of nonzero amplitudes.
+        """
+        return len(self.indices) / 2.0 ** self.n
+
+    def _bit(self, position):
+        return self.n - 1 - position
+
+    def apply_gate(self, gate, positions):
+        """
+        Applies a gate on k qubits. The nonzero amplitudes are grouped by
+        the bits of all other qubits, every group is multiplied with the
+        gate and amplitudes which became zero are removed, renormalizing the
+        state. Diagonal gates only multiply the amplitudes with their phases.
+
+        Args:
+            gate (np.ndarray): 2^k x 2^k unitary matrix.
+            positions (List): Positions of the k qubits in the state, the
+                first one is the most significant qubit of the gate.
+        """
+        k = len(positions)
+        bits = [self._bit(p) for p in positions]
+        if is_diagonal(gate):
+            # Only the phases change, the nonzero amplitudes stay the same
+            local = np.zeros(len(self.indices), dtype=np.int64)
+            for j, b in enumerate(bits):
+                local |= ((self.indices >> b) & 1) << (k - 1 - j)
+            self.values = self.values * np.diagonal(gate)[local]
+            return
+        mask = 0
+        for b in bits:
+            mask |= 1 << b
+        bases, inverse = np.unique(self.indices & ~mask, return_inverse=True)
+        local = np.zeros(len(self.indices), dtype=np.int64)
+        offsets = np.zeros(2 ** k, dtype=np.int64)
+        for j, b in enumerate(bits):
+            local |= ((self.indices >> b) & 1) << (k - 1 - j)
+            offsets |= ((np.arange(2 ** k) >> (k - 1 - j)) & 1) << b
+        dtype = np.result_type(self.values, gate)
+        amplitudes = np.zeros((len(bases), 2 ** k), dtype=dtype)
+        amplitudes[inverse.reshape(-1), local] = self.values
+        amplitudes = amplitudes.dot(gate.T.astype(dtype))
+        indices = (bases[:, None] | offsets[None, :]).ravel()
+        values = amplitudes.ravel()
+        keep = np.abs(values) > tolerance(dtype)
+        indices = indices[keep]
+        values = values[keep]
+        if not keep.all():
+            values = values / np.linalg.norm(values)
+        order = np.argsort(indices)
+        self.indices = indices[order]
+        self.values = values[order]
+
+    def probability_one(self, position):
+        """
+        Gives the probability to measure a qubit in the state |1>.
+
+        Args:
+            position (int): Position of the qubit.
+        """
+        ones = (self.indices >> self._bit(position)) & 1 == 1
+        return float(np.sum(np.abs(self.values[ones]) ** 2))
+
+    def collapse(self, position, result, remove=False):
+        """
+        Projects a qubit on a measurement result and renormalizes.
+
+        Args:
+            position (int): Position of the qubit.
+            result (int): The measurement result, 0 or 1.
+            remove (bool): Remove the qubit from the state afterwards.
+        """
+        bit = self._bit(position)
+        keep = (self.indices >> bit) & 1 == result
+        indices = self.indices[keep]
+        values = self.values[keep]
+        self.values = values / np.linalg.norm(values)
+        if remove:
+            low = indices & ((1 << bit) - 1)
+            indices = ((indices >> (bit + 1)) << bit) | low
+            self.n -= 1
+        self.indices = indices
+
+    def kron(self, other):
+        """
+        Gives the tensor product with another sparse state vector, whose
+        qubits come after the qubits of this one.
+
+        Args:
+            other (SparseState): The other state vector.
+        """
+        indices = (self.indices[:, None] << other.n) | other.indices[None, :]
+        values = np.multiply.outer(self.values, other.values)
+        return SparseState(self.n + other.n, indices.ravel(), values.ravel())
@@ -0,0 +1,217 @@
+import atexit
+import logging
+import multiprocessing
+import threading
+
+from eqsn.backpressure import InFlightWindow, QueueFullError, \
+    BACKPRESSURE_MODES, BLOCK, RAISE
+from eqsn.process_picker import ProcessPicker
+from eqsn.qubit_thread import RESET_WORKER
+from eqsn.worker_process import WorkerProcess
+
+
+class WorkerPool(object):
+    """
+    A set of Worker Processes, which can be shared by several EQSN objects.
+    The pool keeps count of the EQSN objects using it and stops its
+    processes as soon as the last one of them has been stopped, unless
+    the workers should be kept for the next EQSN object.
+
+    The amount of gates which are pending on a Worker Process can be limited,
+    so that a fast producer cannot fill the memory with queued gates. If the
+    limit is reached, new gates are blocked, dropped or rejected with a
+    QueueFullError, depending on the backpressure mode.
+    """
+    __shared = None
+    __shared_lock = threading.Lock()
+
+    @staticmethod
+    def get_shared_pool():
+        """
+        Gets the pool shared by all EQSN objects of this process and registers
+        a new user of it. If there is no running pool, a new one is started.
+
+        Returns:
+            WorkerPool. The shared pool.
+        """
+        with WorkerPool.__shared_lock:
+            pool = WorkerPool.__shared
+            if pool is None or not pool.acquire():
+                pool = WorkerPool()
+                pool.acquire()
+                WorkerPool.__shared = pool
+            return pool
+
+    @staticmethod
+    def stop_shared_pool():
+        """
+        Stops the shared pool, if it is still running. This is needed to stop
+        workers which have been kept after the last EQSN object was stopped.
+        The pool is only stopped if no EQSN object is using it anymore.
+
+        Raises:
+            RuntimeError: If there are still EQSN objects using the pool.
+        """
+        with WorkerPool.__shared_lock:
+            pool = WorkerPool.__shared
+            if pool is None:
+                return
+            with pool.lock:
+                if pool.users > 0:
+                    raise RuntimeError(
+                        "Shared pool is still used by %d EQSN objects, "
+                        "call stop_all on them first." % pool.users)
+            WorkerPool.__shared = None
+        pool.stop()
+
+    def __init__(self, amount_processes=None, max_pending=None,
+                 backpressure=BLOCK):
+        """
+        Args:
+            amount_processes (int): Amount of Worker Processes to start. If
+                None, one process per CPU is started.
+            max_pending (int): Maximum amount of gates which are submitted
+                to a Worker Process but not yet applied. None for no limit.
+            backpressure (String): What happens to a gate if the limit is
+                reached, one of 'block', 'drop' or 'raise'.
+        """
+        if amount_processes is None:
+            amount_processes = multiprocessing.cpu_count()
+        if backpressure not in BACKPRESSURE_MODES:
+            raise ValueError("Unknown backpressure mode %s." % backpressure)
+        if max_pending is not None and max_pending < 1:
+            raise ValueError("At least one gate has to be allowed to pend.")
+        self.amount_processes = amount_processes
+        self.max_pending = max_pending
+        self.backpressure = backpressure
+        self.dropped = 0
+        self.manager = multiprocessing.Manager()
+        self.process_queue_list = []
+        self.windows = {}
+        for _ in range(amount_processes):
+            q = multiprocessing.Queue()
+            window = InFlightWindow(max_pending)
+            new_worker = WorkerProcess(q, window)
+            p = multiprocessing.Process(target=new_worker.run, args=())
+            p.start()
+            self.process_queue_list.append((p, q))
+            self.windows[q] = window
+        self.process_picker = ProcessPicker(
+            amount_processes, self.process_queue_list)
+        self.lock = threading.Lock()
+        self.users = 0
+        self.running = True
+        self.stopped = False
+        self.stop_registered = False
+        logging.debug("Started worker pool with %d processes.",
+                      amount_processes)
+
+    def acquire(self):
+        """
+        Registers a new user of the pool.
+
+        Returns:
+            bool. False if the pool has already been stopped.
+        """
+        with self.lock:
+            if not self.running:
+                return False
+            self.users += 1
+            return True
+
+    def release(self, keep_workers=False):
+        """
+        Unregisters a user of the pool. If it was the last user, all
+        Worker Processes are stopped or, if they are kept, reset.
+
+        Args:
+            keep_workers (bool): If the processes should keep running for
+                the next user of the pool.
+        """
+        with self.lock:
+            self.users -= 1
+            if self.users > 0 or not self.running:
+                return
+            if keep_workers:
+                self.reset()
+                if not self.stop_registered:
+                    # Kept workers would block the interpreter from exiting
+                    atexit.register(self.stop)
+                    self.stop_registered = True
+                return
+            self.running = False
+        self.stop()
+
+    def admit(self, q):
+        """
+        Takes a slot for a gate in the window of a Worker Process. Depending
+        on the backpressure mode, a full window blocks until a gate has been
+        applied, drops the gate or raises an error.
+
+        Args:
+            q (Queue): Queue of the Worker Process.
+
+        Returns:
+            bool. False if the gate should be dropped.
+
+        Raises:
+            QueueFullError: If the window is full and the mode is 'raise'.
+        """
+        window = self.windows[q]
+        if window.acquire(self.backpressure == BLOCK):
+            return True
+        if self.backpressure == RAISE:
+            raise QueueFullError(
+                "%d gates are pending on the worker process." % window.depth())
+        with self.lock:
+            self.dropped += 1
+        return False
+
+    def queue_depths(self):
+        """
+        Gives the current load of every Worker Process.
+
+        Returns:
+            List. For every Worker Process a dictionary with the amount of
+            pending gates and of commands waiting in its queue. The queue
+            size is None on platforms which do not support it.
+        """
+        depths = []
+        for _, q in self.process_queue_list:
+            try:
+                queued = q.qsize()
+            except NotImplementedError:
+                queued = None
+            depths.append({'pending': self.windows[q].depth(),
+                           'queued': queued})
+        return depths
+
+    def reset(self):
+        """
+        Stops all Qubits on the Worker Processes and clears their state,
+        without stopping the processes.
+        """
+        channels = []
+        for _, q in self.process_queue_list:
+            ret = self.manager.Queue()
+            q.put([RESET_WORKER, ret])
+            channels.append(ret)
+        for ret in channels:
+            ret.get()
+        logging.debug("Reset worker pool.")
+
+    def stop(self):
+        """
+        Stops all Worker Processes of the pool.
+        """
+        with self.lock:
+            if self.stopped:
+                return
+            self.running = False
+            self.stopped = True
+        atexit.unregister(self.stop)
+        for p, q in self.process_queue_list:
+            q.put(None)
+            p.join()
+        self.manager.shutdown()
+        logging.debug("Stopped worker pool.")
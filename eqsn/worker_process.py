@@ -1,81 +1,318 @@
 import logging
-import threading
+import time
 from queue import Queue
 
 from eqsn.qubit_thread import SINGLE_GATE, MERGE_SEND, MERGE_ACCEPT, MEASURE, \
     MEASURE_NON_DESTRUCTIVE, GIVE_STATEVECTOR, \
     CONTROLLED_GATE, NEW_QUBIT, ADD_MERGED_QUBITS_TO_DICT, CONTROLLED_TWO_GATE, \
-    DOUBLE_GATE, QubitThread
-from eqsn.shared_dict import SharedDict
+    DOUBLE_GATE, STOP_NAMESPACE, RESET_WORKER, CHECKPOINT, RESTORE_QUBITS, \
+    GIVE_PROBABILITIES, GIVE_DENSITY_MATRIX, GIVE_EXPECTATION, TRACE, \
+    GIVE_TRACE, BARRIER, DEFINE_CIRCUIT, RUN_CIRCUIT, APPLY_CHANNEL, \
+    GATE_COMMANDS, MEASURE_REF, APPLY_IF, GIVE_RESULT, MULTI_CONTROLLED_GATE, \
+    K_QUBIT_GATE, MEASURE_BASIS, RESET_QUBIT, RELEASE_RESULT, QubitThread
+from eqsn.checkpoint import load_amplitudes
+from eqsn.circuits import compile_circuit, conditional_gate
+from eqsn.mps_state import MPSState, MPS, ENSEMBLE
+from eqsn.ensemble_state import EnsembleState
+from eqsn.profiling import Tracer
 
 
 class WorkerProcess(object):
     """
     Object to control a Process. Intermediate object to apply operations to the
     Qubits which are running on this Process.
+
+    The qubit groups of the Process are Qubit Thread objects, which are not
+    run as threads. A dictionary maps every qubit id to its group and
+    commands are executed on the group directly, so that a command is only
+    taken from one queue.
     """
 
-    def __init__(self, queue):
+    def __init__(self, queue, window=None):
         """
         Args:
             queue (Queue): Queue for receiving commands from main Process.
+            window (InFlightWindow): Window of the gates which are pending on
+                this Process, shared with the main Process.
         """
         self.queue = queue
-        self.shared_dict = None
+        self.window = window
+        # Qubit Thread object of every qubit id
+        self.groups = {}
+        self.circuits = {}
+        # Results of measurements which are kept for classically
+        # controlled gates
+        self.results = {}
+        self.tracer = None
+        self.trace = None
+        self.dispatched = False
 
     def run(self):
         """
         Run in loop and wait to receive tasks to perform.
         """
-        # Get a new instance, since their might be one from the old process
-        self.shared_dict = SharedDict.get_new_instance()
+        self.tracer = Tracer()
 
-        amount_single_gate = 0
         while True:
             item = self.queue.get()
             if item is None:
                 self.stop_all()
                 return
-            elif item[0] == NEW_QUBIT:
-                self.new_qubit(item[1])
-            elif item[0] == SINGLE_GATE:
-                self.apply_single_gate(item[1], item[2])
-                amount_single_gate += 1
-            elif item[0] == CONTROLLED_GATE:
-                self.apply_controlled_gate(item[1], item[2], item[3])
-            elif item[0] == CONTROLLED_TWO_GATE:
-                self.apply_two_qubit_controlled_gate(item[1], item[2], item[3], item[4])
-            elif item[0] == MEASURE:
-                self.measure(item[1], item[2])
-            elif item[0] == MERGE_ACCEPT:
-                self.merge_accept(item[1], item[2])
-            elif item[0] == MERGE_SEND:
-                self.merge_send(item[1], item[2], item[3])
-            elif item[0] == MEASURE_NON_DESTRUCTIVE:
-                self.measure_non_destructive(item[1], item[2])
-            elif item[0] == ADD_MERGED_QUBITS_TO_DICT:
-                self.add_merged_qubits_to_thread(item[1], item[2])
-            elif item[0] == GIVE_STATEVECTOR:
-                self.give_statevector_for(item[1], item[2])
-            elif item[0] == DOUBLE_GATE:
-                self.apply_two_qubit_gate(item[1], item[2], item[3])
+            elif item[0] == TRACE:
+                self.execute_traced(item[1], item[2], item[3])
+                item = item[3]
             else:
-                raise ValueError(f"Command does not exist! {item[0]}")
+                self.execute(item)
+            if self.window is not None and item[0] in GATE_COMMANDS:
+                self.window.release()
+
+    def execute(self, item):
+        """
+        Executes a command received from the main Process.
+
+        Args:
+            item (List): The command and its arguments.
+        """
+        if item[0] == NEW_QUBIT:
+            self.new_qubit(item[1], item[2])
+        elif item[0] == SINGLE_GATE:
+            self.apply_single_gate(item[1], item[2])
+        elif item[0] == APPLY_CHANNEL:
+            self.apply_channel(item[1], item[2])
+        elif item[0] == CONTROLLED_GATE:
+            self.apply_controlled_gate(item[1], item[2], item[3])
+        elif item[0] == CONTROLLED_TWO_GATE:
+            self.apply_two_qubit_controlled_gate(item[1], item[2], item[3], item[4])
+        elif item[0] == MULTI_CONTROLLED_GATE:
+            self.apply_multi_controlled_gate(item[1], item[2], item[3])
+        elif item[0] == K_QUBIT_GATE:
+            self.apply_k_qubit_gate(item[1], item[2])
+        elif item[0] == MEASURE_BASIS:
+            self.measure_basis(item[1], item[2], item[3], item[4])
+        elif item[0] == MEASURE:
+            self.measure(item[1], item[2])
+        elif item[0] == RESET_QUBIT:
+            self.reset_qubit(item[1], item[2], item[3])
+        elif item[0] == MERGE_ACCEPT:
+            self.merge_accept(item[1], item[2])
+        elif item[0] == MERGE_SEND:
+            self.merge_send(item[1], item[2], item[3])
+        elif item[0] == MEASURE_NON_DESTRUCTIVE:
+            self.measure_non_destructive(item[1], item[2])
+        elif item[0] == ADD_MERGED_QUBITS_TO_DICT:
+            self.add_merged_qubits_to_thread(item[1], item[2])
+        elif item[0] == GIVE_STATEVECTOR:
+            self.give_statevector_for(*item[1:])
+        elif item[0] in (GIVE_PROBABILITIES, GIVE_DENSITY_MATRIX,
+                         GIVE_EXPECTATION):
+            self.give_reduced_states(*item)
+        elif item[0] == DOUBLE_GATE:
+            self.apply_two_qubit_gate(item[1], item[2], item[3])
+        elif item[0] == STOP_NAMESPACE:
+            self.stop_namespace(item[1], item[2])
+        elif item[0] == RESET_WORKER:
+            self.reset(item[1])
+        elif item[0] == CHECKPOINT:
+            self.give_statevectors_of_namespace(item[1], item[2])
+        elif item[0] == RESTORE_QUBITS:
+            self.restore_qubits(item[1], item[2], item[3], item[4], item[5])
+        elif item[0] == GIVE_TRACE:
+            self.give_trace(item[1], item[2], item[3])
+        elif item[0] == BARRIER:
+            self.barrier(item[1], item[2], item[3])
+        elif item[0] == DEFINE_CIRCUIT:
+            self.define_circuit(item[1], item[2], item[3])
+        elif item[0] == RUN_CIRCUIT:
+            self.run_circuit(item[1], item[2], item[3], item[4])
+        elif item[0] == MEASURE_REF:
+            self.measure_ref(item[1], item[2], item[3])
+        elif item[0] == APPLY_IF:
+            self.apply_if(item[1], item[2], item[3], item[4])
+        elif item[0] == GIVE_RESULT:
+            # The result is handed over and not kept any longer
+            channel = item[2]
+            channel.put(self.results.pop(item[1]))
+        elif item[0] == RELEASE_RESULT:
+            self.results.pop(item[1], None)
+        else:
+            raise ValueError(f"Command does not exist! {item[0]}")
+
+    def execute_traced(self, namespace, stamps, item):
+        """
+        Executes a command and records its timestamps. If the command is
+        dispatched to qubit groups, the groups record the command instead.
+
+        Args:
+            namespace (int): Namespace of the EQSN object of the command.
+            stamps (List): Timestamps of the command so far.
+            item (List): The command and its arguments.
+        """
+        stamps.append(time.time())
+        self.trace = (namespace, stamps)
+        self.dispatched = False
+        self.execute(item)
+        self.trace = None
+        if not self.dispatched:
+            self.tracer.record(namespace, item[0], stamps + [None, time.time()])
 
-    def new_qubit(self, q_id):
+    def dispatch(self, group, item):
+        """
+        Executes a command on a qubit group. If the command which is executed
+        at the moment is traced, the dispatched command is traced as well.
+
+        Args:
+            group (QubitThread): The qubit group.
+            item (List): The command and its arguments.
+        """
+        if self.trace is None:
+            group.execute(item)
+            return
+        namespace, stamps = self.trace
+        self.dispatched = True
+        stamps = stamps + [time.time()]
+        group.execute(item)
+        self.tracer.record(namespace, item[0], stamps + [time.time()])
+
+    def _groups_for_ids(self, q_ids):
+        """
+        Gives the distinct qubit groups of some qubits, in the order of the
+        qubits.
+
+        Args:
+            q_ids (List): List of Qubit ids.
+        """
+        ret = []
+        for q_id in q_ids:
+            group = self.groups[q_id]
+            if not any(group is other for other in ret):
+                ret.append(group)
+        return ret
+
+    def _namespace_ids(self, namespace):
+        """
+        Gives the ids of all qubits of one EQSN object.
+        """
+        return [q_id for q_id in self.groups if q_id[0] == namespace]
+
+    def give_trace(self, namespace, reset, channel):
+        """
+        Sends the recorded statistics and events of one namespace.
+
+        Args:
+            namespace (int): Namespace of the EQSN object.
+            reset (bool): If the recorded data should be deleted.
+            channel (Queue): Channel to return the data to.
+        """
+        channel.put(self.tracer.give_trace(namespace, reset))
+
+    def new_qubit(self, q_id, backend=None):
         """
         Creates a new qubit with an id.
 
         Args:
             q_id (String): Id of the new qubit.
+            backend (Tuple): None for a state vector, or the name of the
+                backend followed by its options, e.g. (MPS, threshold,
+                max_bond) or (ENSEMBLE, batch).
         """
-        q = Queue()
-        thread = QubitThread(q_id, q)
-        p = threading.Thread(target=thread.run, args=())
-        self.shared_dict.set_thread_with_id(q_id, p, q)
-        p.start()
+        group = QubitThread(q_id)
+        if backend is not None and backend[0] == MPS:
+            group.set_state([q_id], MPSState.zero(backend[1], backend[2]))
+        elif backend is not None and backend[0] == ENSEMBLE:
+            group.set_state([q_id], EnsembleState.zero(backend[1]))
+        self.groups[q_id] = group
         logging.debug("Created new qubit with id %s.", q_id)
 
+    def restore_qubits(self, q_ids, path, offset, size, dtype=None):
+        """
+        Creates a new qubit group with the qubits and the state vector of a
+        group of a checkpoint. The state vector is memory mapped and only
+        read from disk when the group uses it.
+
+        Args:
+            q_ids (List): Ids of the qubits of the group.
+            path (String): Directory of the checkpoint.
+            offset (int): Position of the first amplitude of the group.
+            size (int): Amount of amplitudes of the group.
+            dtype (String): Dtype of the state vector of the group.
+        """
+        group = QubitThread(q_ids[0])
+        group.set_state(q_ids, load_amplitudes(path, offset, size, dtype))
+        for q_id in q_ids:
+            self.groups[q_id] = group
+        logging.debug("Restored qubits %r.", q_ids)
+
+    def give_statevectors_of_namespace(self, namespace, channel):
+        """
+        Sends the Qubit IDs and state vectors of all qubit groups of one
+        EQSN object over a channel.
+
+        Args:
+            namespace (int): Namespace of the EQSN object.
+            channel (Queue): Channel to return the list of states to.
+        """
+        groups = self._groups_for_ids(self._namespace_ids(namespace))
+        temp_queue = Queue()
+        for group in groups:
+            self.dispatch(group, [GIVE_STATEVECTOR, temp_queue])
+        channel.put([temp_queue.get() for _ in groups])
+
+    def barrier(self, namespace, q_ids, channel):
+        """
+        Signals over a channel that all commands for the given qubits, which
+        have been received before, are executed. Commands are executed in
+        the order they are received, so the barrier is passed immediately.
+
+        Args:
+            namespace (int): Namespace of the EQSN object.
+            q_ids (List): Ids of the qubits, None for all qubits of the
+                namespace.
+            channel (Queue): Channel to signal that the barrier is passed.
+        """
+        if q_ids is None:
+            q_ids = self._namespace_ids(namespace)
+        channel.put(len(self._groups_for_ids(q_ids)))
+
+    def define_circuit(self, namespace, name, ops):
+        """
+        Compiles a circuit and caches it for later runs.
+
+        Args:
+            namespace (int): Namespace of the EQSN object.
+            name (String): Name of the circuit.
+            ops (List): Operations of the circuit on formal qubits.
+        """
+        self.circuits[(namespace, name)] = compile_circuit(ops)
+
+    def run_circuit(self, namespace, name, qubit_map, channel):
+        """
+        Runs a cached circuit on the given qubits. All qubits are merged
+        into one group, which executes the whole circuit as one command.
+
+        Args:
+            namespace (int): Namespace of the EQSN object.
+            name (String): Name of the circuit.
+            qubit_map (Dict): Qubit id for every formal qubit of the circuit.
+            channel (Queue): Channel to transmit the measurement results to,
+                None if the circuit does not measure.
+        """
+        steps = self.circuits[(namespace, name)]
+        q_ids = list(qubit_map.values())
+        for q_id in q_ids[1:]:
+            self.merge_qubits(q_id, q_ids[0])
+        group = self.groups[q_ids[0]]
+        bound = [[command, mat] + [qubit_map[f] for f in formals]
+                 for command, mat, formals in steps]
+        if channel is None:
+            self.dispatch(group, [RUN_CIRCUIT, bound, None])
+            return
+        temp_queue = Queue()
+        self.dispatch(group, [RUN_CIRCUIT, bound, temp_queue])
+        results = temp_queue.get()
+        for q_id in results:
+            del self.groups[q_id]
+        channel.put(results)
+
     def measure(self, q_id, channel):
         """
         Perform a destructive measurement on qubit with the id.
@@ -85,11 +322,82 @@ class WorkerProcess(object):
             channel(Queue): Channel to transmit measurement result to.
         """
         temp_queue = Queue()
-        q = self.shared_dict.get_queues_for_ids([q_id])[0]
-        q.put([MEASURE, q_id, temp_queue])
+        self.dispatch(self.groups[q_id], [MEASURE, q_id, temp_queue])
+        res = temp_queue.get()
+        channel.put(res)
+        del self.groups[q_id]
+
+    def reset_qubit(self, q_id, channel, backend=None):
+        """
+        Measures a qubit and replaces it with a new qubit in the state |0>
+        under the same id.
+
+        Args:
+            q_id(String): ID of the Qubit to reset.
+            channel(Queue): Channel to transmit measurement result to.
+            backend (Tuple): Backend of the new qubit, see new_qubit.
+        """
+        temp_queue = Queue()
+        self.dispatch(self.groups[q_id], [MEASURE, q_id, temp_queue])
         res = temp_queue.get()
+        self.new_qubit(q_id, backend)
         channel.put(res)
-        self.shared_dict.delete_id_and_check_to_join_thread(q_id)
+
+    def measure_basis(self, gate, q_ids, channel, non_destructive):
+        """
+        Measures some qubits in another basis and sends all results in one
+        reply.
+
+        Args:
+            gate(np.ndarray): Unitary which maps the states of the basis to
+                the computational basis states.
+            q_ids(List): Ids of the measured qubits.
+            channel(Queue): Channel to transmit the list of results to.
+            non_destructive(bool): If the qubits stay in the system.
+        """
+        for q_id in q_ids[1:]:
+            self.merge_qubits(q_id, q_ids[0])
+        temp_queue = Queue()
+        self.dispatch(self.groups[q_ids[0]],
+                      [MEASURE_BASIS, gate, q_ids, temp_queue, non_destructive])
+        results = temp_queue.get()
+        if not non_destructive:
+            for q_id in q_ids:
+                del self.groups[q_id]
+        channel.put(results)
+
+    def measure_ref(self, q_id, key, non_destructive):
+        """
+        Measures a qubit and keeps the result in the process, so that later
+        gates can be controlled by it without a round trip to EQSN.
+
+        Args:
+            q_id(String): ID of the Qubit to measure.
+            key(Tuple): Namespace and number of the measurement.
+            non_destructive(bool): If the qubit stays in the system.
+        """
+        temp_queue = Queue()
+        if non_destructive:
+            self.dispatch(self.groups[q_id],
+                          [MEASURE_NON_DESTRUCTIVE, q_id, temp_queue])
+        else:
+            self.dispatch(self.groups[q_id], [MEASURE, q_id, temp_queue])
+            del self.groups[q_id]
+        self.results[key] = temp_queue.get()
+
+    def apply_if(self, gate, q_id, key, value):
+        """
+        Applies a gate to a qubit if a kept measurement result has a value.
+
+        Args:
+            gate(np.ndarray): 2x2 unitary matrix, or a stack of them.
+            q_id(String): Qubit on which the gate should be applied to.
+            key(Tuple): Namespace and number of the measurement.
+            value(int): The result for which the gate is applied.
+        """
+        gate = conditional_gate(gate, self.results[key], value)
+        if gate is not None:
+            self.dispatch(self.groups[q_id], [SINGLE_GATE, gate, q_id])
 
     def measure_non_destructive(self, q_id, channel):
         """
@@ -99,33 +407,100 @@ class WorkerProcess(object):
             q_id(String): ID of the Qubit to measure.
             channel(Queue): Channel to transmit measurement result to.
         """
-        q = self.shared_dict.get_queues_for_ids([q_id])[0]
-        q.put([MEASURE_NON_DESTRUCTIVE, q_id, channel])
+        self.dispatch(self.groups[q_id], [MEASURE_NON_DESTRUCTIVE, q_id, channel])
 
     def add_merged_qubits_to_thread(self, q_id, qubits):
         """
         Add new Qubits from a merge to the dictionary.
         """
-        q, t = self.shared_dict.get_queues_and_threads_for_ids([q_id])[0]
+        group = self.groups[q_id]
         for qubit in qubits:
-            self.shared_dict.set_thread_with_id(qubit, t, q)
+            self.groups[qubit] = group
 
     def stop_all(self):
         """
         Stops the simulator from running.
         """
-        self.shared_dict.send_all_threads(None)
-        self.shared_dict.stop_all_threads()
-        self.shared_dict.stop_shared_dict()
+        self.groups = {}
+
+    def reset(self, channel):
+        """
+        Stops all Qubits and clears the dictionary, so that the process can
+        be reused by a new EQSN object.
+
+        Args:
+            channel (Queue): Channel to signal that the reset is done.
+        """
+        self.stop_all()
+        self.circuits = {}
+        self.results = {}
+        self.tracer = Tracer()
+        channel.put(True)
+
+    def stop_namespace(self, namespace, channel):
+        """
+        Stops all Qubits of one EQSN object. Qubit ids are tuples of the
+        namespace of their EQSN object and the id given by the user.
+
+        Args:
+            namespace (int): Namespace of the EQSN object.
+            channel (Queue): Channel to signal that all Qubits are stopped.
+        """
+        q_ids = self._namespace_ids(namespace)
+        for q_id in q_ids:
+            del self.groups[q_id]
+        self.circuits = {key: steps for key, steps in self.circuits.items()
+                         if key[0] != namespace}
+        self.results = {key: result for key, result in self.results.items()
+                        if key[0] != namespace}
+        self.tracer.reset(namespace)
+        channel.put(len(q_ids))
 
     def apply_two_qubit_controlled_gate(self, gate, q_id1, q_id2, q_id3):
-        # Qubits are already mergered, they have the same queue
-        q = self.shared_dict.get_queues_for_ids([q_id1])[0]
-        q.put([CONTROLLED_TWO_GATE, gate, q_id1, q_id2, q_id3])
+        """
+        Applies a two qubit gate, controlled by a third qubit, to a group.
+
+        Args:
+            gate(np.ndarray): 4x4 unitary matrix
+            q_id1(String): Control qubit id.
+            q_id2(String): First target qubit id.
+            q_id3(String): Second target qubit id.
+        """
+        self.merge_qubits(q_id1, q_id2)
+        self.merge_qubits(q_id1, q_id3)
+        self.dispatch(self.groups[q_id1],
+                      [CONTROLLED_TWO_GATE, gate, q_id1, q_id2, q_id3])
+
+    def apply_multi_controlled_gate(self, gate, controls, targets):
+        """
+        Applies a gate to some qubits, controlled by several qubits.
+
+        Args:
+            gate(np.ndarray): 2^k x 2^k unitary matrix for k targets.
+            controls(List): Ids of the control qubits.
+            targets(List): Ids of the target qubits.
+        """
+        q_ids = controls + targets
+        for q_id in q_ids[1:]:
+            self.merge_qubits(q_id, q_ids[0])
+        self.dispatch(self.groups[q_ids[0]],
+                      [MULTI_CONTROLLED_GATE, gate, controls, targets])
+
+    def apply_k_qubit_gate(self, gate, q_ids):
+        """
+        Applies a gate on any amount of qubits to a group.
+
+        Args:
+            gate(np.ndarray): 2^k x 2^k unitary matrix.
+            q_ids(List): Ids of the k qubits.
+        """
+        for q_id in q_ids[1:]:
+            self.merge_qubits(q_id, q_ids[0])
+        self.dispatch(self.groups[q_ids[0]], [K_QUBIT_GATE, gate, q_ids])
 
     def apply_two_qubit_gate(self, gate, q_id1, q_id2):
         """
-        Applies a two qubit gate to a thread.
+        Applies a two qubit gate to a group.
 
         Args:
             gate(np.ndarray): 4x4 unitary matrix
@@ -133,8 +508,7 @@ class WorkerProcess(object):
             q_id2(String): Second qubit id.
         """
         self.merge_qubits(q_id1, q_id2)
-        q = self.shared_dict.get_queues_for_ids([q_id1])[0]
-        q.put([DOUBLE_GATE, gate, q_id1, q_id2])
+        self.dispatch(self.groups[q_id1], [DOUBLE_GATE, gate, q_id1, q_id2])
 
     def apply_single_gate(self, gate, q_id):
         """
@@ -144,19 +518,59 @@ class WorkerProcess(object):
             gate (np.array): 2x2 unitary array.
             id (String): Qubit on which the gate should be applied to.
         """
-        q = self.shared_dict.get_queues_for_ids([q_id])[0]
-        q.put([SINGLE_GATE, gate, q_id])
+        self.dispatch(self.groups[q_id], [SINGLE_GATE, gate, q_id])
+
+    def apply_channel(self, kraus, q_id):
+        """
+        Applies a noise channel to a qubit.
 
-    def give_statevector_for(self, q_id, channel):
+        Args:
+            kraus (np.ndarray): Kraus operators of the channel.
+            q_id (String): Qubit on which the channel is applied.
+        """
+        self.dispatch(self.groups[q_id], [APPLY_CHANNEL, kraus, q_id])
+
+    def give_statevector_for(self, q_id, channel, indices=None, shm_name=None):
         """
         Sends the Qubit IDs and their state vectors over a channel.
 
         Args:
             q_id(String): ID of the Qubit of the state vector to be returned.
             channel(Queue): Channel to return the requested data to.
+            indices(List): Indices of the amplitudes to send, None for all.
+            shm_name(String): Name of a shared memory block to write the
+                amplitudes to, None to send them over the channel.
         """
-        q = self.shared_dict.get_queues_for_ids([q_id])[0]
-        q.put([GIVE_STATEVECTOR, channel])
+        self.dispatch(self.groups[q_id],
+                      [GIVE_STATEVECTOR, channel, indices, shm_name])
+
+    def give_reduced_states(self, command, q_ids, channel, args=None):
+        """
+        Asks all groups of the given qubits for a reduced state, like the
+        marginal probabilities or the reduced density matrix, of their qubits
+        and sends the list of answers over a channel.
+
+        Args:
+            command(int): The command to execute on the groups.
+            q_ids(List): List of Qubit ids.
+            channel(Queue): Channel to return the requested data to.
+            args(List): Optional argument for every qubit, e.g. the Pauli
+                operator of an expectation value.
+        """
+        groups = {}
+        for i, q_id in enumerate(q_ids):
+            group = self.groups[q_id]
+            _, ids, group_args = groups.setdefault(id(group), (group, [], []))
+            ids.append(q_id)
+            if args is not None:
+                group_args.append(args[i])
+        temp_queue = Queue()
+        for group, ids, group_args in groups.values():
+            if args is None:
+                self.dispatch(group, [command, ids, temp_queue])
+            else:
+                self.dispatch(group, [command, ids, temp_queue, group_args])
+        channel.put([temp_queue.get() for _ in groups])
 
     def apply_controlled_gate(self, gate, q_id1, q_id2):
         """
@@ -168,17 +582,15 @@ class WorkerProcess(object):
             q_id2 (String): Id of the Qubit which controls the gate.
         """
         self.merge_qubits(q_id1, q_id2)
-        q = self.shared_dict.get_queues_for_ids([q_id1])[0]
-        q.put([CONTROLLED_GATE, gate, q_id1, q_id2])
+        self.dispatch(self.groups[q_id1], [CONTROLLED_GATE, gate, q_id1, q_id2])
 
     def merge_send(self, q_id, queue, queue2):
         temp_queue = Queue()
-        q = self.shared_dict.get_queues_for_ids([q_id])[0]
-        q.put([MERGE_SEND, queue, temp_queue])
+        self.dispatch(self.groups[q_id], [MERGE_SEND, queue, temp_queue])
         qubits = temp_queue.get()
         # remove all qubits
         for c in qubits:
-            self.shared_dict.delete_id_and_check_to_join_thread(c)
+            del self.groups[c]
         # send the qubits to the main process
         queue2.put(qubits)
 
@@ -190,8 +602,7 @@ class WorkerProcess(object):
             q_id (String): ID of the qubit which should accept the merge.
             queue (Queue): channel to receive qubit ids and statevectors from.
         """
-        q = self.shared_dict.get_queues_for_ids([q_id])[0]
-        q.put([MERGE_ACCEPT, queue])
+        self.dispatch(self.groups[q_id], [MERGE_ACCEPT, queue])
 
     def merge_qubits(self, q_id1, q_id2):
         """
@@ -202,17 +613,17 @@ class WorkerProcess(object):
             q_id1 (String): Id of the Qubit merged into q_id2.
             q_id2 (String): Id of the Qubit merged with q_id1.
         """
-        l = self.shared_dict.get_queues_for_ids([q_id1, q_id2])
+        l = self._groups_for_ids([q_id1, q_id2])
         if len(l) == 1:
             return  # Already merged
         else:
             logging.debug("Merge Qubits %s and %s.", q_id1, q_id2)
-            q1 = l[0]
-            q2 = l[1]
+            group1 = l[0]
+            group2 = l[1]
             merge_q = Queue()
             qubits_q = Queue()
-            q1.put([MERGE_SEND, merge_q, qubits_q])
-            q2.put([MERGE_ACCEPT, merge_q])
+            self.dispatch(group1, [MERGE_SEND, merge_q, qubits_q])
+            self.dispatch(group2, [MERGE_ACCEPT, merge_q])
             qubits = qubits_q.get()
-            self.shared_dict.change_thread_and_queue_of_ids_and_join(
-                qubits, q_id2)
+            for q_id in qubits:
+                self.groups[q_id] = group2
@@ -0,0 +1,62 @@
+from eqsn import EQSN, WorkerPool, QueueFullError
+
+
+def test_block():
+    pool = WorkerPool(1, max_pending=5)
+    q_sim = EQSN(pool=pool)
+    q_sim.new_qubit('1')
+    for _ in range(201):
+        q_sim.X_gate('1')
+        assert pool.queue_depths()[0]['pending'] <= 5
+    assert q_sim.measure('1') == 1
+    assert pool.queue_depths()[0]['pending'] == 0
+    assert pool.dropped == 0
+    q_sim.stop_all()
+
+
+def test_drop():
+    pool = WorkerPool(1, max_pending=1, backpressure='drop')
+    q_sim = EQSN(pool=pool)
+    q_sim.new_qubit('1')
+    for _ in range(200):
+        q_sim.X_gate('1')
+    applied = 200 - pool.dropped
+    assert q_sim.measure('1') == applied % 2
+    q_sim.stop_all()
+
+
+def test_raise():
+    pool = WorkerPool(1, max_pending=1, backpressure='raise')
+    q_sim = EQSN(pool=pool)
+    q_sim.new_qubit('1')
+    applied = 0
+    for _ in range(200):
+        try:
+            q_sim.X_gate('1')
+            applied += 1
+        except QueueFullError:
+            pass
+    assert q_sim.measure('1') == applied % 2
+    q_sim.stop_all()
+
+
+def test_unbounded_depths():
+    pool = WorkerPool(2)
+    q_sim = EQSN(pool=pool)
+    q_sim.new_qubit('1')
+    q_sim.new_qubit('2')
+    q_sim.H_gate('1')
+    q_sim.cnot_gate('2', '1')
+    q_sim.measure('1', non_destructive=True)
+    depths = pool.queue_depths()
+    assert len(depths) == 2
+    assert all(d['pending'] == 0 for d in depths)
+    q_sim.stop_all()
+
+
+if __name__ == "__main__":
+    test_block()
+    test_drop()
+    test_raise()
+    test_unbounded_depths()
+    exit(0)
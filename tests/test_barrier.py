@@ -0,0 +1,37 @@
+from eqsn import EQSN, WorkerPool
+
+
+def test_barrier():
+    pool = WorkerPool(2, max_pending=1000)
+    q_sim = EQSN(pool=pool)
+    q_sim.new_qubit('1')
+    q_sim.new_qubit('2')
+    for _ in range(500):
+        q_sim.X_gate('1')
+        q_sim.X_gate('2')
+    q_sim.barrier(['1'])
+    assert pool.windows[q_sim.shared_dict.get_queues_for_ids(['1'])[0]].depth() == 0
+    q_sim.barrier()
+    assert all(d['pending'] == 0 for d in pool.queue_depths())
+    assert q_sim.measure('1') == 0
+    assert q_sim.measure('2') == 0
+    q_sim.stop_all()
+
+
+def test_flush_merged():
+    q_sim = EQSN()
+    q_sim.new_qubit('1')
+    q_sim.new_qubit('2')
+    q_sim.H_gate('1')
+    q_sim.cnot_gate('2', '1')
+    q_sim.flush()
+    q_sim.barrier(['1', '2'])
+    assert q_sim.measure('1') == q_sim.measure('2')
+    q_sim.flush()
+    q_sim.stop_all()
+
+
+if __name__ == "__main__":
+    test_barrier()
+    test_flush_merged()
+    exit(0)
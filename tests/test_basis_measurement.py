@@ -0,0 +1,86 @@
+import numpy as np
+
+from eqsn import EQSN
+from eqsn.circuits import basis_change
+
+
+def bell_pair(q_sim, q_id1, q_id2, bits):
+    q_sim.new_qubit(q_id1)
+    q_sim.new_qubit(q_id2)
+    if bits[1]:
+        q_sim.X_gate(q_id2)
+    q_sim.H_gate(q_id1)
+    q_sim.cnot_gate(q_id2, q_id1)
+    if bits[0]:
+        q_sim.Z_gate(q_id1)
+
+
+def test_basis_change():
+    assert basis_change('Z') is None
+    plus_i = np.array([1, 1j]) / 2 ** 0.5
+    assert np.allclose(basis_change('Y').dot(plus_i), [1, 0], atol=1e-6)
+    basis = np.array([[0, 1], [1, 0]])
+    assert np.allclose(basis_change(basis), basis)
+    try:
+        basis_change(np.ones((2, 2)))
+        assert False
+    except ValueError:
+        pass
+
+
+def test_single_qubit_basis():
+    q_sim = EQSN()
+    q_sim.new_qubit('x')
+    q_sim.H_gate('x')
+    q_sim.new_qubit('y')
+    q_sim.H_gate('y')
+    q_sim.S_gate('y')
+    q_sim.new_qubit('m')
+    q_sim.X_gate('m')
+    assert q_sim.measure('x', basis='X') == 0
+    assert q_sim.measure('y', basis='Y') == 0
+    assert q_sim.measure('m', basis=np.array([[0, 1], [1, 0]])) == 0
+    q_sim.stop_all()
+
+
+def test_bell_measure():
+    for bits in ((0, 0), (0, 1), (1, 0), (1, 1)):
+        q_sim = EQSN()
+        bell_pair(q_sim, 'a', 'b', bits)
+        q_sim.new_qubit('c')
+        q_sim.merge_qubits('c', 'a')
+        assert q_sim.bell_measure('a', 'b') == bits
+        assert q_sim.measure('c') == 0
+        q_sim.stop_all()
+
+
+def test_non_destructive():
+    q_sim = EQSN()
+    q_sim.new_qubit('a')
+    q_sim.new_qubit('b')
+    bits = q_sim.bell_measure('a', 'b', non_destructive=True)
+    assert q_sim.bell_measure('a', 'b') == bits
+    q_sim.stop_all()
+
+
+def test_entanglement_swapping():
+    for backend in ('statevector', 'mps'):
+        q_sim = EQSN(backend=backend)
+        bell_pair(q_sim, 'a', 'b1', (0, 0))
+        bell_pair(q_sim, 'b2', 'c', (0, 0))
+        bits = q_sim.bell_measure('b1', 'b2')
+        if bits[1]:
+            q_sim.X_gate('c')
+        if bits[0]:
+            q_sim.Z_gate('a')
+        assert q_sim.bell_measure('a', 'c') == (0, 0)
+        q_sim.stop_all()
+
+
+if __name__ == "__main__":
+    test_basis_change()
+    test_single_qubit_basis()
+    test_bell_measure()
+    test_non_destructive()
+    test_entanglement_swapping()
+    exit(0)
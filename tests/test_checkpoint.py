@@ -0,0 +1,61 @@
+import os
+import shutil
+import tempfile
+
+from eqsn import EQSN
+from eqsn.checkpoint import AMPLITUDES_FILE, write_checkpoint, \
+    read_checkpoint_index, load_amplitudes
+import numpy as np
+
+
+def test_checkpoint_and_restore():
+    path = tempfile.mkdtemp()
+    q_sim = EQSN()
+    q_sim.new_qubit('1')
+    q_sim.new_qubit('2')
+    q_sim.new_qubit('3')
+    q_sim.H_gate('1')
+    q_sim.cnot_gate('2', '1')
+    q_sim.X_gate('3')
+    _, vector = q_sim.give_statevector_for('1')
+    q_sim.checkpoint(path)
+    q_sim.stop_all()
+
+    q_sim = EQSN()
+    q_sim.restore(path)
+    qubits, restored = q_sim.give_statevector_for('1')
+    assert sorted(qubits) == ['1', '2']
+    assert restored.dtype == vector.dtype
+    assert np.allclose(vector, restored)
+    q_sim.H_gate('2')
+    q_sim.H_gate('1')
+    assert q_sim.measure('1') == q_sim.measure('2')
+    assert q_sim.measure('3') == 1
+    q_sim.stop_all()
+    shutil.rmtree(path)
+
+
+def test_checkpoint_keeps_dtype():
+    path = tempfile.mkdtemp()
+    vector = np.array([0, 1j, 0, 0], dtype=np.csingle)
+    write_checkpoint(path, [(['1', '2'], vector)])
+    assert np.load(os.path.join(path, AMPLITUDES_FILE)).dtype == np.csingle
+    group = read_checkpoint_index(path)[0]
+    restored = load_amplitudes(path, group['offset'], group['size'],
+                               group['dtype'])
+    assert restored.dtype == np.csingle
+    assert np.array_equal(restored, vector)
+
+    wide = np.array([1, 0], dtype=np.complex128)
+    write_checkpoint(path, [(['1', '2'], vector), (['3'], wide)])
+    groups = read_checkpoint_index(path)
+    dtypes = [load_amplitudes(path, g['offset'], g['size'], g['dtype']).dtype
+              for g in groups]
+    assert dtypes == [np.csingle, np.complex128]
+    shutil.rmtree(path)
+
+
+if __name__ == "__main__":
+    test_checkpoint_and_restore()
+    test_checkpoint_keeps_dtype()
+    exit(0)
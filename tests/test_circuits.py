@@ -0,0 +1,76 @@
+import numpy as np
+
+from eqsn import EQSN
+from eqsn.circuits import compile_circuit
+from eqsn.qubit_thread import SINGLE_GATE, DOUBLE_GATE, MEASURE
+
+
+def test_compile_fusion():
+    steps = compile_circuit([('H', 'a'), ('T', 'a'), ('X', 'b'),
+                             ('cnot', 'b', 'a'), ('Z', 'b'),
+                             ('cphase', 'a', 'b'), ('H', 'c'),
+                             ('measure', 'a')])
+    assert [step[0] for step in steps] == [DOUBLE_GATE, MEASURE, SINGLE_GATE]
+    assert steps[0][1].dtype == np.csingle
+    assert steps[0][2] == ['a', 'b']
+
+
+def test_bell_pair():
+    q_sim = EQSN()
+    q_sim.define_circuit('bell', [('H', 'a'), ('cnot', 'b', 'a')])
+    for i in range(5):
+        a = 'a%d' % i
+        b = 'b%d' % i
+        q_sim.new_qubit(a)
+        q_sim.new_qubit(b)
+        assert q_sim.run('bell', {'a': a, 'b': b}) is None
+        qubits, vector = q_sim.give_statevector_for(a)
+        assert sorted(qubits) == [a, b]
+        assert np.allclose(np.abs(vector) ** 2, [0.5, 0, 0, 0.5], atol=1e-6)
+        assert q_sim.measure(a) == q_sim.measure(b)
+    q_sim.stop_all()
+
+
+def test_teleportation():
+    q_sim = EQSN()
+    q_sim.define_circuit('teleport', [('H', 'a'), ('cnot', 'b', 'a'),
+                                      ('cnot', 'a', 'q'), ('H', 'q'),
+                                      ('measure', 'q'), ('measure', 'a')])
+    for i in range(5):
+        ids = ['q%d' % i, 'a%d' % i, 'b%d' % i]
+        for q_id in ids:
+            q_sim.new_qubit(q_id)
+        q_sim.X_gate(ids[0])
+        results = q_sim.run('teleport', {'q': ids[0], 'a': ids[1], 'b': ids[2]})
+        assert sorted(results) == ['a', 'q']
+        assert q_sim.shared_dict.get_ids() == [ids[2]]
+        if results['a'] == 1:
+            q_sim.X_gate(ids[2])
+        if results['q'] == 1:
+            q_sim.Z_gate(ids[2])
+        assert q_sim.measure(ids[2]) == 1
+    q_sim.stop_all()
+
+
+def test_unknown_circuit():
+    q_sim = EQSN()
+    q_sim.new_qubit('1')
+    try:
+        q_sim.run('unknown', {'a': '1'})
+        assert False
+    except ValueError:
+        pass
+    try:
+        q_sim.define_circuit('reuse', [('measure', 'a'), ('X', 'a')])
+        assert False
+    except ValueError:
+        pass
+    q_sim.stop_all()
+
+
+if __name__ == "__main__":
+    test_compile_fusion()
+    test_bell_pair()
+    test_teleportation()
+    test_unknown_circuit()
+    exit(0)
@@ -0,0 +1,107 @@
+from queue import Queue
+
+import numpy as np
+
+from eqsn import EQSN, WorkerPool
+from eqsn.qubit_thread import NEW_QUBIT, MEASURE_REF, GIVE_RESULT, \
+    RELEASE_RESULT
+from eqsn.worker_process import WorkerProcess
+
+
+def teleport(q_sim, q, a, b):
+    q_sim.H_gate(a)
+    q_sim.cnot_gate(b, a)
+    q_sim.cnot_gate(a, q)
+    q_sim.H_gate(q)
+    ref_q = q_sim.measure_ref(q)
+    ref_a = q_sim.measure_ref(a)
+    q_sim.apply_if(ref_a, 'X', b)
+    q_sim.apply_if(ref_q, 'Z', b)
+    return ref_q, ref_a
+
+
+def test_teleportation():
+    q_sim = EQSN()
+    for i in range(10):
+        q, a, b = 'q%d' % i, 'a%d' % i, 'b%d' % i
+        for q_id in (q, a, b):
+            q_sim.new_qubit(q_id)
+        q_sim.X_gate(q)
+        ref_q, ref_a = teleport(q_sim, q, a, b)
+        assert q_sim.result(ref_q) in (0, 1)
+        assert q_sim.result(ref_a) in (0, 1)
+        assert q_sim.measure(b) == 1
+    q_sim.stop_all()
+
+
+def test_other_worker():
+    q_sim = EQSN(pool=WorkerPool(2))
+    q_sim.new_qubit('1')
+    q_sim.new_qubit('2')
+    q_sim.X_gate('1')
+    ref = q_sim.measure_ref('1')
+    # Qubit 2 lives on the other worker process
+    q_sim.apply_if(ref, 'X', '2')
+    q_sim.apply_if(ref, 'X', '2', value=0)
+    assert q_sim.measure('2') == 1
+    q_sim.stop_all()
+
+
+def test_ensemble():
+    batch = 100
+    q_sim = EQSN(backend='ensemble', batch=batch)
+    q_sim.new_qubit('1')
+    q_sim.new_qubit('2')
+    q_sim.H_gate('1')
+    q_sim.cnot_gate('2', '1')
+    ref = q_sim.measure_ref('1')
+    q_sim.apply_if(ref, 'X', '2')
+    assert np.all(q_sim.measure('2') == 0)
+    assert q_sim.result(ref).shape == (batch,)
+    q_sim.stop_all()
+
+
+def test_results_do_not_grow():
+    worker = WorkerProcess(Queue())
+    channel = Queue()
+    for i in range(100):
+        worker.execute([NEW_QUBIT, i, None])
+        worker.execute([MEASURE_REF, i, (0, i), False])
+        if i % 2:
+            worker.execute([GIVE_RESULT, (0, i), channel])
+            assert channel.get() == 0
+        else:
+            worker.execute([RELEASE_RESULT, (0, i)])
+    assert worker.results == {}
+    assert worker.groups == {}
+
+
+def test_release():
+    q_sim = EQSN()
+    q_sim.new_qubit('1')
+    q_sim.new_qubit('2')
+    q_sim.X_gate('1')
+    ref = q_sim.measure_ref('1')
+    assert q_sim.result(ref) == 1
+    # The result is kept by the handle after it has been fetched
+    assert q_sim.result(ref) == 1
+    q_sim.apply_if(ref, 'X', '2')
+    q_sim.release(ref)
+    assert q_sim.result(ref) == 1
+    ref = q_sim.measure_ref('2')
+    q_sim.release(ref)
+    try:
+        q_sim.result(ref)
+        assert False
+    except ValueError:
+        pass
+    q_sim.stop_all()
+
+
+if __name__ == "__main__":
+    test_teleportation()
+    test_other_worker()
+    test_ensemble()
+    test_results_do_not_grow()
+    test_release()
+    exit(0)
@@ -0,0 +1,71 @@
+import numpy as np
+
+from eqsn import EQSN
+from eqsn.ensemble_state import EnsembleState
+
+H = (1 / 2.0) ** 0.5 * np.array([[1, 1], [1, -1]], dtype=np.csingle)
+X = np.array([[0, 1], [1, 0]], dtype=np.csingle)
+
+
+def test_ensemble_state():
+    state = EnsembleState.zero(3).kron(EnsembleState.zero(3))
+    state.apply_gate(H, [1])
+    stack = np.array([np.eye(2), X, H], dtype=np.csingle)
+    state.apply_gate(stack, [0])
+    vectors = state.to_dense()
+    assert vectors.shape == (3, 4)
+    assert np.allclose(np.abs(vectors[0]) ** 2, [0.5, 0.5, 0, 0], atol=1e-6)
+    assert np.allclose(np.abs(vectors[1]) ** 2, [0, 0, 0.5, 0.5], atol=1e-6)
+    assert np.allclose(state.probability_one(0), [0, 1, 0.5], atol=1e-6)
+    state.collapse(0, np.array([0, 1, 1]), remove=True)
+    assert state.n == 1
+    assert np.allclose(np.abs(state.to_dense()) ** 2, 0.5, atol=1e-6)
+
+
+def test_rotation_sweep():
+    batch = 200
+    angles = np.linspace(0, np.pi, batch)
+    q_sim = EQSN(backend='ensemble', batch=batch)
+    q_sim.new_qubit('1')
+    q_sim.new_qubit('2')
+    q_sim.RY_gate('1', angles)
+    q_sim.cnot_gate('2', '1')
+    assert np.allclose(q_sim.expectation('Z', ['1']), np.cos(angles), atol=1e-5)
+    assert np.allclose(q_sim.expectation('ZZ', ['1', '2']), 1, atol=1e-5)
+    qubits, vectors = q_sim.give_statevector_for('1')
+    assert vectors.shape == (batch, 4)
+    results = q_sim.measure('1')
+    assert results.shape == (batch,)
+    assert results[0] == 0 and results[-1] == 1
+    assert np.array_equal(q_sim.measure('2'), results)
+    q_sim.stop_all()
+
+
+def test_ensemble_noise():
+    batch = 2000
+    q_sim = EQSN(backend='ensemble', batch=batch)
+    q_sim.new_qubit('1')
+    q_sim.X_gate('1')
+    q_sim.amplitude_damp('1', 0.3)
+    results = q_sim.measure('1')
+    assert abs(np.mean(results) - 0.7) < 0.05
+    q_sim.stop_all()
+
+
+def test_stacks_need_ensemble():
+    q_sim = EQSN()
+    q_sim.new_qubit('1')
+    try:
+        q_sim.RX_gate('1', np.zeros(4))
+        assert False
+    except ValueError:
+        pass
+    q_sim.stop_all()
+
+
+if __name__ == "__main__":
+    test_ensemble_state()
+    test_rotation_sweep()
+    test_ensemble_noise()
+    test_stacks_need_ensemble()
+    exit(0)
@@ -0,0 +1,37 @@
+from eqsn import EQSN
+import numpy as np
+
+
+def test_single_qubit_expectation():
+    q_sim = EQSN()
+    q_sim.new_qubit('1')
+    assert np.isclose(q_sim.expectation('Z', ['1']), 1, atol=1e-6)
+    q_sim.H_gate('1')
+    assert np.isclose(q_sim.expectation('X', ['1']), 1, atol=1e-6)
+    assert np.isclose(q_sim.expectation('Z', ['1']), 0, atol=1e-6)
+    q_sim.S_gate('1')
+    assert np.isclose(q_sim.expectation('Y', ['1']), 1, atol=1e-6)
+    q_sim.stop_all()
+
+
+def test_two_qubit_expectation():
+    q_sim = EQSN()
+    q_sim.new_qubit('1')
+    q_sim.new_qubit('2')
+    q_sim.new_qubit('3')
+    q_sim.H_gate('1')
+    q_sim.cnot_gate('2', '1')
+    q_sim.X_gate('3')
+    assert np.isclose(q_sim.expectation('ZZ', ['1', '2']), 1, atol=1e-6)
+    assert np.isclose(q_sim.expectation('XX', ['1', '2']), 1, atol=1e-6)
+    assert np.isclose(q_sim.expectation('YY', ['1', '2']), -1, atol=1e-6)
+    assert np.isclose(q_sim.expectation('ZI', ['1', '2']), 0, atol=1e-6)
+    assert np.isclose(q_sim.expectation('ZZZ', ['1', '2', '3']), -1, atol=1e-6)
+    assert np.isclose(q_sim.expectation('II', ['1', '3']), 1, atol=1e-6)
+    q_sim.stop_all()
+
+
+if __name__ == "__main__":
+    test_single_qubit_expectation()
+    test_two_qubit_expectation()
+    exit(0)
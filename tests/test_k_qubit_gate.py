@@ -0,0 +1,73 @@
+import numpy as np
+
+from eqsn import EQSN
+from eqsn.kernels import apply_gate
+
+
+def random_unitary(k):
+    mat = np.random.randn(2 ** k, 2 ** k) + 1j * np.random.randn(2 ** k, 2 ** k)
+    q, _ = np.linalg.qr(mat)
+    return q.astype(np.csingle)
+
+
+def dense_apply(vector, gate, positions, n):
+    order = positions + [p for p in range(n) if p not in positions]
+    tensor = np.transpose(vector.reshape((2,) * n), order).reshape(2 ** len(positions), -1)
+    tensor = gate.dot(tensor).reshape((2,) * n)
+    return np.transpose(tensor, np.argsort(order)).reshape(-1)
+
+
+def test_apply_gate():
+    n = 5
+    vector = np.random.randn(2 ** n) + 1j * np.random.randn(2 ** n)
+    vector = (vector / np.linalg.norm(vector)).astype(np.csingle)
+    for positions in ([3], [4, 0], [1, 4, 2]):
+        gate = random_unitary(len(positions))
+        expected = dense_apply(vector, gate, positions, n)
+        result = apply_gate(vector, gate, positions)
+        assert result.dtype == np.csingle
+        assert np.allclose(result, expected, atol=1e-5)
+
+
+def test_repetition_encoder():
+    # Maps |x00> to |xxx>, as a permutation of the basis states
+    encoder = np.zeros((8, 8), dtype=np.csingle)
+    for i in range(8):
+        x = i >> 2
+        encoder[i ^ (x << 1) ^ x, i] = 1
+    q_sim = EQSN()
+    for q_id in ['d', 'a1', 'a2', 'x']:
+        q_sim.new_qubit(q_id)
+    q_sim.X_gate('d')
+    q_sim.custom_k_qubit_gate(['d', 'a1', 'a2'], encoder)
+    assert [q_sim.measure(q_id) for q_id in ['a2', 'x', 'a1', 'd']] == [1, 0, 1, 1]
+    q_sim.stop_all()
+
+
+def test_random_gate():
+    gate = random_unitary(3)
+    q_sim = EQSN()
+    for q_id in ['1', '2', '3', '4']:
+        q_sim.new_qubit(q_id)
+    q_sim.H_gate('2')
+    q_sim.custom_k_qubit_gate(['4', '1', '2'], gate)
+    qubits, vector = q_sim.give_statevector_for('1')
+    assert sorted(qubits) == ['1', '2', '4']
+    expected = np.zeros(8, dtype=np.complex128)
+    expected[0] = expected[1 << (2 - qubits.index('2'))] = 2 ** -0.5
+    positions = [qubits.index(q_id) for q_id in ['4', '1', '2']]
+    expected = dense_apply(expected, gate, positions, 3)
+    assert np.allclose(vector, expected, atol=1e-5)
+    try:
+        q_sim.custom_k_qubit_gate(['1', '2'], gate)
+        assert False
+    except ValueError:
+        pass
+    q_sim.stop_all()
+
+
+if __name__ == "__main__":
+    test_apply_gate()
+    test_repetition_encoder()
+    test_random_gate()
+    exit(0)
@@ -0,0 +1,90 @@
+import numpy as np
+
+from eqsn import EQSN
+from eqsn.kernels import is_diagonal, is_permutation, apply_diagonal, \
+    apply_permutation
+from eqsn.sparse_state import controlled_matrix
+
+X = np.array([[0, 1], [1, 0]], dtype=np.csingle)
+Y = np.array([[0, -1j], [1j, 0]], dtype=np.csingle)
+Z = np.array([[1, 0], [0, -1]], dtype=np.csingle)
+H = (1 / 2.0) ** 0.5 * np.array([[1, 1], [1, -1]], dtype=np.csingle)
+SWAP = np.array([[1, 0, 0, 0], [0, 0, 1, 0], [0, 1, 0, 0], [0, 0, 0, 1]],
+                dtype=np.csingle)
+
+
+def dense_apply(vector, gate, positions, n):
+    k = len(positions)
+    tensor = np.moveaxis(vector.reshape((2,) * n), positions, range(k))
+    shape = tensor.shape
+    tensor = gate.dot(tensor.reshape((2 ** k, -1))).reshape(shape)
+    return np.moveaxis(tensor, range(k), positions).reshape(-1)
+
+
+def random_state(n):
+    vector = np.random.randn(2 ** n) + 1j * np.random.randn(2 ** n)
+    return (vector / np.linalg.norm(vector)).astype(np.csingle)
+
+
+def test_structure():
+    assert is_diagonal(Z)
+    assert is_diagonal(controlled_matrix(Z))
+    assert not is_diagonal(X)
+    assert is_permutation(X)
+    assert is_permutation(Y)
+    assert is_permutation(controlled_matrix(X))
+    assert is_permutation(SWAP)
+    assert not is_permutation(H)
+
+
+def test_apply_diagonal():
+    n = 5
+    vector = random_state(n)
+    phase = np.diag(np.exp(1j * np.arange(8))).astype(np.csingle)
+    for gate, positions in ((Z, [3]), (controlled_matrix(Z), [4, 1]),
+                            (phase, [2, 0, 4])):
+        expected = dense_apply(vector, gate, positions, n)
+        result = apply_diagonal(vector, np.diagonal(gate), positions)
+        assert result.dtype == np.csingle
+        assert np.allclose(result, expected, atol=1e-6)
+
+
+def test_apply_permutation():
+    n = 4
+    vector = random_state(n)
+    for gate, positions in ((X, [0]), (Y, [3]), (controlled_matrix(X), [2, 0]),
+                            (SWAP, [3, 1]), (controlled_matrix(SWAP), [1, 3, 0])):
+        expected = dense_apply(vector, gate, positions, n)
+        result = apply_permutation(vector, gate, positions)
+        assert np.allclose(result, expected, atol=1e-6)
+
+
+def test_phase_gates():
+    q_sim = EQSN()
+    q_sim.new_qubit('1')
+    q_sim.new_qubit('2')
+    q_sim.H_gate('1')
+    q_sim.H_gate('2')
+    q_sim.cphase_gate('2', '1')
+    q_sim.S_gate('1')
+    q_sim.T_gate('2')
+    q_sim.RZ_gate('1', 0.3)
+    qubits, vector = q_sim.give_statevector_for('1')
+    expected = np.full(4, 0.5, dtype=np.complex128)
+    expected[3] *= -1
+    expected = dense_apply(expected, np.diag([1, 1j]), [qubits.index('1')], 2)
+    expected = dense_apply(expected, np.diag([1, np.exp(1j * np.pi / 4)]),
+                           [qubits.index('2')], 2)
+    expected = dense_apply(expected, np.diag([np.exp(-0.15j), np.exp(0.15j)]),
+                           [qubits.index('1')], 2)
+    assert vector.dtype == np.csingle
+    assert np.allclose(vector, expected, atol=1e-6)
+    q_sim.stop_all()
+
+
+if __name__ == "__main__":
+    test_structure()
+    test_apply_diagonal()
+    test_apply_permutation()
+    test_phase_gates()
+    exit(0)
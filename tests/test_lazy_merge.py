@@ -0,0 +1,105 @@
+from queue import Queue
+
+import numpy as np
+
+from eqsn import EQSN, WorkerPool
+from eqsn.qubit_thread import QubitThread, MEASURE
+
+X = np.array([[0, 1], [1, 0]], dtype=np.csingle)
+H = (1 / 2.0) ** 0.5 * np.array([[1, 1], [1, -1]], dtype=np.csingle)
+
+
+def merge(thread, q_id):
+    channel = Queue()
+    channel.put([q_id])
+    channel.put(np.array([1, 0], dtype=np.csingle))
+    thread.merge_accept(channel)
+
+
+def statevector(thread):
+    channel = Queue()
+    thread.give_statevector(channel)
+    return channel.get()
+
+
+def test_deferred_factors():
+    thread = QubitThread('a')
+    for q_id in ['b', 'c', 'd']:
+        merge(thread, q_id)
+    assert thread.qubits == ['a']
+    assert len(thread.deferred) == 3
+    assert thread.all_qubits() == ['a', 'b', 'c', 'd']
+
+    # Single qubit gates stay in their factor
+    thread.apply_single_gate(X, 'c')
+    assert len(thread.deferred) == 3
+
+    # A controlled gate only multiplies the factors it needs
+    thread.apply_single_gate(H, 'a')
+    thread.apply_controlled_gate(X, 'b', 'a')
+    assert thread.qubits == ['a', 'b']
+    assert len(thread.deferred) == 2
+
+    qubits, vector = statevector(thread)
+    assert qubits == ['a', 'b', 'c', 'd']
+    expected = np.zeros(16)
+    expected[0b0010] = expected[0b1110] = 2 ** -0.5
+    assert np.allclose(vector, expected, atol=1e-6)
+
+
+def test_measure_last_active_qubit():
+    thread = QubitThread('a')
+    merge(thread, 'b')
+    thread.apply_single_gate(X, 'b')
+    channel = Queue()
+    stop = thread.execute([MEASURE, 'a', channel])
+    assert channel.get() == 0
+    assert not stop
+    assert thread.qubits == ['b']
+    thread.measure('b', channel)
+    assert channel.get() == 1
+
+
+def test_merge_deferred_threads():
+    # Qubits 1 and 3 are created on the first, 2 and 4 on the second worker
+    q_sim = EQSN(pool=WorkerPool(2))
+    for q_id in ['1', '2', '3', '4']:
+        q_sim.new_qubit(q_id)
+    q_sim.X_gate('4')
+    q_sim.merge_qubits('2', '1')
+    q_sim.merge_qubits('4', '3')
+    # Merges the thread of 3, with its deferred factor, into the thread of 1
+    q_sim.cnot_gate('3', '1')
+    qubits, vector = q_sim.give_statevector_for('1')
+    assert sorted(qubits) == ['1', '2', '3', '4']
+    assert abs(vector[2 ** (3 - qubits.index('4'))]) > 0.99
+    assert q_sim.measure('4') == 1
+    assert q_sim.measure('1') == 0
+    q_sim.stop_all()
+
+
+def test_deferred_factor_of_sparse_state():
+    q_sim = EQSN(pool=WorkerPool(2))
+    ids = ['q%d' % i for i in range(26)]
+    for q_id in ids:
+        q_sim.new_qubit(q_id)
+    # q1 is a deferred factor of the group of q0
+    q_sim.merge_qubits('q1', 'q0')
+    # A GHZ state of 13 qubits, which is stored sparse
+    q_sim.H_gate('q0')
+    for q_id in ids[2::2]:
+        q_sim.cnot_gate(q_id, 'q0')
+    q_sim.cnot_gate('q1', 'q0')
+    results = [q_sim.measure(q_id) for q_id in ids]
+    assert results[1] == results[0]
+    assert set(results[2::2]) == {results[0]}
+    assert set(results[3::2]) == {0}
+    q_sim.stop_all()
+
+
+if __name__ == "__main__":
+    test_deferred_factors()
+    test_measure_last_active_qubit()
+    test_merge_deferred_threads()
+    test_deferred_factor_of_sparse_state()
+    exit(0)
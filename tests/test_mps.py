@@ -0,0 +1,112 @@
+import numpy as np
+
+from eqsn import EQSN
+from eqsn.mps_state import MPSState
+from eqsn.sparse_state import controlled_matrix
+
+
+def random_unitary(k):
+    m = np.random.randn(2 ** k, 2 ** k) + 1j * np.random.randn(2 ** k, 2 ** k)
+    q, _ = np.linalg.qr(m)
+    return q.astype(np.csingle)
+
+
+def dense_apply(vector, gate, positions, n):
+    k = len(positions)
+    tensor = np.moveaxis(vector.reshape((2,) * n), positions, range(k))
+    shape = tensor.shape
+    tensor = gate.dot(tensor.reshape((2 ** k, -1))).reshape(shape)
+    return np.moveaxis(tensor, range(k), positions).reshape(-1)
+
+
+def test_apply_gate():
+    n = 5
+    state = MPSState.zero()
+    for _ in range(n - 1):
+        state = state.kron(MPSState.zero())
+    vector = state.to_dense()
+    for positions in ([2], [0, 1], [3, 1], [4, 0, 2], [1, 4]):
+        gate = random_unitary(len(positions))
+        vector = dense_apply(vector, gate, positions, n)
+        state.apply_gate(gate, positions)
+        assert np.allclose(state.to_dense(), vector, atol=1e-5)
+    assert np.allclose(state.get([0, 9, 31]), vector[[0, 9, 31]], atol=1e-5)
+    p1 = np.sum(np.abs(vector.reshape((2,) * n)[:, :, 1]) ** 2)
+    assert abs(state.probability_one(2) - p1) < 1e-5
+
+
+def test_collapse():
+    state = MPSState.zero().kron(MPSState.zero()).kron(MPSState.zero())
+    h = (1 / 2.0) ** 0.5 * np.array([[1, 1], [1, -1]], dtype=np.csingle)
+    x = np.array([[0, 1], [1, 0]], dtype=np.csingle)
+    state.apply_gate(h, [0])
+    state.apply_gate(controlled_matrix(x), [0, 2])
+    state.collapse(2, 1)
+    assert np.allclose(state.to_dense(), np.eye(8)[5], atol=1e-6)
+    state.collapse(0, 1, remove=True)
+    assert state.n == 2
+    assert np.allclose(state.to_dense(), np.eye(4)[1], atol=1e-6)
+
+
+def test_canonical_form():
+    n = 6
+    state = MPSState.zero()
+    for _ in range(n - 1):
+        state = state.kron(MPSState.zero())
+    for positions in ([0, 1], [4, 5], [2, 3], [1, 4], [5, 0], [3, 2]):
+        state.apply_gate(random_unitary(2), positions)
+        for site, tensor in enumerate(state.tensors):
+            left, _, right = tensor.shape
+            if site < state.center:
+                m = tensor.reshape((left * 2, right))
+                assert np.allclose(m.conj().T.dot(m), np.eye(right), atol=1e-5)
+            elif site > state.center:
+                m = tensor.reshape((left, 2 * right))
+                assert np.allclose(m.dot(m.conj().T), np.eye(left), atol=1e-5)
+    # Schmidt coefficients are relative to the norm of the state
+    state.tensors[state.center] = state.tensors[state.center] * 1e-9
+    bonds = state.bond_dimensions()
+    state.apply_gate(random_unitary(2), [2, 3])
+    assert state.bond_dimensions()[2] >= min(bonds[2], 2)
+
+
+def test_dtype():
+    tensor = np.zeros((1, 2, 1), dtype=np.complex128)
+    tensor[0, 1, 0] = 1
+    state = MPSState([tensor, tensor.copy()])
+    assert state.get([3]).dtype == np.complex128
+    assert state.to_dense().dtype == np.complex128
+
+
+def test_long_chain():
+    n = 60
+    q_sim = EQSN(backend='mps')
+    ids = [str(i) for i in range(n)]
+    for q_id in ids:
+        q_sim.new_qubit(q_id)
+    q_sim.H_gate(ids[0])
+    for i in range(1, n):
+        q_sim.cnot_gate(ids[i], ids[i - 1])
+    _, amplitudes = q_sim.give_statevector_for(ids[0], indices=[0, 2 ** n - 1])
+    assert np.allclose(np.abs(amplitudes) ** 2, [0.5, 0.5], atol=1e-5)
+    results = [q_sim.measure(q_id) for q_id in ids]
+    assert len(set(results)) == 1
+    q_sim.stop_all()
+
+
+def test_unknown_backend():
+    try:
+        EQSN(backend='unknown')
+        assert False
+    except ValueError:
+        pass
+
+
+if __name__ == "__main__":
+    test_apply_gate()
+    test_collapse()
+    test_canonical_form()
+    test_dtype()
+    test_long_chain()
+    test_unknown_backend()
+    exit(0)
@@ -0,0 +1,72 @@
+import numpy as np
+
+from eqsn import EQSN
+from eqsn.kernels import apply_controlled
+from eqsn.sparse_state import controlled_matrix
+
+X = np.array([[0, 1], [1, 0]], dtype=np.csingle)
+H = (1 / 2.0) ** 0.5 * np.array([[1, 1], [1, -1]], dtype=np.csingle)
+
+
+def dense_apply(vector, gate, positions, n):
+    k = len(positions)
+    tensor = np.moveaxis(vector.reshape((2,) * n), positions, range(k))
+    shape = tensor.shape
+    tensor = gate.dot(tensor.reshape((2 ** k, -1))).reshape(shape)
+    return np.moveaxis(tensor, range(k), positions).reshape(-1)
+
+
+def test_apply_controlled():
+    n = 6
+    vector = np.random.randn(2 ** n) + 1j * np.random.randn(2 ** n)
+    vector = (vector / np.linalg.norm(vector)).astype(np.csingle)
+    gate = np.kron(H, X).astype(np.csingle)
+    for controls, targets in (([0], [5, 2]), ([4, 1, 3], [0, 2]),
+                              ([5, 0], [3, 4])):
+        expected = dense_apply(vector, controlled_matrix(gate, len(controls)),
+                               controls + targets, n)
+        result = apply_controlled(vector.copy(), gate, controls, targets)
+        assert np.allclose(result, expected, atol=1e-6)
+
+
+def test_toffoli():
+    for bits in range(8):
+        q_sim = EQSN()
+        ids = ['a', 'b', 'c']
+        for i, q_id in enumerate(ids):
+            q_sim.new_qubit(q_id)
+            if bits >> (2 - i) & 1:
+                q_sim.X_gate(q_id)
+        q_sim.mcx(['a', 'b'], 'c')
+        expected = bits ^ 1 if bits >> 1 == 3 else bits
+        result = [q_sim.measure(q_id) for q_id in ids]
+        assert result == [expected >> 2 & 1, expected >> 1 & 1, expected & 1]
+        q_sim.stop_all()
+
+
+def test_many_controls():
+    for backend in ('statevector', 'mps'):
+        q_sim = EQSN(backend=backend)
+        controls = ['c%d' % i for i in range(4)]
+        for q_id in controls + ['t1', 't2']:
+            q_sim.new_qubit(q_id)
+        for q_id in controls:
+            q_sim.X_gate(q_id)
+        q_sim.X_gate('t2')
+        swap = np.array([[1, 0, 0, 0], [0, 0, 1, 0], [0, 1, 0, 0],
+                         [0, 0, 0, 1]], dtype=np.csingle)
+        q_sim.multi_controlled_gate(controls, ['t1', 't2'], swap)
+        assert q_sim.measure('t1') == 1
+        assert q_sim.measure('t2') == 0
+        q_sim.X_gate('c0')
+        q_sim.new_qubit('t3')
+        q_sim.mcx(controls, 't3')
+        assert q_sim.measure('t3') == 0
+        q_sim.stop_all()
+
+
+if __name__ == "__main__":
+    test_apply_controlled()
+    test_toffoli()
+    test_many_controls()
+    exit(0)
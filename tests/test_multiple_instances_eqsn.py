@@ -1,4 +1,4 @@
-from eqsn import EQSN
+from eqsn import EQSN, WorkerPool
 import time
 
 
@@ -10,20 +10,53 @@ def test_get_instance():
     i2.stop_all()
 
 
-def test_error_at_creating_EQSN_twice():
-    error = False
-    i1 = None
-    try:
-        i1 = EQSN()
-        _ = EQSN()
-    except:
-        error = True
-    assert error
+def test_independent_instances():
+    i1 = EQSN()
+    i2 = EQSN()
+    assert i1.pool is i2.pool
+    i1.new_qubit("1")
+    i2.new_qubit("1")
+    i1.X_gate("1")
+    assert i1.measure("1") == 1
+    assert i2.measure("1") == 0
     i1.stop_all()
+    i2.stop_all()
+
+
+def test_stop_one_instance():
+    i1 = EQSN()
+    i2 = EQSN()
+    i1.new_qubit("1")
+    i1.new_qubit("2")
+    i2.new_qubit("1")
+    i1.H_gate("1")
+    i1.cnot_gate("2", "1")
+    i2.X_gate("1")
+    i1.stop_all()
+    assert i2.measure("1") == 1
+    i2.stop_all()
+    assert not i2.pool.running
+
+
+def test_own_pool():
+    pool = WorkerPool(2)
+    i1 = EQSN(pool=pool)
+    i1.new_qubit("1")
+    i1.new_qubit("2")
+    i1.X_gate("2")
+    i1.cnot_gate("1", "2")
+    assert i1.measure("1") == 1
+    assert i1.measure("2") == 1
+    i1.stop_all()
+    assert not pool.running
 
 
 if __name__ == "__main__":
     test_get_instance()
     time.sleep(0.1)
-    test_error_at_creating_EQSN_twice()
+    test_independent_instances()
+    time.sleep(0.1)
+    test_stop_one_instance()
+    time.sleep(0.1)
+    test_own_pool()
     exit(0)
@@ -0,0 +1,84 @@
+from queue import Queue
+
+import numpy as np
+
+from eqsn import EQSN
+from eqsn.noise import kraus_operators, depolarizing, dephasing, \
+    amplitude_damping
+from eqsn.qubit_thread import QubitThread
+
+H = (1 / 2.0) ** 0.5 * np.array([[1, 1], [1, -1]], dtype=np.csingle)
+RY = np.array([[np.cos(0.4), -np.sin(0.4)], [np.sin(0.4), np.cos(0.4)]],
+              dtype=np.csingle)
+
+
+def apply_kraus(rho, kraus):
+    return sum(k.dot(rho).dot(k.conj().T) for k in kraus)
+
+
+def average_density_matrix(kraus, runs=2000):
+    rho = np.zeros((2, 2), dtype=np.complex128)
+    for _ in range(runs):
+        thread = QubitThread('a')
+        thread.apply_single_gate(RY, 'a')
+        thread.apply_single_gate(H, 'a')
+        thread.apply_channel(kraus, 'a')
+        channel = Queue()
+        thread.give_density_matrix(['a'], channel)
+        rho += channel.get()[1]
+    return rho / runs
+
+
+def test_kraus_operators():
+    try:
+        kraus_operators([np.eye(2), np.eye(2)])
+        assert False
+    except ValueError:
+        pass
+    assert kraus_operators(depolarizing(0.3)).shape == (4, 2, 2)
+
+
+def test_trajectories_average_to_channel():
+    psi = H.dot(RY.dot(np.array([1, 0])))
+    rho = np.outer(psi, psi.conj())
+    for kraus in (depolarizing(0.4), dephasing(0.3), amplitude_damping(0.5)):
+        expected = apply_kraus(rho, kraus)
+        assert np.allclose(average_density_matrix(kraus), expected, atol=0.05)
+
+
+def test_noise_on_qubits():
+    q_sim = EQSN()
+    q_sim.new_qubit('1')
+    q_sim.new_qubit('2')
+    q_sim.X_gate('1')
+    q_sim.cnot_gate('2', '1')
+    q_sim.amplitude_damp('1', 1.0)
+    q_sim.H_gate('2')
+    q_sim.dephase('2', 1.0)
+    q_sim.H_gate('2')
+    assert q_sim.measure('1') == 0
+    assert q_sim.measure('2') == 0
+    q_sim.stop_all()
+
+
+def test_noise_on_mps():
+    q_sim = EQSN(backend='mps')
+    for q_id in ['1', '2', '3']:
+        q_sim.new_qubit(q_id)
+    q_sim.X_gate('1')
+    q_sim.cnot_gate('2', '1')
+    q_sim.cnot_gate('3', '2')
+    q_sim.amplitude_damp('2', 1.0)
+    q_sim.depolarize('3', 0.0)
+    assert q_sim.measure('1') == 1
+    assert q_sim.measure('2') == 0
+    assert q_sim.measure('3') == 1
+    q_sim.stop_all()
+
+
+if __name__ == "__main__":
+    test_kraus_operators()
+    test_trajectories_average_to_channel()
+    test_noise_on_qubits()
+    test_noise_on_mps()
+    exit(0)
@@ -0,0 +1,38 @@
+from eqsn import EQSN
+
+
+def queue_of(q_sim, q_id):
+    return q_sim.shared_dict.get_queues_for_ids([q_id])[0]
+
+
+def test_near():
+    q_sim = EQSN()
+    q_sim.new_qubit('a')
+    for i in range(5):
+        q_sim.new_qubit('b%d' % i, near='a')
+        assert queue_of(q_sim, 'b%d' % i) is queue_of(q_sim, 'a')
+    q_sim.H_gate('a')
+    q_sim.cnot_gate('b0', 'a')
+    assert q_sim.measure('a') == q_sim.measure('b0')
+    q_sim.stop_all()
+
+
+def test_group():
+    q_sim = EQSN(qubit_pool=4)
+    for host in ('alice', 'bob'):
+        for i in range(4):
+            q_sim.new_qubit('%s%d' % (host, i), group=host)
+    for host in ('alice', 'bob'):
+        queues = q_sim.shared_dict.get_queues_for_ids(
+            ['%s%d' % (host, i) for i in range(4)])
+        assert len(queues) == 1
+    q_sim.X_gate('alice0')
+    q_sim.cnot_gate('alice3', 'alice0')
+    assert q_sim.measure('alice3') == 1
+    q_sim.stop_all()
+
+
+if __name__ == "__main__":
+    test_near()
+    test_group()
+    exit(0)
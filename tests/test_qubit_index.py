@@ -0,0 +1,59 @@
+from queue import Queue
+
+import numpy as np
+
+from eqsn import EQSN
+from eqsn.qubit_thread import QubitThread
+
+H = (1 / 2.0) ** 0.5 * np.array([[1, 1], [1, -1]], dtype=np.csingle)
+X = np.array([[0, 1], [1, 0]], dtype=np.csingle)
+
+
+def check_positions(thread):
+    assert thread.positions == {q_id: i for i, q_id in enumerate(thread.qubits)}
+
+
+def test_positions_follow_qubits():
+    thread = QubitThread('a')
+    for q_id in ['b', 'c', 'd']:
+        channel = Queue()
+        channel.put([q_id])
+        channel.put(np.array([1, 0], dtype=np.csingle))
+        thread.merge_accept(channel)
+    thread.apply_single_gate(H, 'a')
+    thread.apply_controlled_gate(X, 'd', 'a')
+    check_positions(thread)
+    thread.swap_qubits('a', 'd')
+    check_positions(thread)
+    thread.apply_controlled_two_qubit_gate(np.eye(4), 'c', 'b', 'a')
+    check_positions(thread)
+    channel = Queue()
+    thread.measure('b', channel)
+    assert channel.get() == 0
+    check_positions(thread)
+    thread.measure('a', channel)
+    thread.measure('d', channel)
+    assert channel.get() == channel.get()
+    check_positions(thread)
+
+
+def test_interned_ids():
+    q_sim = EQSN()
+    q_sim.new_qubit('alice')
+    q_sim.new_qubit(('bob', 1))
+    assert isinstance(q_sim._worker_id('alice')[1], int)
+    q_sim.H_gate('alice')
+    q_sim.cnot_gate(('bob', 1), 'alice')
+    qubits, _ = q_sim.give_statevector_for('alice')
+    assert sorted(qubits, key=str) == [('bob', 1), 'alice']
+    m = q_sim.measure('alice')
+    assert 'alice' not in q_sim.interned
+    assert q_sim.measure(('bob', 1)) == m
+    assert not q_sim.interned and not q_sim.names
+    q_sim.stop_all()
+
+
+if __name__ == "__main__":
+    test_positions_follow_qubits()
+    test_interned_ids()
+    exit(0)
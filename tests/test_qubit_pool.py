@@ -0,0 +1,45 @@
+import numpy as np
+
+from eqsn import EQSN
+
+
+def test_reset():
+    q_sim = EQSN()
+    q_sim.new_qubit('a')
+    q_sim.new_qubit('b')
+    q_sim.X_gate('a')
+    q_sim.cnot_gate('b', 'a')
+    assert q_sim.reset('a') == 1
+    assert sorted(q_sim.shared_dict.get_ids()) == ['a', 'b']
+    qubits, vector = q_sim.give_statevector_for('a')
+    assert qubits == ['a']
+    assert np.allclose(vector, [1, 0])
+    assert q_sim.measure('b') == 1
+    q_sim.H_gate('a')
+    q_sim.reset('a')
+    assert q_sim.measure('a') == 0
+    q_sim.stop_all()
+
+
+def test_pool():
+    q_sim = EQSN(qubit_pool=2)
+    assert len(q_sim.free_qubits) == 2
+    for i in range(10):
+        q_sim.new_qubit('a%d' % i)
+        q_sim.new_qubit('b%d' % i)
+        q_sim.X_gate('b%d' % i)
+        q_sim.cnot_gate('a%d' % i, 'b%d' % i)
+        assert q_sim.measure('a%d' % i) == 1
+        assert q_sim.measure('b%d' % i) == 1
+        assert len(q_sim.free_qubits) == 2
+    q_sim.new_qubit('c')
+    _, vector = q_sim.give_statevector_for('c')
+    assert np.allclose(vector, [1, 0])
+    assert q_sim.measure('c') == 0
+    q_sim.stop_all()
+
+
+if __name__ == "__main__":
+    test_reset()
+    test_pool()
+    exit(0)
@@ -0,0 +1,53 @@
+import threading
+from queue import Queue
+
+from eqsn.shared_dict import SharedDict
+
+
+def test_registry():
+    shared_dict = SharedDict()
+    thread = threading.Thread(target=lambda: None)
+    thread.start()
+    queue = Queue()
+    for i in range(100):
+        shared_dict.set_thread_with_id(i, thread, queue)
+    assert shared_dict.thread_list == {thread: 100}
+    assert shared_dict.queue_list == {queue: 100}
+    for i in range(100):
+        shared_dict.delete_id_and_check_to_join_thread(i)
+    assert shared_dict.thread_list == {}
+    assert shared_dict.queue_list == {}
+    assert shared_dict.get_ids() == []
+
+
+def test_delete_ids_and_stop_threads():
+    shared_dict = SharedDict()
+    threads = []
+    queues = []
+    for q_id in ['a', 'b']:
+        queue = Queue()
+        thread = threading.Thread(target=queue.get)
+        thread.start()
+        shared_dict.set_thread_with_id(q_id, thread, queue)
+        threads.append(thread)
+        queues.append(queue)
+    shared_dict.set_thread_with_id('c', threads[1], queues[1])
+    shared_dict.change_thread_and_queue_of_ids(['a'], 'b')
+    assert shared_dict.thread_list == {threads[1]: 3}
+    # The thread of the first qubit is not used any more
+    queues[0].put(None)
+    threads[0].join()
+    shared_dict.delete_ids_and_stop_threads(['a', 'b'])
+    # The thread is still used by c and keeps running
+    assert shared_dict.thread_list == {threads[1]: 1}
+    assert threads[1].is_alive()
+    shared_dict.delete_ids_and_stop_threads(['c'])
+    assert shared_dict.thread_list == {}
+    assert shared_dict.queue_list == {}
+    assert not threads[1].is_alive()
+
+
+if __name__ == "__main__":
+    test_registry()
+    test_delete_ids_and_stop_threads()
+    exit(0)
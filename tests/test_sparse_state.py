@@ -0,0 +1,114 @@
+from queue import Queue
+
+import numpy as np
+
+from eqsn import EQSN
+from eqsn.qubit_thread import QubitThread
+from eqsn.sparse_state import SparseState, controlled_matrix, SPARSE_MIN_QUBITS
+
+
+def random_unitary(k):
+    m = np.random.randn(2 ** k, 2 ** k) + 1j * np.random.randn(2 ** k, 2 ** k)
+    q, _ = np.linalg.qr(m)
+    return q.astype(np.csingle)
+
+
+def dense_apply(vector, gate, positions, n):
+    k = len(positions)
+    tensor = vector.reshape((2,) * n)
+    tensor = np.moveaxis(tensor, positions, range(k))
+    shape = tensor.shape
+    tensor = gate.dot(tensor.reshape((2 ** k, -1))).reshape(shape)
+    return np.moveaxis(tensor, range(k), positions).reshape(-1)
+
+
+def test_apply_gate():
+    n = 5
+    vector = np.zeros(2 ** n, dtype=np.csingle)
+    vector[[0, 5]] = [0.6, 0.8j]
+    vector /= np.linalg.norm(vector)
+    sparse = SparseState.from_dense(vector)
+    assert len(sparse.indices) == 2
+    for positions in ([3], [0, 4], [4, 1], [2, 0, 3]):
+        gate = random_unitary(len(positions))
+        vector = dense_apply(vector, gate, positions, n)
+        sparse.apply_gate(gate, positions)
+        assert np.allclose(sparse.to_dense(), vector, atol=1e-6)
+    assert np.allclose(sparse.get([0, 7, 31]), vector[[0, 7, 31]], atol=1e-6)
+
+
+def test_truncation_renormalizes():
+    vector = np.zeros(2 ** 4, dtype=np.csingle)
+    vector[[0, 3, 9]] = [1, 1e-9, 1]
+    sparse = SparseState.from_dense(vector / np.linalg.norm(vector))
+    assert list(sparse.indices) == [0, 9]
+    assert np.isclose(np.linalg.norm(sparse.values), 1)
+
+
+def test_cnot_stays_sparse():
+    n = 6
+    sparse = SparseState(n, np.array([0, 1 << (n - 1)]),
+                         np.array([1, 1], dtype=np.csingle) / np.sqrt(2))
+    x = np.array([[0, 1], [1, 0]], dtype=np.csingle)
+    for target in range(1, n):
+        sparse.apply_gate(controlled_matrix(x), [0, target])
+    assert list(sparse.indices) == [0, 2 ** n - 1]
+    assert abs(sparse.probability_one(3) - 0.5) < 1e-6
+
+
+def test_collapse_and_kron():
+    a = SparseState(2, np.array([0, 3]), np.array([0.6, 0.8], dtype=np.csingle))
+    b = SparseState(1, np.array([1]), np.array([1], dtype=np.csingle))
+    ab = a.kron(b)
+    assert ab.n == 3
+    assert np.allclose(ab.to_dense(), np.kron(a.to_dense(), b.to_dense()))
+    ab.collapse(1, 1, remove=True)
+    assert ab.n == 2
+    assert list(ab.indices) == [3]
+    assert np.allclose(ab.values, [1])
+
+
+def test_thread_switches_representation():
+    n = SPARSE_MIN_QUBITS
+    thread = QubitThread('0')
+    x = np.array([[0, 1], [1, 0]], dtype=np.csingle)
+    h = (1 / 2.0) ** 0.5 * np.array([[1, 1], [1, -1]], dtype=np.csingle)
+    thread.apply_single_gate(h, '0')
+    for i in range(1, n):
+        channel = Queue()
+        channel.put([str(i)])
+        channel.put(np.array([1, 0], dtype=np.csingle))
+        thread.merge_accept(channel)
+        thread.apply_controlled_gate(x, str(i), '0')
+    assert isinstance(thread.qubit, SparseState)
+    thread.apply_single_gate(h, '0')
+    channel = Queue()
+    thread.measure('0', channel)
+    assert not isinstance(thread.qubit, SparseState)
+
+
+def test_ghz():
+    n = SPARSE_MIN_QUBITS + 2
+    q_sim = EQSN()
+    ids = [str(i) for i in range(n)]
+    for q_id in ids:
+        q_sim.new_qubit(q_id)
+    q_sim.H_gate(ids[0])
+    for q_id in ids[1:]:
+        q_sim.cnot_gate(q_id, ids[0])
+    _, vector = q_sim.give_statevector_for(ids[0], indices=[0, 2 ** n - 1, 1])
+    assert np.allclose(np.abs(vector) ** 2, [0.5, 0.5, 0], atol=1e-6)
+    assert np.allclose(q_sim.probabilities(ids[:2]), [0.5, 0, 0, 0.5], atol=1e-6)
+    results = [q_sim.measure(q_id) for q_id in ids]
+    assert len(set(results)) == 1
+    q_sim.stop_all()
+
+
+if __name__ == "__main__":
+    test_apply_gate()
+    test_truncation_renormalizes()
+    test_cnot_stays_sparse()
+    test_collapse_and_kron()
+    test_thread_switches_representation()
+    test_ghz()
+    exit(0)
@@ -0,0 +1,60 @@
+from eqsn import EQSN
+import numpy as np
+
+
+def test_selected_amplitudes():
+    q_sim = EQSN()
+    q_sim.new_qubit('1')
+    q_sim.new_qubit('2')
+    q_sim.H_gate('1')
+    q_sim.cnot_gate('2', '1')
+    qubits, vector = q_sim.give_statevector_for('1')
+    _, amplitudes = q_sim.give_statevector_for('1', indices=[0, 3])
+    assert np.allclose(amplitudes, vector[[0, 3]])
+    out = np.zeros(8, dtype=np.complex128)
+    _, view = q_sim.give_statevector_for('2', out=out)
+    assert np.allclose(view, vector)
+    assert np.allclose(out[:4], vector)
+    q_sim.stop_all()
+
+
+def test_shared_memory_buffer():
+    try:
+        from multiprocessing import shared_memory
+    except ImportError:
+        return
+    q_sim = EQSN()
+    q_sim.new_qubit('1')
+    q_sim.X_gate('1')
+    shm = shared_memory.SharedMemory(create=True, size=64)
+    qubits, view = q_sim.give_statevector_for('1', out=shm)
+    assert qubits == ['1']
+    assert np.allclose(view, [0, 1])
+    del view
+    shm.close()
+    shm.unlink()
+    q_sim.stop_all()
+
+
+def test_probabilities_and_density_matrix():
+    q_sim = EQSN()
+    q_sim.new_qubit('1')
+    q_sim.new_qubit('2')
+    q_sim.new_qubit('3')
+    q_sim.H_gate('1')
+    q_sim.cnot_gate('2', '1')
+    q_sim.X_gate('3')
+    assert np.allclose(q_sim.probabilities(['1', '2']), [0.5, 0, 0, 0.5])
+    assert np.allclose(q_sim.probabilities(['3', '1']), [0, 0, 0.5, 0.5])
+    assert np.allclose(q_sim.reduced_density_matrix(['2']), np.eye(2) / 2)
+    rho = q_sim.reduced_density_matrix(['1', '3'])
+    expected = np.kron(np.eye(2) / 2, np.array([[0, 0], [0, 1]]))
+    assert np.allclose(rho, expected)
+    q_sim.stop_all()
+
+
+if __name__ == "__main__":
+    test_selected_amplitudes()
+    test_shared_memory_buffer()
+    test_probabilities_and_density_matrix()
+    exit(0)
@@ -0,0 +1,60 @@
+import json
+import os
+import tempfile
+
+from eqsn import EQSN
+from eqsn.profiling import command_name
+
+
+def test_stats():
+    q_sim = EQSN()
+    q_sim.new_qubit('1')
+    q_sim.X_gate('1')
+    assert q_sim.stats() == {}
+    q_sim.start_tracing()
+    q_sim.new_qubit('2')
+    for _ in range(10):
+        q_sim.X_gate('1')
+    q_sim.cnot_gate('2', '1')
+    q_sim.stop_tracing()
+    q_sim.X_gate('1')
+    q_sim.give_statevector_for('1')
+    stats = q_sim.stats(reset=True)
+    assert stats['SINGLE_GATE']['count'] == 10
+    assert stats['NEW_QUBIT']['count'] == 1
+    assert stats['CONTROLLED_GATE']['count'] == 1
+    for stage in ['queue', 'dispatch', 'execute']:
+        assert stats['SINGLE_GATE']['stages'][stage]['mean_us'] >= 0
+        assert sum(stats['SINGLE_GATE']['stages'][stage]['histogram_us'].values()) == 10
+    assert q_sim.stats() == {}
+    q_sim.stop_all()
+
+
+def test_command_names():
+    assert command_name(12) == 'CONTROLLED_TWO_GATE'
+    assert command_name(1) == 'SINGLE_GATE'
+    assert command_name(99) == '99'
+
+
+def test_chrome_trace():
+    q_sim = EQSN()
+    q_sim.start_tracing()
+    q_sim.new_qubit('1')
+    q_sim.H_gate('1')
+    q_sim.measure('1')
+    path = os.path.join(tempfile.mkdtemp(), 'trace.json')
+    q_sim.write_chrome_trace(path)
+    with open(path) as f:
+        events = json.load(f)['traceEvents']
+    names = set(e['name'] for e in events)
+    assert 'SINGLE_GATE' in names
+    assert all(e['ph'] == 'X' and e['dur'] >= 0 for e in events)
+    os.remove(path)
+    q_sim.stop_all()
+
+
+if __name__ == "__main__":
+    test_stats()
+    test_command_names()
+    test_chrome_trace()
+    exit(0)
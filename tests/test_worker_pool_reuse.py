@@ -0,0 +1,62 @@
+from eqsn import EQSN, WorkerPool
+
+
+def test_keep_workers():
+    q_sim = EQSN()
+    pool = q_sim.pool
+    pids = [p.pid for p, _ in pool.process_queue_list]
+    q_sim.new_qubit("1")
+    q_sim.X_gate("1")
+    q_sim.stop_all(keep_workers=True)
+    assert pool.running
+
+    q_sim = EQSN()
+    assert q_sim.pool is pool
+    assert [p.pid for p, _ in pool.process_queue_list] == pids
+    q_sim.new_qubit("1")
+    assert q_sim.measure("1") == 0
+    q_sim.stop_all()
+    assert not pool.running
+
+
+def test_stop_kept_shared_pool():
+    q_sim = EQSN()
+    pool = q_sim.pool
+    q_sim.stop_all(keep_workers=True)
+    WorkerPool.stop_shared_pool()
+    assert not pool.running
+    for p, _ in pool.process_queue_list:
+        assert not p.is_alive()
+
+
+def test_stop_used_shared_pool():
+    q_sim = EQSN()
+    try:
+        WorkerPool.stop_shared_pool()
+        assert False
+    except RuntimeError:
+        pass
+    assert q_sim.pool.running
+    q_sim.new_qubit("1")
+    assert q_sim.measure("1") == 0
+    q_sim.stop_all()
+    assert not q_sim.pool.running
+
+
+def test_keep_workers_registers_stop_once():
+    pool = WorkerPool(1)
+    for _ in range(3):
+        q_sim = EQSN(pool=pool)
+        q_sim.stop_all(keep_workers=True)
+    assert pool.running
+    assert pool.stop_registered
+    pool.stop()
+    assert not pool.running
+
+
+if __name__ == "__main__":
+    test_keep_workers()
+    test_stop_kept_shared_pool()
+    test_stop_used_shared_pool()
+    test_keep_workers_registers_stop_once()
+    exit(0)